@@ -0,0 +1,270 @@
+"""
+Gradio UI 없이 쓰는 REST API (약국 백오피스 연동용).
+
+    POST /api/v1/analyze           본문 = 이미지 바이트 → JSON {"tag", "probability", "ocr_text", "explanation"}
+    POST /api/v1/analyze/batch     multipart(여러 파일) 또는 tar 본문 → 끝난 순서대로 NDJSON 한 줄씩
+    GET  /api/v1/health
+
+?explain=0 이면 GPT 설명 단계를 건너뛴다.
+UI와 같은 프로세스에서 같은 newmain 파이프라인 / 캐시 / 요청 합치기를 쓴다 (UI는 / 에 같이 붙음).
+
+예시:
+    python api.py --port 7860                  (API + UI)
+    python api.py --no-ui                      (API만)
+    curl --data-binary @pill.jpg -H "Content-Type: image/jpeg" localhost:7860/api/v1/analyze
+    curl -F f=@a.jpg -F f=@b.jpg localhost:7860/api/v1/analyze/batch
+    tar cf - photos/ | curl --data-binary @- -H "Content-Type: application/x-tar" localhost:7860/api/v1/analyze/batch
+"""
+import argparse
+import json
+import os
+import tarfile
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+import bufpool
+import ingest
+
+# 배치 한 건에서 동시에 처리할 이미지 수 / 최대 이미지 수
+BATCH_CONCURRENCY = int(os.getenv("API_BATCH_CONCURRENCY", "4"))
+MAX_BATCH_FILES = int(os.getenv("API_MAX_BATCH_FILES", "500"))
+
+# tar 본문을 이 크기까지는 메모리, 넘으면 임시 파일에 받음 / 배치 본문(tar, multipart) 전체 상한
+SPOOL_BYTES = 8 * 1024 * 1024
+MAX_ARCHIVE_BYTES = int(os.getenv("API_MAX_ARCHIVE_MB", "512")) * 1024 * 1024
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+
+
+def _error(status, message):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+def _flag(request, name, default=True):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    return value.lower() not in ("0", "false", "no")
+
+
+def _analyze_one(analyze_fn, name, data, explain):
+    if isinstance(data, Exception):
+        # 읽기 전에 걸러진 항목 (너무 큰 파일 등)
+        return {"name": name, "error": str(data)}
+    try:
+        return {"name": name, **analyze_fn(data, explain)}
+    except (ingest.IngestError, bufpool.MemoryBusy) as e:
+        return {"name": name, "error": str(e)}
+    except Exception as e:
+        print(f"❌ {name} 분석 에러: {e}")
+        return {"name": name, "error": f"{type(e).__name__}: {e}"}
+
+
+def _stream(items, analyze_fn, explain):
+    """(이름, 바이트) 이터레이터 → NDJSON 줄. 동시에 들고 있는 이미지는 BATCH_CONCURRENCY * 2장까지"""
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as pool:
+        pending = set()
+        count = 0
+        for name, data in items:
+            count += 1
+            if count > MAX_BATCH_FILES:
+                yield json.dumps({"name": name, "error": f"배치당 최대 {MAX_BATCH_FILES}장"},
+                                 ensure_ascii=False) + "\n"
+                break
+            pending.add(pool.submit(_analyze_one, analyze_fn, name, data, explain))
+            if len(pending) >= BATCH_CONCURRENCY * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield json.dumps(fut.result(), ensure_ascii=False) + "\n"
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield json.dumps(fut.result(), ensure_ascii=False) + "\n"
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+async def _receive(request, write, limit):
+    """
+    본문을 조각 단위로 write에 넘기고 받은 바이트 수를 돌려줌. limit를 넘는 순간 BodyTooLarge.
+    content-length가 없는 chunked 요청도 여기서 막힘
+    """
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise BodyTooLarge()
+        write(chunk)
+    return received
+
+
+def _limit_receive(receive, limit):
+    """
+    ASGI receive를 감싸서 본문이 limit를 넘는 순간 BodyTooLarge.
+    request.form()은 본문을 직접 읽어 파트를 임시 파일에 쌓으므로 Request를 이것으로 다시 만들어서 씀
+    """
+    received = 0
+
+    async def limited():
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > limit:
+                raise BodyTooLarge()
+        return message
+
+    return limited
+
+
+def _open_tar(fileobj):
+    """멤버 헤더를 끝까지 읽어 봐서 깨진 tar면 응답을 시작하기 전에 TarError"""
+    tar = tarfile.open(fileobj=fileobj, mode="r:*")
+    try:
+        members = [m for m in tar.getmembers()
+                   if m.isfile() and m.name.lower().endswith(IMAGE_EXTS)]
+    except BaseException:
+        tar.close()
+        raise
+    return tar, members
+
+
+def _tar_items(tar, members):
+    try:
+        for member in members:
+            if member.size > ingest.MAX_UPLOAD_BYTES:
+                yield member.name, ingest.too_large(member.size)
+                continue
+            try:
+                data = tar.extractfile(member).read()
+            except (tarfile.TarError, EOFError, OSError) as e:
+                # 헤더는 멀쩡한데 내용이 잘린 경우: 그 항목만 에러 줄로
+                yield member.name, ingest.IngestError(f"tar에서 읽지 못함: {e}")
+                continue
+            yield member.name, data
+    finally:
+        tar.close()
+        tar.fileobj.close()
+
+
+def build_app(analyze_fn=None):
+    """analyze_fn(이미지 바이트, explain) -> dict. 기본은 같은 프로세스의 newmain.analyze_bytes"""
+    if analyze_fn is None:
+        import newmain
+
+        analyze_fn = newmain.analyze_bytes
+
+    app = FastAPI(title="AI 복약 가이드 API", docs_url="/api/docs", openapi_url="/api/openapi.json")
+
+    @app.get("/api/v1/health")
+    def health():
+        return {"ok": True}
+
+    @app.post("/api/v1/analyze")
+    async def analyze(request: Request):
+        too_large = _error(413, f"이미지는 {ingest.MAX_UPLOAD_BYTES // 1024 // 1024}MB 이하만 받습니다.")
+        length = int(request.headers.get("content-length") or 0)
+        if length > ingest.MAX_UPLOAD_BYTES:
+            return too_large
+        body = bytearray()
+        try:
+            await _receive(request, body.extend, ingest.MAX_UPLOAD_BYTES)
+        except BodyTooLarge:
+            return too_large
+        data = bytes(body)
+        if not data:
+            return _error(400, "이미지가 업로드되지 않았습니다.")
+        explain = _flag(request, "explain")
+        try:
+            return await run_in_threadpool(analyze_fn, data, explain)
+        except ingest.IngestError as e:
+            return _error(422, str(e))
+        except bufpool.MemoryBusy as e:
+            return _error(503, str(e))
+
+    @app.post("/api/v1/analyze/batch")
+    async def analyze_batch(request: Request):
+        explain = _flag(request, "explain")
+        ctype = request.headers.get("content-type", "")
+        too_large = _error(413, f"배치 본문은 {MAX_ARCHIVE_BYTES // 1024 // 1024}MB 이하만 받습니다.")
+
+        if ctype.startswith("multipart/form-data"):
+            if int(request.headers.get("content-length") or 0) > MAX_ARCHIVE_BYTES:
+                return too_large
+            # content-length 없는 chunked 요청도 파트를 받는 도중에 막힘
+            limited = Request(request.scope, _limit_receive(request.receive, MAX_ARCHIVE_BYTES))
+            try:
+                form = await limited.form(max_files=MAX_BATCH_FILES)
+            except BodyTooLarge:
+                return too_large
+            files = [(v.filename, v) for _, v in form.multi_items() if hasattr(v, "read")]
+
+            def items():
+                for name, upload in files:
+                    upload.file.seek(0, os.SEEK_END)
+                    size = upload.file.tell()
+                    upload.file.seek(0)
+                    if size > ingest.MAX_UPLOAD_BYTES:
+                        yield name, ingest.too_large(size)
+                    else:
+                        yield name, upload.file.read()
+
+            return StreamingResponse(_stream(items(), analyze_fn, explain),
+                                     media_type="application/x-ndjson",
+                                     background=form.close)
+
+        if ctype.startswith(("application/x-tar", "application/tar", "application/octet-stream")):
+            if int(request.headers.get("content-length") or 0) > MAX_ARCHIVE_BYTES:
+                return too_large
+            spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+            try:
+                await _receive(request, spool.write, MAX_ARCHIVE_BYTES)
+                spool.seek(0)
+                tar, members = await run_in_threadpool(_open_tar, spool)
+            except BodyTooLarge:
+                spool.close()
+                return too_large
+            except (tarfile.TarError, EOFError) as e:
+                spool.close()
+                print(f"⚠️ 깨진 tar 본문: {type(e).__name__}: {e}")
+                return _error(400, "tar 본문을 읽지 못했습니다. 파일이 깨졌거나 tar 형식이 아닙니다.")
+            return StreamingResponse(_stream(_tar_items(tar, members), analyze_fn, explain),
+                                     media_type="application/x-ndjson")
+
+        return _error(415, "multipart/form-data 또는 application/x-tar 본문만 받습니다.")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="REST API 서버 (UI 같이 / 따로)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "7860")))
+    parser.add_argument("--no-ui", action="store_true", help="Gradio UI 없이 API만")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    import config
+    import newmain
+
+    config.install_signal_handler()
+    app = build_app()
+    if not args.no_ui:
+        import gradio as gr
+
+        import ui
+
+        app = gr.mount_gradio_app(app, newmain.build_demo(), path="/",
+                                  max_file_size=ingest.MAX_UPLOAD_BYTES, **ui.launch_kwargs())
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+보관 사진 일괄 재식별 CLI (모델 반복 교체 후 등).
+
+폴더를 돌거나 목록 파일(한 줄에 경로 하나, 또는 path 열이 있는 CSV)을 읽어서
+newmain.analyze_bytes로 분류한다. UI / API와 같은 파이프라인과 캐시를 쓴다.
+
+- 동시 처리 수(--concurrency)와 초당 요청 수(--rate) 제한
+- --no-explain: GPT 설명 단계 생략 (분류 + OCR만)
+- 진행 상황은 <출력>.progress.jsonl에 한 줄씩 바로 기록 → 중간에 끊겨도 다시 실행하면 이어서 처리
+  (지금 서비스 중인 반복과 다른 반복으로 처리한 행은 다시 처리 → 반복 교체 뒤 같은 --out으로 다시 돌리면 됨)
+- 끝나면 CSV 또는 Parquet(.parquet, pandas + pyarrow 필요)로 결과 저장
+- 처리량 / 남은 시간을 주기적으로 출력
+
+예시:
+    python batch.py 보관사진/ --out results.csv --no-explain
+    python batch.py manifest.txt --out results.parquet -c 8 --rate 5
+    python batch.py 보관사진/ --out results.csv --retry-errors     (실패한 것만 다시)
+"""
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+COLUMNS = ["path", "tag", "probability", "ocr_text", "explanation", "iteration", "error"]
+
+
+def iter_inputs(source):
+    """폴더면 이미지 파일 경로들, 파일이면 목록(텍스트 또는 path 열 CSV)"""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for f in sorted(files):
+                if f.lower().endswith(IMAGE_EXTS):
+                    yield os.path.join(root, f)
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding='utf-8', newline='') as f:
+        first = f.readline()
+        f.seek(0)
+        if first.strip().lower().split(',')[0] == 'path':
+            lines = (row['path'] for row in csv.DictReader(f))
+        else:
+            lines = (line.strip() for line in f)
+        for line in lines:
+            if line and not line.startswith('#'):
+                yield line if os.path.isabs(line) else os.path.join(base, line)
+
+
+class RateLimiter:
+    """초당 rate번까지 (토큰 버킷, 스레드 안전). rate가 0이면 제한 없음"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def load_progress(path, retry_errors=False, iteration=None):
+    """
+    이미 처리한 경로 → 결과 행, 다시 처리할 이전 반복 행 수. 마지막 줄이 끊겨 있으면 무시.
+    iteration을 주면 다른 반복으로 처리한 행은 처리하지 않은 것으로 봄
+    """
+    done = {}
+    stale = set()
+    if not os.path.exists(path):
+        return done, 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if iteration and row.get('iteration') != iteration:
+                done.pop(row['path'], None)
+                stale.add(row['path'])
+                continue
+            stale.discard(row['path'])
+            if retry_errors and row.get('error'):
+                done.pop(row['path'], None)
+                continue
+            done[row['path']] = row
+    return done, len(stale)
+
+
+def analyze_file(path, explain, limiter):
+    import ingest
+    import newmain
+
+    row = {'path': path, 'iteration': newmain.current_iteration()}
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(ingest.MAX_UPLOAD_BYTES + 1)
+        limiter.wait()
+        row.update(newmain.analyze_bytes(data, explain))
+    except Exception as e:
+        row['error'] = str(e) if isinstance(e, ingest.IngestError) else f"{type(e).__name__}: {e}"
+    return row
+
+
+def write_output(rows, out):
+    if out.lower().endswith('.parquet'):
+        try:
+            import pandas as pd
+
+            pd.DataFrame(rows, columns=COLUMNS).to_parquet(out, index=False)
+        except ImportError as e:
+            raise SystemExit(f"❌ Parquet 저장에는 pandas + pyarrow가 필요합니다: {e}")
+        return
+    tmp = out + '.tmp'
+    with open(tmp, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, out)
+
+
+def run(paths, out, concurrency=4, rate=0.0, explain=True, retry_errors=False, report_every=10.0):
+    paths = list(dict.fromkeys(paths))
+    progress_path = out + '.progress.jsonl'
+    import newmain
+
+    iteration = newmain.current_iteration()
+    done, stale = load_progress(progress_path, retry_errors, iteration)
+    todo = [p for p in paths if p not in done]
+    total = len(todo)
+    print(f"전체 {len(done) + total}장, 이미 처리 {len(done)}장, 남은 {total}장 (반복 {iteration})")
+    if stale:
+        print(f"  다른 반복으로 처리했던 {stale}장은 다시 처리")
+
+    limiter = RateLimiter(rate)
+    t0 = time.perf_counter()
+    last_report = t0
+    finished = errors = 0
+
+    with open(progress_path, 'a', encoding='utf-8') as progress, \
+            ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = set()
+        it = iter(todo)
+        while True:
+            # 큐에 쌓아 두는 작업 수를 동시 처리 수의 2배로 제한 (목록이 커도 메모리 일정)
+            for path in it:
+                pending.add(pool.submit(analyze_file, path, explain, limiter))
+                if len(pending) >= concurrency * 2:
+                    break
+            if not pending:
+                break
+            finished_now, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished_now:
+                row = fut.result()
+                done[row['path']] = row
+                progress.write(json.dumps(row, ensure_ascii=False) + '\n')
+                finished += 1
+                errors += bool(row.get('error'))
+            progress.flush()
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                last_report = now
+                rps = finished / (now - t0)
+                eta = (total - finished) / rps if rps else 0
+                print(f"  {finished}/{total}장 ({rps:.2f}장/s, 실패 {errors}, 남은 시간 {eta / 60:.1f}분)")
+
+    wall = time.perf_counter() - t0
+    order = {p: i for i, p in enumerate(paths)}
+    rows = sorted(done.values(), key=lambda r: order.get(r['path'], len(order)))
+    write_output(rows, out)
+    print(f"✅ {finished}장 처리 ({finished / wall if wall else 0:.2f}장/s, {wall:.1f}s), "
+          f"실패 {errors}장 → {out}")
+    if finished:
+        import gating
+
+        print(f"게이트: {gating.report()}")
+    return finished, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="알약 사진 일괄 재식별")
+    parser.add_argument('source', help="이미지 폴더 또는 목록 파일")
+    parser.add_argument('--out', default='batch_results.csv', help=".csv 또는 .parquet")
+    parser.add_argument('-c', '--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=0.0, help="초당 최대 요청 수 (0 = 제한 없음)")
+    parser.add_argument('--no-explain', action='store_true', help="GPT 설명 생략")
+    parser.add_argument('--retry-errors', action='store_true', help="지난번에 실패한 항목 다시 처리")
+    parser.add_argument('--report-every', type=float, default=10.0, help="진행 상황 출력 간격(초)")
+    args = parser.parse_args()
+
+    run(iter_inputs(args.source), args.out, args.concurrency, args.rate,
+        not args.no_explain, args.retry_errors, args.report_every)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+동시 요청 합치기(singleflight.py) 확인.
+
+캐시가 빈 상태에서 같은 사진으로 analyze_pill을 동시에 N번 부르고
+mock 서버가 받은 Custom Vision / OCR / GPT 요청 수를 센다.
+합치기가 동작하면 사진 한 장당 각각 1번씩만 나가야 한다. 아니면 종료 코드 1.
+
+예시:
+    python bench/coalesce.py
+    python bench/coalesce.py -c 32 --latency const:500
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+import mock_azure  # noqa: E402
+
+FIXTURE = ROOT / "files" / "teest1.jpg"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="동시 동일 요청 합치기 확인")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("--latency", default="const:300", help="mock 서버 응답 지연")
+    parser.add_argument("--fixture", default=str(FIXTURE))
+    args = parser.parse_args()
+
+    servers = mock_azure.start_servers(vision_latency=args.latency, ocr_latency=args.latency,
+                                       chat_latency=args.latency)
+    os.environ.update(mock_azure.mock_env(servers))
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ["DRUG_DB_PATH"] = str(BENCH_DIR / "results" / "no-drug-db.sqlite3")  # 없는 파일 → 설명은 GPT 경로로
+
+    import newmain
+
+    def counts():
+        return {name: srv.RequestHandlerClass.requests for name, (srv, _) in servers.items()}
+
+    failed = False
+    # UI 경로(파일 경로)와 PIL 이미지 경로 둘 다 확인
+    from PIL import Image
+
+    with Image.open(args.fixture) as im:
+        pil = im.convert("RGB")
+    for label, arg in (("파일 경로", args.fixture), ("PIL 이미지", pil)):
+        newmain.result_cache.clear()
+        newmain.explain_cache.clear()
+        newmain.prediction_cache.clear()
+        newmain.ocr_cache.clear()
+        before = counts()
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(lambda _: newmain.analyze_pill(arg), range(args.concurrency)))
+        wall = (time.perf_counter() - t0) * 1000.0
+        sent = {k: v - before[k] for k, v in counts().items()}
+
+        same = all(r == results[0] for r in results)
+        ok = same and all(n == 1 for n in sent.values())
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {label}: 동시 {args.concurrency}건 → "
+              f"Custom Vision {sent['vision']}회, OCR {sent['ocr']}회, GPT {sent['chat']}회, "
+              f"결과 {'모두 같음' if same else '다름'}, {wall:.0f} ms")
+
+    print(f"합치기 통계: 실행 {newmain.flights.executed}회, 공유 {newmain.flights.shared}회")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+디스크 캐시 계층(pill_cache.DiskCache / TieredCache) 확인.
+
+1) mock 서버를 띄우고 같은 DISK_CACHE_PATH로 자식 프로세스를 두 번 실행해서
+   files/ 픽스처를 analyze_pill에 넣는다. 두 번째(재시작) 프로세스는 Azure 요청이 0이어야 하고 결과도 같아야 함
+2) 작은 DISK_CACHE_MB로 항목을 많이 넣어서 크기 상한 안으로 지워지는지 확인
+3) 값 인코딩 크기 (JSON 문자열 대비)
+
+하나라도 어긋나면 종료 코드 1.
+
+예시:
+    python bench/disk_tier.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+import mock_azure  # noqa: E402
+
+FIXTURE_DIR = ROOT / "files"
+IMAGE_EXTS = (".png", ".jpg", ".jpeg")
+
+
+def child():
+    """자식 프로세스: 픽스처를 모두 분석해서 결과를 JSON 한 줄로 출력"""
+    import newmain
+
+    paths = [str(p) for p in sorted(FIXTURE_DIR.iterdir()) if p.suffix.lower() in IMAGE_EXTS]
+    results = [list(newmain.analyze_pill(p)) for p in paths]
+    print(json.dumps(results, ensure_ascii=False))
+
+
+def check_restart(tmp) -> bool:
+    servers = mock_azure.start_servers()
+    env = dict(os.environ)
+    env.update(mock_azure.mock_env(servers))
+    env.update({"CACHE_BACKEND": "memory", "DISK_CACHE_PATH": os.path.join(tmp, "disk.sqlite3"),
+                "DRUG_DB_PATH": str(BENCH_DIR / "results" / "no-drug-db.sqlite3"),
+                "PROMPT_USAGE_LOG": os.devnull})
+
+    def counts():
+        return {name: srv.RequestHandlerClass.requests for name, (srv, _) in servers.items()}
+
+    runs = []
+    for label in ("처음 실행", "재시작"):
+        before = counts()
+        out = subprocess.run([sys.executable, __file__, "--child"], env=env, cwd=str(ROOT),
+                             capture_output=True, text=True, check=True).stdout
+        sent = {k: v - before[k] for k, v in counts().items()}
+        runs.append((label, json.loads(out.strip().splitlines()[-1]), sent))
+
+    (_, first, cold), (_, second, warm) = runs
+    ok = second == first and not any(warm.values()) and all(cold.values())
+    for label, _, sent in runs:
+        print(f"{label}: Custom Vision {sent['vision']}회, OCR {sent['ocr']}회, GPT {sent['chat']}회")
+    print(f"{'✅' if ok else '❌'} 재시작 뒤 Azure 호출 없음, 결과 {'같음' if second == first else '다름'}")
+    return ok
+
+
+def check_eviction(tmp) -> bool:
+    import pill_cache
+
+    limit = 256 * 1024
+    cache = pill_cache.DiskCache(os.path.join(tmp, "evict.sqlite3"), "evict", limit)
+    value = {"readResult": {"blocks": [{"lines": [{"text": os.urandom(16).hex()} for _ in range(40)]}]}}
+    for i in range(2000):
+        cache.set(f"k{i}", value)
+    cache._evict(cache._conn())
+    size = cache.size_bytes()
+    newest = cache.get("k1999") is not None
+    ok = size <= limit and newest and cache.evicted > 0
+    print(f"{'✅' if ok else '❌'} 크기 상한 {limit // 1024}KB: 남은 {size // 1024}KB, {len(cache)}개, "
+          f"지운 항목 {cache.evicted}개, 최근 항목 {'남음' if newest else '없음'}")
+    return ok
+
+
+def check_encoding() -> bool:
+    import pill_cache
+
+    msgpack, zstandard = pill_cache._get_codecs()
+    samples = {
+        "predictions": [{"probability": 0.9 - i * 0.1, "tagId": f"{i:08x}-0000-0000-0000-000000000000",
+                         "tagName": f"알약{i}", "boundingBox": {"left": 0.1, "top": 0.2,
+                                                              "width": 0.3, "height": 0.4}}
+                        for i in range(8)],
+        "explanation": "이 약은 해열진통제입니다. 복용 전 주의사항을 확인하세요. " * 20,
+    }
+    ok = True
+    codec = f"{'msgpack' if msgpack else 'json'} + {'zstd' if zstandard else 'zlib'}"
+    for name, value in samples.items():
+        blob = pill_cache.encode_value(value)
+        same = pill_cache.decode_value(blob) == value
+        ok &= same
+        plain = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        print(f"{'✅' if same else '❌'} {name} ({codec}): JSON {plain}B → {len(blob)}B")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="디스크 캐시 계층 확인")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="pill-disk-") as tmp:
+        failed |= not check_restart(tmp)
+        failed |= not check_eviction(tmp)
+        failed |= not check_encoding()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
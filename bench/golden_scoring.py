@@ -0,0 +1,129 @@
+"""
+scoring.CandidateScorer가 기존 classify_pill 루프와 같은 태그를 고르는지 확인 + 속도 비교.
+
+골든 세트: mock 태그/각인 + 무작위로 만든 한글·영문 후보 카탈로그와
+OCR 오인식(글자 누락/치환/추가)을 흉내 낸 질의. 시드 고정이라 매번 같은 세트.
+하나라도 다르면 종료 코드 1.
+
+예시:
+    python bench/golden_scoring.py
+    python bench/golden_scoring.py --cases 2000 --catalog 500
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+import mock_azure  # noqa: E402
+import scoring  # noqa: E402
+from newmain import _normalize, _similarity  # noqa: E402
+
+HANGUL = "가나다라마바사아자차카타파하게보린정펜잘큐판콜에이부루알마겔지르텍베아제훼스탈플러밀리그람"
+LATIN = string.ascii_uppercase + string.digits
+
+
+def reference_pick(preds, ocr_norm):
+    """기존 classify_pill 루프 그대로"""
+    base = max(preds, key=lambda x: x["probability"])
+    best_tag, best_prob, best_sim = base["tagName"], base["probability"] * 100, -1.0
+    for p in preds:
+        tag = p["tagName"]
+        prob = p["probability"] * 100
+        sim = _similarity(ocr_norm, _normalize(tag))
+        if sim > best_sim or (sim == best_sim and prob > best_prob):
+            best_sim, best_tag, best_prob = sim, tag, prob
+    return best_tag, best_prob, best_sim
+
+
+def _noisy(text, rnd):
+    """OCR 오인식 흉내: 글자 누락/치환/추가"""
+    chars = list(text)
+    for _ in range(rnd.randint(0, 3)):
+        op = rnd.random()
+        pos = rnd.randrange(len(chars) + 1)
+        if op < 0.33 and chars:
+            del chars[min(pos, len(chars) - 1)]
+        elif op < 0.66 and chars:
+            chars[min(pos, len(chars) - 1)] = rnd.choice(LATIN)
+        else:
+            chars.insert(pos, rnd.choice(LATIN))
+    return "".join(chars)
+
+
+def make_catalog(size, rnd):
+    names = [t for t, _ in mock_azure.MOCK_TAGS]
+    names += [f"{imp} ({t})" for t, imp in mock_azure.MOCK_TAGS]  # 각인 별칭 후보
+    while len(names) < size:
+        if rnd.random() < 0.6:
+            name = "".join(rnd.choice(HANGUL) for _ in range(rnd.randint(3, 14)))
+            name += f"정{rnd.choice([5, 10, 100, 200, 500])}밀리그램"
+        else:
+            name = "".join(rnd.choice(LATIN) for _ in range(rnd.randint(2, 10)))
+        names.append(name)
+    return names[:size]
+
+
+def make_cases(n, catalog, rnd, preds_per_case):
+    cases = []
+    imprints = [imp for _, imp in mock_azure.MOCK_TAGS]
+    for _ in range(n):
+        picked = rnd.sample(catalog, min(preds_per_case, len(catalog)))
+        # 같은 태그 박스가 여러 개 나오는 경우와 확률 동점도 섞음
+        if rnd.random() < 0.3:
+            picked.append(picked[0])
+        probs = [round(rnd.random(), 2) for _ in picked]
+        preds = [{"tagName": t, "probability": p} for t, p in zip(picked, probs)]
+        source = rnd.choice(imprints + picked)
+        ocr = _noisy(source, rnd) if rnd.random() < 0.9 else ""
+        cases.append((preds, _normalize(ocr)))
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벡터화 채점기 골든 세트 검증")
+    parser.add_argument("--cases", type=int, default=1000)
+    parser.add_argument("--catalog", type=int, default=300)
+    parser.add_argument("--preds", type=int, default=200, help="케이스당 후보 수")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    catalog = make_catalog(args.catalog, rnd)
+    cases = make_cases(args.cases, catalog, rnd, args.preds)
+
+    scorer = scoring.CandidateScorer(catalog)
+
+    t0 = time.process_time()
+    expected = [reference_pick(preds, q) for preds, q in cases]
+    t_ref = time.process_time() - t0
+
+    t0 = time.process_time()
+    got = []
+    for preds, q in cases:
+        names = [p["tagName"] for p in preds]
+        probs = [p["probability"] * 100 for p in preds]
+        i, sim = scorer.best(q, names, probs)
+        got.append((names[i], probs[i], sim))
+    t_vec = time.process_time() - t0
+
+    mismatches = [(k, e, g) for k, (e, g) in enumerate(zip(expected, got)) if e != g]
+    print(f"케이스 {len(cases)}개, 후보 {args.preds}개/케이스, 카탈로그 {len(catalog)}개")
+    print(f"기존 루프: {t_ref * 1000:.1f} ms, 벡터화: {t_vec * 1000:.1f} ms "
+          f"({t_ref / t_vec if t_vec else float('inf'):.1f}x)")
+    if mismatches:
+        for k, e, g in mismatches[:10]:
+            print(f"❌ case {k}: 기대 {e} / 결과 {g}")
+        print(f"❌ 불일치 {len(mismatches)}건")
+        sys.exit(1)
+    print("✅ 모든 케이스에서 같은 태그 선택")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+엔트리 포인트 import 시간 예산 검사.
+
+`python -X importtime -c "import newmain"` 을 새 프로세스로 실행해서
+- newmain import 누적 시간이 예산(ms)을 넘는지
+- gradio / openai / requests 같은 무거운 모듈이 import 시점에 딸려 오는지
+를 확인한다. 예산을 넘거나 금지 모듈이 보이면 종료 코드 1 (CI에서 실패 처리).
+
+예시:
+    python bench/importtime.py
+    python bench/importtime.py --module main --budget-ms 80 --top 15
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# import 시점에 절대 불러오면 안 되는 모듈 (첫 사용 시 지연 import)
+FORBIDDEN = ("gradio", "openai", "requests", "PIL", "numpy", "httpx")
+
+
+def run_importtime(module):
+    """-X importtime 출력 파싱 → [(self_us, cumulative_us, name)]"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} 실패:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        rows.append((int(parts[0]), int(parts[1]), parts[2].rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="import 시간 예산 검사")
+    parser.add_argument("--module", default="newmain")
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--runs", type=int, default=5, help="중앙값을 낼 반복 횟수")
+    parser.add_argument("--top", type=int, default=10, help="느린 모듈 상위 N개 출력")
+    args = parser.parse_args()
+
+    totals = []
+    rows = []
+    for _ in range(args.runs):
+        rows = run_importtime(args.module)
+        target = [r for r in rows if r[2].strip() == args.module]
+        totals.append(target[-1][1] / 1000.0 if target else 0.0)
+    total_ms = statistics.median(totals)
+
+    print(f"import {args.module}: {total_ms:.1f} ms (중앙값, {args.runs}회) / 예산 {args.budget_ms:.1f} ms")
+    print(f"느린 모듈 상위 {args.top}개 (self):")
+    for self_us, cum_us, name in sorted(rows, reverse=True)[: args.top]:
+        print(f"  {self_us / 1000.0:8.2f} ms  (누적 {cum_us / 1000.0:8.2f} ms)  {name.strip()}")
+
+    loaded = {name.strip().split(".")[0] for _, _, name in rows}
+    leaked = [m for m in FORBIDDEN if m in loaded]
+
+    failed = False
+    if leaked:
+        print(f"❌ import 시점에 무거운 모듈이 로드됨: {', '.join(leaked)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"❌ 예산 초과: {total_ms:.1f} ms > {args.budget_ms:.1f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ 예산 이내")
+
+
+if __name__ == "__main__":
+    main()
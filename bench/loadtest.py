@@ -0,0 +1,256 @@
+"""
+newmain.analyze_pill 오프라인 부하 테스트.
+
+mock_azure.py 서버를 별도 프로세스로 띄우고 newmain.py가 그쪽을 보도록
+환경 변수를 바꾼 뒤, files/ 이미지를 픽스처로 써서 동시성 N으로 analyze_pill을 돌린다.
+처리량, 지연 백분위수, 요청당 CPU 시간을 JSON으로 저장하고
+--compare로 이전 결과와 비교해 회귀 여부를 확인할 수 있다.
+
+예시:
+    python bench/loadtest.py -c 8 -n 200 --out bench/results/base.json
+    python bench/loadtest.py -c 8 -n 200 --compare bench/results/base.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+import mock_azure  # noqa: E402
+
+FIXTURE_DIR = ROOT / "files"
+IMAGE_EXTS = (".png", ".jpg", ".jpeg")
+
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    """files/ 이미지를 gr.Image(type="pil")가 넘겨주는 형태(RGB PIL)로 로드"""
+    from PIL import Image
+
+    images = []
+    for p in sorted(Path(fixture_dir).iterdir()):
+        if p.suffix.lower() in IMAGE_EXTS:
+            with Image.open(p) as im:
+                images.append((p.name, im.convert("RGB")))
+    if not images:
+        raise SystemExit(f"픽스처 이미지가 없습니다: {fixture_dir}")
+    return images
+
+
+def percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def start_mock(args):
+    """mock 서버를 자식 프로세스로 띄우고 환경 변수 dict 반환"""
+    ctx = mp.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe()
+    proc = ctx.Process(
+        target=mock_azure.serve_in_process,
+        args=(child_conn,),
+        kwargs=dict(
+            vision_latency=args.vision_latency,
+            ocr_latency=args.ocr_latency,
+            chat_latency=args.chat_latency,
+            seed=args.seed,
+        ),
+        daemon=True,
+    )
+    proc.start()
+    env = parent_conn.recv()
+    return proc, env
+
+
+def run_load(fn, images, concurrency, n_requests, warmup):
+    """fn(image)를 동시성 concurrency로 n_requests번 호출하고 측정값 반환"""
+    for i in range(warmup):
+        fn(images[i % len(images)][1])
+
+    latencies = []
+    errors = []
+
+    def one(i):
+        _, img = images[i % len(images)]
+        t0 = time.perf_counter()
+        try:
+            fn(img)
+        except Exception as e:
+            errors.append(repr(e))
+            return
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    cpu0 = time.process_time()
+    wall0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - wall0
+    cpu = time.process_time() - cpu0
+
+    lat = sorted(latencies)
+    return {
+        "requests": n_requests,
+        "ok": len(lat),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_s": wall,
+        "throughput_rps": len(lat) / wall if wall else 0.0,
+        "latency_ms": {
+            "mean": sum(lat) / len(lat) if lat else 0.0,
+            "p50": percentile(lat, 0.50),
+            "p90": percentile(lat, 0.90),
+            "p95": percentile(lat, 0.95),
+            "p99": percentile(lat, 0.99),
+            "max": lat[-1] if lat else 0.0,
+        },
+        "cpu_ms_per_request": cpu * 1000.0 / n_requests if n_requests else 0.0,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except Exception:
+        return ""
+
+
+def compare(current, baseline, tolerance):
+    """p95 지연 / 처리량 / 요청당 CPU를 비교. 회귀 항목 리스트 반환"""
+    checks = [
+        ("latency_ms.p95", current["latency_ms"]["p95"], baseline["latency_ms"]["p95"], True),
+        ("throughput_rps", current["throughput_rps"], baseline["throughput_rps"], False),
+        ("cpu_ms_per_request", current["cpu_ms_per_request"],
+         baseline["cpu_ms_per_request"], True),
+    ]
+    regressions = []
+    for name, cur, base, lower_is_better in checks:
+        if not base:
+            continue
+        change = (cur - base) / base
+        mark = ""
+        worse = change > tolerance if lower_is_better else change < -tolerance
+        if worse:
+            mark = "  <-- 회귀"
+            regressions.append(name)
+        print(f"  {name:22s} {base:10.2f} -> {cur:10.2f} ({change:+.1%}){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="analyze_pill 오프라인 부하 테스트")
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("-n", "--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--vision-latency", default="lognormal:120:0.3")
+    parser.add_argument("--ocr-latency", default="lognormal:250:0.3")
+    parser.add_argument("--chat-latency", default="lognormal:1500:0.4")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixtures", default=str(FIXTURE_DIR))
+    parser.add_argument("--workers", type=int, default=0,
+                        help="0이면 현재 프로세스, N이면 serve.ProcessPipeline 워커 N개로 실행")
+    parser.add_argument("--cache", action="store_true",
+                        help="결과/설명 캐시를 켠 채로 측정 (기본은 꺼서 파이프라인 자체를 측정)")
+    parser.add_argument("--out", help="결과 JSON 저장 경로")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="회귀로 판단할 변화율 (기본 10%%)")
+    args = parser.parse_args()
+
+    proc, env = start_mock(args)
+    os.environ.update(env)
+    if not args.cache:
+        # 픽스처가 몇 장뿐이라 캐시를 켜면 거의 전부 적중 → 기본은 끔
+        os.environ.update({"CACHE_BACKEND": "memory",
+                           "RESULT_CACHE_SIZE": "0", "EXPLAIN_CACHE_SIZE": "0"})
+
+    # 환경 변수를 바꾼 뒤에 import 해야 mock 서버를 바라본다
+    import newmain
+
+    images = load_fixtures(args.fixtures)
+    print(f"픽스처 {len(images)}장, 동시성 {args.concurrency}, 요청 {args.requests}회")
+
+    pipeline = None
+    fn = newmain.analyze_pill
+    if args.workers:
+        import serve
+
+        pipeline = serve.ProcessPipeline(args.workers)
+        pipeline.start()
+        fn = pipeline.analyze
+        print(f"워커 프로세스 {args.workers}개")
+
+    try:
+        stats = run_load(fn, images, args.concurrency, args.requests, args.warmup)
+    finally:
+        if pipeline:
+            pipeline.shutdown()
+        proc.terminate()
+
+    result = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "cache": args.cache,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "vision_latency": args.vision_latency,
+            "ocr_latency": args.ocr_latency,
+            "chat_latency": args.chat_latency,
+            "fixtures": [name for name, _ in images],
+            # 워커 모드에서는 워커 프로세스 CPU가 process_time()에 잡히지 않음
+            "cpu_scope": "driver_only" if args.workers else "process",
+        },
+        **stats,
+    }
+    if not args.workers:
+        # 신뢰도 게이트별 건너뛴 횟수 / 추정 절약 (워커 모드에서는 워커 프로세스 안에서만 셈)
+        result["gates"] = newmain.gating.stats.snapshot()
+
+    lat = result["latency_ms"]
+    print(f"처리량: {result['throughput_rps']:.2f} req/s, "
+          f"오류: {result['errors']}건")
+    print(f"지연(ms): p50 {lat['p50']:.1f} / p90 {lat['p90']:.1f} / "
+          f"p95 {lat['p95']:.1f} / p99 {lat['p99']:.1f} / max {lat['max']:.1f}")
+    print(f"요청당 CPU: {result['cpu_ms_per_request']:.2f} ms")
+    if "gates" in result:
+        print(f"게이트: {newmain.gating.report()}")
+
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"비교 대상: {args.compare}")
+        if compare(result, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+요청당 메모리 확인 (tracemalloc).
+
+mock 서버를 띄우고 캐시를 끈 채로 files/ 픽스처와 큰 합성 사진(휴대폰 원본 크기)을
+UI 경로(파일 경로)로 analyze_pill에 한 장씩 넣고, 요청 하나가 Python 힙을 얼마나 더 썼는지
+(tracemalloc 최고치 - 시작 시점) 잰다. --max-mb를 넘는 요청이 있으면 종료 코드 1.
+
+PIL 픽셀 버퍼는 tracemalloc에 안 잡히므로 그쪽은 bufpool.budget 예약 최고치(추정)로 따로 보여 주고,
+동시 요청 -c개를 WORKER_MEMORY_MB 예산 안에서 돌려 예약 합이 예산을 넘지 않는지도 확인한다.
+
+예시:
+    python bench/memory.py
+    python bench/memory.py --max-mb 16 -c 8 --budget-mb 128
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+import mock_azure  # noqa: E402
+
+FIXTURE_DIR = ROOT / "files"
+IMAGE_EXTS = (".png", ".jpg", ".jpeg")
+
+
+def make_phone_photo(path, size=(4032, 3024), quality=92):
+    """휴대폰 원본 크기 JPEG (노이즈가 섞여 있어 파일이 큼)"""
+    from PIL import Image
+
+    src = next(p for p in sorted(FIXTURE_DIR.iterdir()) if p.suffix.lower() in IMAGE_EXTS)
+    with Image.open(src) as im:
+        big = im.convert("RGB").resize(size)
+    noise = Image.effect_noise(size, 40).convert("RGB")
+    Image.blend(big, noise, 0.15).save(path, "JPEG", quality=quality)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="요청당 메모리 확인")
+    parser.add_argument("--max-mb", type=float, default=8.0, help="요청당 Python 힙 최고치 상한")
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--budget-mb", type=int, default=160, help="동시 실행 확인용 WORKER_MEMORY_MB")
+    args = parser.parse_args()
+
+    servers = mock_azure.start_servers()
+    os.environ.update(mock_azure.mock_env(servers))
+    os.environ.update({"CACHE_BACKEND": "memory", "RESULT_CACHE_SIZE": "0", "EXPLAIN_CACHE_SIZE": "0",
+                       "DRUG_DB_PATH": str(BENCH_DIR / "results" / "no-drug-db.sqlite3"),
+                       "PROMPT_USAGE_LOG": os.devnull,
+                       "WORKER_MEMORY_MB": str(args.budget_mb)})
+
+    import bufpool
+    import newmain
+
+    tmp = tempfile.mkdtemp(prefix="pill-mem-")
+    phone = os.path.join(tmp, "phone.jpg")
+    make_phone_photo(phone)
+    paths = [str(p) for p in sorted(FIXTURE_DIR.iterdir()) if p.suffix.lower() in IMAGE_EXTS]
+    paths.append(phone)
+
+    newmain.analyze_pill(paths[0])  # import / 클라이언트 생성 / 버퍼 풀 채우기
+
+    failed = False
+    tracemalloc.start()
+    print(f"{'이미지':24s} {'파일':>8s} {'Python 힙 최고치':>16s} {'예약 추정':>10s}")
+    for path in paths:
+        budget_before = bufpool.budget.peak
+        bufpool.budget.peak = 0
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        header, _ = newmain.analyze_pill(path)
+        _, peak = tracemalloc.get_traced_memory()
+        used = (peak - start) / 1024 / 1024
+        reserved = bufpool.budget.peak / 1024 / 1024
+        bufpool.budget.peak = max(budget_before, bufpool.budget.peak)
+        ok = used <= args.max_mb and not header.startswith("이미지")
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {os.path.basename(path):22s} {os.path.getsize(path) / 1024:7.0f}K "
+              f"{used:14.1f}MB {reserved:8.1f}MB")
+    tracemalloc.stop()
+    print(f"버퍼 풀: 새로 만든 버퍼 {bufpool.pool.created}개, 재사용 {bufpool.pool.reused}회")
+
+    # 동시 요청: 예약 합이 워커 예산을 넘지 않아야 함 (내용이 다른 사진이어야 요청 합치기에 안 걸림)
+    phones = []
+    for i in range(args.concurrency):
+        phones.append(os.path.join(tmp, f"phone{i}.jpg"))
+        make_phone_photo(phones[-1], quality=80 + i % 15)
+    bufpool.budget.peak = 0
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        headers = list(pool.map(lambda p: newmain.analyze_pill(p)[0], phones))
+    wall = time.perf_counter() - t0
+    over = bufpool.budget.peak > bufpool.budget.limit
+    errors = sum(h.startswith(("요청이", "이미지")) for h in headers)
+    failed |= over or bool(errors)
+    print(f"{'❌' if over or errors else '✅'} 동시 {args.concurrency}건 (예산 {args.budget_mb}MB): "
+          f"예약 최고 {bufpool.budget.peak / 1024 / 1024:.1f}MB, 기다린 요청 {bufpool.budget.waited}, "
+          f"오류 {errors}, {wall:.2f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+newmain.py CPU 핫패스 마이크로벤치마크.
+
+- PIL → JPEG 인코딩 (해상도별)
+- _normalize / _similarity (실제 OCR·태그 이름 길이별)
+- Custom Vision predictions JSON 파싱 + top1 선택
+- ocr_pill_text의 readResult block/line 평탄화
+
+항목마다 ns/op, op당 최대 할당 바이트(tracemalloc peak), op당 순증 메모리 블록 수를 출력한다.
+
+예시:
+    python bench/micro.py
+    python bench/micro.py -k similarity --json bench/results/micro.json
+"""
+import argparse
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+import mock_azure  # noqa: E402
+
+FIXTURE = ROOT / "files" / "test1.jpg"
+RESOLUTIONS = [640, 1280, 2048, 4032]
+
+# 실제 OCR 결과 / 태그 이름 길이대를 흉내 낸 입력
+OCR_SAMPLES = {
+    "short": "IDG",
+    "medium": "TYLENOL 500",
+    "long": ("TYLENOL 500 ER 8HR ARTHRITIS PAIN EXTENDED RELEASE "
+             "ACETAMINOPHEN CAPLETS 650MG LOT 2024A EXP 2026 MADE IN KOREA")[:120],
+}
+TAG_SAMPLES = {
+    "short": "게보린정",
+    "medium": "타이레놀정500밀리그람(아세트아미노펜)",
+    "long": "아스피린프로텍트정100밀리그램(아세틸살리실산) 장용코팅정 BAYER 100 ASPIRIN",
+}
+
+
+# 측정 도구
+
+def _calibrate(fn, target_s):
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        if time.perf_counter() - t0 >= target_s or n >= 1 << 24:
+            return n
+        n *= 2
+
+
+def measure(fn, target_s=0.3, repeat=5):
+    """ns/op(중앙값), op당 peak 할당 바이트, op당 순증 블록 수"""
+    fn()  # 워밍업 (캐시/지연 import 제외)
+    n = _calibrate(fn, target_s / repeat)
+
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        for _ in range(n):
+            fn()
+        runs.append((time.perf_counter_ns() - t0) / n)
+    runs.sort()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    k = min(n, 1000)
+    gc.collect()
+    blocks0 = sys.getallocatedblocks()
+    for _ in range(k):
+        fn()
+    blocks1 = sys.getallocatedblocks()
+
+    return {
+        "ns_per_op": runs[len(runs) // 2],
+        "ns_min": runs[0],
+        "iterations": n,
+        "peak_bytes_per_op": max(0, peak - base),
+        "net_blocks_per_op": (blocks1 - blocks0) / k,
+    }
+
+
+# 벤치마크 대상
+
+def bench_jpeg_encode():
+    from PIL import Image
+
+    with Image.open(FIXTURE) as src:
+        src = src.convert("RGB")
+    cases = {}
+    for edge in RESOLUTIONS:
+        img = src.copy()
+        img.thumbnail((edge, edge))
+
+        def op(img=img):
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG")
+            return buf.getvalue()
+
+        cases[f"jpeg_encode/{img.width}x{img.height}"] = (op, 0.6)
+    return cases
+
+
+def bench_text():
+    import newmain
+
+    cases = {}
+    for name, text in OCR_SAMPLES.items():
+        cases[f"normalize/ocr_{name}"] = (lambda t=text: newmain._normalize(t), 0.3)
+    for name, text in TAG_SAMPLES.items():
+        cases[f"normalize/tag_{name}"] = (lambda t=text: newmain._normalize(t), 0.3)
+
+    for oname, otext in OCR_SAMPLES.items():
+        for tname, ttext in TAG_SAMPLES.items():
+            a, b = newmain._normalize(otext), newmain._normalize(ttext)
+            cases[f"similarity/ocr_{oname}-tag_{tname}"] = (
+                lambda a=a, b=b: newmain._similarity(a, b), 0.3)
+    return cases
+
+
+def bench_parsing():
+    import newmain
+
+    cases = {}
+    for n_preds in (10, 50, 200):
+        body = json.dumps(mock_azure.detect_response(b"bench", n_preds),
+                          ensure_ascii=False).encode("utf-8")
+
+        def op(body=body):
+            preds = json.loads(body).get("predictions", [])
+            return max(preds, key=lambda x: x["probability"])
+
+        cases[f"predictions_parse/{n_preds}"] = (op, 0.3)
+
+    read = mock_azure.read_response(b"bench")
+    many = {"readResult": {"blocks": [
+        {"lines": [{"text": f" LINE{i}-{j} "} for j in range(8)]} for i in range(10)
+    ]}}
+    cases["read_flatten/1x1"] = (lambda: newmain._flatten_read_result(read), 0.3)
+    cases["read_flatten/10x8"] = (lambda: newmain._flatten_read_result(many), 0.3)
+    return cases
+
+
+SUITES = [bench_jpeg_encode, bench_text, bench_parsing]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="newmain.py 핫패스 마이크로벤치마크")
+    parser.add_argument("-k", "--filter", default="", help="이름에 이 문자열이 포함된 항목만")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'benchmark':48s} {'ns/op':>14s} {'peak B/op':>12s} {'blocks/op':>10s}")
+    for suite in SUITES:
+        for name, (fn, target) in suite().items():
+            if args.filter and args.filter not in name:
+                continue
+            r = measure(fn, target_s=target, repeat=args.repeat)
+            results[name] = r
+            print(f"{name:48s} {r['ns_per_op']:14,.0f} "
+                  f"{r['peak_bytes_per_op']:12,d} {r['net_blocks_per_op']:10.2f}")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Azure 서비스 대역(mock) 서버.
+
+Custom Vision detect / Image Analysis(readResult) / Azure OpenAI chat completions
+응답 형식을 흉내 내는 로컬 HTTP 서버 3개를 띄운다.
+실제 Azure 쿼터를 쓰지 않고 newmain.py 성능을 측정하기 위한 용도.
+
+지연 시간 분포 표기법:
+    const:50             항상 50ms
+    uniform:20:80        20~80ms 균등분포
+    normal:60:15         평균 60ms, 표준편차 15ms
+    lognormal:60:0.4     중앙값 60ms, sigma 0.4
+
+단독 실행:
+    python bench/mock_azure.py --vision-latency lognormal:120:0.3
+"""
+import argparse
+import functools
+import hashlib
+import io
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 실제 프로젝트와 비슷한 한글 태그 이름 + 각인(OCR) 문자열
+MOCK_TAGS = [
+    ("타이레놀정500밀리그람(아세트아미노펜)", "TYLENOL 500"),
+    ("게보린정", "GEWORIN"),
+    ("펜잘큐정", "PQ"),
+    ("판콜에이내복액", "PANCOL A"),
+    ("부루펜정200밀리그램", "IBU 200"),
+    ("아스피린프로텍트정100밀리그램", "BAYER 100"),
+    ("베아제정", "BEA"),
+    ("훼스탈플러스정", "FESTAL"),
+    ("지르텍정", "Y/Y"),
+    ("알마겔정", "ALMAGEL"),
+]
+
+
+# 지연 시간 분포
+
+def parse_latency(spec: str):
+    """'lognormal:60:0.4' 같은 문자열을 ms 단위 샘플 함수로 변환"""
+    kind, *args = spec.split(":")
+    vals = [float(a) for a in args]
+
+    if kind == "const":
+        return lambda rnd: vals[0]
+    if kind == "uniform":
+        return lambda rnd: rnd.uniform(vals[0], vals[1])
+    if kind == "normal":
+        return lambda rnd: max(0.0, rnd.gauss(vals[0], vals[1]))
+    if kind == "lognormal":
+        mu = math.log(max(vals[0], 1e-3))
+        return lambda rnd: rnd.lognormvariate(mu, vals[1])
+    raise ValueError(f"알 수 없는 지연 분포: {spec}")
+
+
+# 응답 생성
+
+def _pick(body: bytes):
+    """이미지 바이트 해시로 결정적인 (태그, 각인) 선택"""
+    h = int.from_bytes(hashlib.sha1(body).digest()[:4], "big")
+    return h, MOCK_TAGS[h % len(MOCK_TAGS)]
+
+
+class Recognizer:
+    """
+    해상도에 민감한 가짜 인식기 (bench/tune_profiles.py 용).
+    기본 mock은 바이트 해시로 답을 고르므로 크기/품질만 바꿔도 답이 바뀐다.
+    이 인식기는 등록한 픽스처 중 가장 비슷한 그림(16x16 흑백 썸네일 거리)을 찾아
+    그 픽스처의 정해진 답을 주고, 짧은 변이 min_edge보다 작으면 인식 실패를 흉내 낸다.
+    """
+
+    def __init__(self, images, min_edge: int):
+        self.refs = [self._thumb(im) for im in images]
+        self.min_edge = min_edge
+
+    @staticmethod
+    def _thumb(im):
+        from PIL import Image
+
+        return im.convert("L").resize((16, 16), Image.BOX).tobytes()
+
+    def pick(self, body: bytes):
+        """가장 가까운 픽스처 번호, 너무 작거나 못 읽으면 None"""
+        from PIL import Image
+
+        try:
+            with Image.open(io.BytesIO(body)) as im:
+                if min(im.size) < self.min_edge:
+                    return None
+                thumb = self._thumb(im)
+        except Exception:
+            return None
+        dists = [sum((a - b) ** 2 for a, b in zip(thumb, ref)) for ref in self.refs]
+        return dists.index(min(dists))
+
+
+def detect_response(body: bytes, n_preds: int = 8, recognizer=None) -> dict:
+    h, (tag, _) = _pick(body)
+    if recognizer is not None:
+        idx = recognizer.pick(body)
+        if idx is not None:
+            tag = MOCK_TAGS[idx % len(MOCK_TAGS)][0]
+    rnd = random.Random(h)
+    preds = []
+    for i in range(n_preds):
+        name = tag if i == 0 else MOCK_TAGS[(h + i) % len(MOCK_TAGS)][0]
+        prob = 0.92 if i == 0 else rnd.uniform(0.01, 0.4)
+        preds.append({
+            "probability": prob,
+            "tagId": hashlib.md5(name.encode("utf-8")).hexdigest(),
+            "tagName": name,
+            "boundingBox": {
+                "left": rnd.uniform(0, 0.5),
+                "top": rnd.uniform(0, 0.5),
+                "width": rnd.uniform(0.1, 0.5),
+                "height": rnd.uniform(0.1, 0.5),
+            },
+        })
+    return {
+        "id": hashlib.md5(body).hexdigest(),
+        "project": "mock-project",
+        "iteration": "mock-iteration",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "predictions": preds,
+    }
+
+
+def read_response(body: bytes, recognizer=None) -> dict:
+    _, (_, imprint) = _pick(body)
+    if recognizer is not None:
+        idx = recognizer.pick(body)
+        imprint = MOCK_TAGS[idx % len(MOCK_TAGS)][1] if idx is not None else ""
+    words = imprint.split()
+    return {
+        "modelVersion": "2023-10-01",
+        "metadata": {"width": 1024, "height": 1024},
+        "readResult": {
+            "blocks": [] if not imprint else [{
+                "lines": [{
+                    "text": imprint,
+                    "boundingPolygon": [{"x": 10, "y": 10}, {"x": 90, "y": 10},
+                                        {"x": 90, "y": 40}, {"x": 10, "y": 40}],
+                    "words": [{"text": w, "confidence": 0.98} for w in words],
+                }],
+            }],
+        },
+    }
+
+
+MOCK_ANSWER = (
+    "- 어떤 약인지: 해열·진통 성분이 들어 있는 일반의약품입니다.\n"
+    "- 효능: 두통, 치통, 생리통 등의 통증 완화와 해열에 쓰입니다.\n"
+    "- 복용 방법: 성인 기준 1회 1정, 4~6시간 간격으로 복용합니다.\n"
+    "- 주의사항: 음주 후 복용을 피하고 하루 최대 용량을 지켜 주세요.\n"
+    "정확한 복약 안내는 약사·의사와 상의해 주세요."
+)
+
+
+def chat_response(body: bytes) -> dict:
+    try:
+        req = json.loads(body or b"{}")
+    except ValueError:
+        req = {}
+    content = MOCK_ANSWER
+    # 대략 2글자에 1토큰
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in req.get("messages", [])) // 2 or 300
+    max_tokens = req.get("max_tokens")
+    if max_tokens:
+        content = content[: max_tokens * 2]
+    if req.get("stream"):
+        return _chat_chunks(req, content)
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": req.get("model", "mock-deployment"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 2,
+                  "total_tokens": prompt_tokens + len(content) // 2},
+    }
+
+
+def _chat_chunks(req, content, size=8):
+    """stream=True 요청: SSE로 보낼 chat.completion.chunk 목록 (size글자씩)"""
+    base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": req.get("model", "mock-deployment")}
+    chunks = [
+        {**base, "choices": [{"index": 0, "delta": {"content": content[i:i + size]},
+                              "finish_reason": None}]}
+        for i in range(0, len(content), size)
+    ]
+    chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+    return chunks
+
+
+# HTTP 서버
+
+def _make_handler(name: str, respond, latency, seed: int, uplink_mbps: float = None):
+    rnd = random.Random(seed)
+    rnd_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        requests = 0  # 받은 요청 수 (bench/coalesce.py에서 확인)
+        disconnected = 0  # 스트리밍 도중 클라이언트가 끊은 수 (추측 실행 취소)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            with rnd_lock:
+                Handler.requests += 1
+                delay_ms = latency(rnd)
+            if uplink_mbps:
+                # 업로드 대역폭 흉내: 보낸 바이트만큼 추가 지연
+                delay_ms += len(body) * 8 / (uplink_mbps * 1000.0)
+            result = respond(body)
+            if isinstance(result, list):
+                self._stream(result, delay_ms)
+                return
+            time.sleep(delay_ms / 1000.0)
+
+            payload = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _stream(self, chunks, delay_ms):
+            """SSE 응답. 첫 조각까지 지연의 20%, 나머지 조각에 80%를 나눠서 보냄"""
+            time.sleep(delay_ms * 0.2 / 1000.0)
+            gap = delay_ms * 0.8 / 1000.0 / max(len(chunks), 1)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            events = [f"data: {json.dumps(c, ensure_ascii=False)}\n\n" for c in chunks]
+            events.append("data: [DONE]\n\n")
+            try:
+                for i, event in enumerate(events):
+                    if i:
+                        time.sleep(gap)
+                    data = event.encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                with rnd_lock:
+                    Handler.disconnected += 1
+            self.close_connection = True  # 스트림 응답 뒤에는 연결을 닫음
+
+        def log_message(self, fmt, *args):
+            # 벤치마크 중에는 접근 로그 출력 안 함
+            pass
+
+    Handler.__name__ = f"{name}Handler"
+    return Handler
+
+
+def start_servers(host="127.0.0.1", vision_latency="const:0", ocr_latency="const:0",
+                  chat_latency="const:0", seed=0, uplink_mbps=None,
+                  detect_recognizer=None, ocr_recognizer=None):
+    """세 서버를 백그라운드 스레드로 띄우고 {이름: (서버, base_url)} 반환"""
+    specs = {
+        "vision": (functools.partial(detect_response, recognizer=detect_recognizer),
+                   parse_latency(vision_latency)),
+        "ocr": (functools.partial(read_response, recognizer=ocr_recognizer),
+                parse_latency(ocr_latency)),
+        "chat": (chat_response, parse_latency(chat_latency)),
+    }
+    servers = {}
+    for i, (name, (respond, latency)) in enumerate(specs.items()):
+        srv = ThreadingHTTPServer((host, 0), _make_handler(name, respond, latency, seed + i,
+                                                           uplink_mbps))
+        srv.daemon_threads = True
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers[name] = (srv, f"http://{host}:{srv.server_address[1]}")
+    return servers
+
+
+def mock_env(servers, deployment="mock-deployment") -> dict:
+    """newmain.py가 읽는 환경 변수를 mock 서버 주소로 채운 dict"""
+    vision_url = servers["vision"][1]
+    return {
+        "PREDICTION_URL": vision_url + "/customvision/v3.0/Prediction/mock-project"
+                                       "/detect/iterations/Iteration1/image",
+        "PREDICTION_KEY": "mock-key",
+        "AZURE_VISION_ENDPOINT": servers["ocr"][1] + "/",
+        "AZURE_VISION_KEY": "mock-key",
+        "AZURE_OPENAI_ENDPOINT": servers["chat"][1] + "/",
+        "AZURE_OPENAI_KEY": "mock-key",
+        "AZURE_OPENAI_API_KEY": "mock-key",
+        "DEPLOYMENT_NAME": deployment,
+        "DISK_CACHE_PATH": "",  # .env에서 켜 두었더라도 측정할 때는 이전 실행의 디스크 캐시를 쓰지 않음
+    }
+
+
+def serve_in_process(conn, **kwargs):
+    """multiprocessing 자식 프로세스용 진입점. 환경 변수 dict를 파이프로 돌려준다."""
+    servers = start_servers(**kwargs)
+    conn.send(mock_env(servers))
+    conn.close()
+    threading.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Azure mock 서버 실행")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--vision-latency", default="lognormal:120:0.3")
+    parser.add_argument("--ocr-latency", default="lognormal:250:0.3")
+    parser.add_argument("--chat-latency", default="lognormal:1500:0.4")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    servers = start_servers(args.host, args.vision_latency, args.ocr_latency,
+                            args.chat_latency, args.seed)
+    print("mock 서버 실행 중 (Ctrl+C로 종료). 아래 값을 환경 변수로 쓰세요:")
+    for k, v in mock_env(servers).items():
+        print(f"{k}={v}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+serve.py 워커 수에 따른 처리량 측정.
+
+mock 서버를 띄우고 워커 수(--workers 1,2,4)마다 serve.ProcessPipeline을 새로 만들어
+동시성 = 워커 수 × 워커 스레드 수로 analyze를 돌린다. 워커 수당 처리량, 1워커 대비 효율
+(처리량 / (워커 수 × 1워커 처리량)), 워커별로 가져간 요청 수를 출력한다.
+요청이 한 워커에 몰리지 않는지(최대 / 평균)도 같이 본다. 오류가 있으면 종료 코드 1.
+--min-efficiency를 주면 효율이 그보다 낮을 때도 1 (CPU 코어 수보다 워커가 많으면 낮게 나옴).
+
+예시:
+    python bench/serve_scaling.py
+    python bench/serve_scaling.py --workers 1,2,4,8 --threads 8 --per-worker 64 --out bench/results/scaling.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+from loadtest import load_fixtures, run_load, start_mock  # noqa: E402
+
+
+def measure(serve, images, workers, threads, per_worker):
+    pipeline = serve.ProcessPipeline(workers, threads)
+    pipeline.start()
+    try:
+        stats = run_load(pipeline.analyze, images, workers * threads, workers * per_worker, warmup=workers)
+        counts = sorted(pipeline.started.values(), reverse=True)
+    finally:
+        pipeline.shutdown()
+    stats["per_worker_tasks"] = counts
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serve.py 워커 수별 처리량")
+    parser.add_argument("--workers", default="1,2,4", help="쉼표로 구분한 워커 수 목록")
+    parser.add_argument("--threads", type=int, default=None, help="워커당 스레드 (기본 serve.WORKER_THREADS)")
+    parser.add_argument("--per-worker", type=int, default=32, help="워커 하나당 요청 수")
+    parser.add_argument("--vision-latency", default="lognormal:120:0.3")
+    parser.add_argument("--ocr-latency", default="lognormal:250:0.3")
+    parser.add_argument("--chat-latency", default="lognormal:1500:0.4")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-efficiency", type=float, default=0.0)
+    parser.add_argument("--out", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    proc, env = start_mock(args)
+    os.environ.update(env)
+    # 픽스처 몇 장이 캐시에 다 걸리지 않도록 캐시는 끄고 파이프라인 자체를 측정 (loadtest.py와 같음)
+    os.environ.update({"CACHE_BACKEND": "memory", "RESULT_CACHE_SIZE": "0", "EXPLAIN_CACHE_SIZE": "0"})
+
+    import serve
+
+    threads = args.threads or serve.WORKER_THREADS
+    images = load_fixtures()
+    counts = [int(w) for w in args.workers.split(",")]
+    print(f"CPU {os.cpu_count()}개, 워커당 스레드 {threads}, 워커당 요청 {args.per_worker}회")
+
+    rows = []
+    failed = False
+    try:
+        for workers in counts:
+            stats = measure(serve, images, workers, threads, args.per_worker)
+            rows.append({"workers": workers, **stats})
+    finally:
+        proc.terminate()
+
+    base = rows[0]["throughput_rps"] / rows[0]["workers"] if rows and rows[0]["throughput_rps"] else 0.0
+    for row in rows:
+        row["efficiency"] = row["throughput_rps"] / (row["workers"] * base) if base else 0.0
+        tasks = row["per_worker_tasks"]
+        spread = max(tasks) / (sum(tasks) / len(tasks)) if tasks else 0.0
+        bad = row["errors"] or row["efficiency"] < args.min_efficiency
+        failed |= bool(bad)
+        print(f"{'❌' if bad else '✅'} 워커 {row['workers']}개: {row['throughput_rps']:.2f} req/s, "
+              f"효율 {row['efficiency']:.0%}, p95 {row['latency_ms']['p95']:.0f} ms, 오류 {row['errors']}, "
+              f"워커별 요청 {tasks} (최대/평균 {spread:.2f})")
+
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "cpu_count": os.cpu_count(),
+                       "threads": threads, "runs": rows}, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.out}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
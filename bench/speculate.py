@@ -0,0 +1,92 @@
+"""
+설명 미리 만들기(speculative.py) 효과 측정.
+
+캐시를 비운 상태에서 files/ 픽스처를 한 장씩 analyze_pill에 넣어
+SPECULATIVE 끔 / 켬의 요청 지연과 적중률, 취소된 스트림 수를 비교한다.
+켰을 때 결과(약 이름)가 달라지거나 적중한 요청이 빨라지지 않으면 종료 코드 1.
+
+예시:
+    python bench/speculate.py
+    python bench/speculate.py --ocr-latency const:800 --chat-latency const:2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+import mock_azure  # noqa: E402
+from loadtest import load_fixtures  # noqa: E402
+
+
+def run_once(newmain, images):
+    results, lat = [], []
+    for _, img in images:
+        newmain.result_cache.clear()
+        newmain.explain_cache.clear()
+        newmain.prediction_cache.clear()
+        newmain.ocr_cache.clear()
+        t0 = time.perf_counter()
+        results.append(newmain.analyze_pill(img))
+        lat.append((time.perf_counter() - t0) * 1000.0)
+    return results, lat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="설명 미리 만들기 효과 측정")
+    parser.add_argument("--vision-latency", default="const:150")
+    parser.add_argument("--ocr-latency", default="const:400")
+    parser.add_argument("--chat-latency", default="const:1200")
+    parser.add_argument("--threshold", type=float, default=80.0, help="SPECULATE_ABOVE")
+    args = parser.parse_args()
+
+    servers = mock_azure.start_servers(vision_latency=args.vision_latency,
+                                       ocr_latency=args.ocr_latency,
+                                       chat_latency=args.chat_latency)
+    os.environ.update(mock_azure.mock_env(servers))
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ["DRUG_DB_PATH"] = str(BENCH_DIR / "results" / "no-drug-db.sqlite3")  # 설명은 GPT 경로로
+    os.environ["PROMPT_USAGE_LOG"] = os.devnull
+
+    import newmain
+    import speculative
+
+    speculative.SPECULATE_ABOVE = args.threshold
+    images = load_fixtures()
+    chat = servers["chat"][0].RequestHandlerClass
+
+    speculative.SPECULATIVE = False
+    base_results, base_lat = run_once(newmain, images)
+
+    speculative.SPECULATIVE = True
+    before = chat.requests
+    spec_results, spec_lat = run_once(newmain, images)
+    time.sleep(0.5)  # 끊긴 스트림이 mock 쪽에 집계될 때까지
+    snap = speculative.stats.snapshot()
+
+    same = [a[0].split(" (")[0] == b[0].split(" (")[0] for a, b in zip(base_results, spec_results)]
+    print(f"픽스처 {len(images)}장 (Custom Vision {args.vision_latency}, OCR {args.ocr_latency}, "
+          f"GPT {args.chat_latency})")
+    print(f"끔: 평균 {statistics.mean(base_lat):.0f} ms / 켬: 평균 {statistics.mean(spec_lat):.0f} ms")
+    print(f"추측 {snap['started']}회, 적중 {snap['hits']}, 실패 {snap['misses']} "
+          f"(적중률 {snap['hit_rate']:.0%}), 에러 {snap['failed']}, 겹친 시간 {snap['overlap_s']:.1f}s")
+    print(f"GPT 요청 {chat.requests - before}회, 중간에 끊은 스트림 {chat.disconnected}회")
+
+    ok = all(same)
+    if not ok:
+        print("❌ 켰을 때 약 이름이 달라진 요청이 있습니다")
+    if snap["hits"] and statistics.mean(spec_lat) >= statistics.mean(base_lat):
+        print("❌ 적중했는데 빨라지지 않았습니다")
+        ok = False
+    print("✅ 통과" if ok else "❌ 실패")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+백엔드별 이미지 프로필 자동 조정 (image_profile.py).
+
+픽스처(files/)를 최대 변 길이 / 포맷 / JPEG 품질 조합마다 인코딩해서 백엔드에 보내 보고,
+top-1 정확도가 기준보다 --tolerance 이상 떨어지지 않는 조합 중 평균 전송 바이트가 가장 작은 것을 고른다.
+백엔드별로 절약한 바이트와 지연 변화를 출력하고, --live --write면 image_profiles.json에 저장한다.
+
+기준 답: --labels JSON({"파일명": "태그"}, detect만)이 있으면 그것, 없으면 지금 설정(원본 크기, JPEG 75)의 답.
+OCR 답은 정규화한 글자(newmain._normalize)를 비교한다.
+
+기본은 mock 서버(mock_azure.Recognizer: 작은 이미지는 인식 실패, --uplink-mbps로 업로드 시간 흉내)로 돌고,
+--live면 환경 변수의 실제 Azure 엔드포인트에 보낸다 (조합 수 x 픽스처 수만큼 호출하니 격자를 줄여서).
+자르기(center / detection)는 mock이 그림 전체로 답을 찾기 때문에 --live에서만 시험한다.
+mock 결과는 MOCK_MIN_EDGE에 맞춘 값이라 --write는 --live와 함께만 쓸 수 있다.
+
+예시:
+    python bench/tune_profiles.py
+    python bench/tune_profiles.py --tolerance 0.05
+    python bench/tune_profiles.py --live --max-edges 1600,1024,768 --qualities 85,70 --write
+    python bench/tune_profiles.py --live --max-edges 1600,1024,768 --qualities 85,70 --out bench/results/tune.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+import mock_azure  # noqa: E402
+from loadtest import FIXTURE_DIR, load_fixtures  # noqa: E402
+
+BACKENDS = ("detect", "ocr")
+FORMATS = {"detect": ("JPEG", "PNG"), "ocr": ("JPEG", "PNG", "WEBP")}
+
+# mock 인식기가 인식 실패로 처리하는 짧은 변 길이 (OCR은 글자라서 더 큰 입력이 필요하다고 가정)
+MOCK_MIN_EDGE = {"detect": 224, "ocr": 480}
+
+
+def _ints(text):
+    return [int(x) if x not in ("0", "none") else None for x in text.split(",") if x]
+
+
+def candidates(backend, max_edges, qualities, crops):
+    for crop in crops:
+        for edge in max_edges:
+            for fmt in FORMATS[backend]:
+                if crop == "detection" and backend != "ocr":
+                    continue
+                for q in (qualities if fmt != "PNG" else [None]):
+                    yield {"max_edge": edge, "format": fmt, "quality": q, "crop": crop}
+
+
+def run_detect(newmain, image_profile, image, profile):
+    """(top-1 태그, top-1 박스, 전송 바이트, 지연 ms)"""
+    cfg = newmain.config.current()
+    t0 = time.perf_counter()
+    body = image_profile.encode(image, profile)
+    resp = cfg.session().post(
+        newmain.prediction_url(cfg=cfg),
+        headers={"Content-Type": "application/octet-stream", "Prediction-Key": cfg.prediction_key},
+        data=body, timeout=30,
+    )
+    resp.raise_for_status()
+    preds = resp.json().get("predictions", [])
+    ms = (time.perf_counter() - t0) * 1000.0
+    if not preds:
+        return None, None, len(body), ms
+    top = max(preds, key=lambda x: x["probability"])
+    return top["tagName"], top.get("boundingBox"), len(body), ms
+
+
+def _without_box(result):
+    tag, _, size, ms = result
+    return tag, size, ms
+
+
+def run_ocr(newmain, image_profile, image, profile, box):
+    t0 = time.perf_counter()
+    text = newmain.ocr_pill_text(image, box=box, profile=profile)
+    ms = (time.perf_counter() - t0) * 1000.0
+    return newmain._normalize(text), len(image_profile.encode(image, profile, box)), ms
+
+
+def measure(run, images, profile, expected, repeat):
+    answers, sizes, times = [], [], []
+    for _ in range(repeat):
+        for i, (_, img) in enumerate(images):
+            answer, size, ms = run(i, img, profile)
+            answers.append(answer == expected[i])
+            sizes.append(size)
+            times.append(ms)
+    return {
+        "profile": profile,
+        "accuracy": sum(answers) / len(answers),
+        "mean_bytes": sum(sizes) / len(sizes),
+        "mean_ms": sum(times) / len(times),
+    }
+
+
+def tune(run, images, expected, grid, tolerance, repeat):
+    import image_profile
+
+    base = measure(run, images, dict(image_profile.DEFAULT), expected, repeat)
+    rows = [measure(run, images, p, expected, repeat) for p in grid]
+    ok = [r for r in rows if r["accuracy"] >= base["accuracy"] - tolerance]
+    best = min(ok + [base], key=lambda r: r["mean_bytes"])
+    return base, best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="백엔드별 이미지 프로필 자동 조정")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--fixtures", default=str(FIXTURE_DIR))
+    parser.add_argument("--labels", help="픽스처별 정답 태그 JSON (detect 기준)")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="허용하는 top-1 정확도 하락 (0~1)")
+    parser.add_argument("--max-edges", default="0,2048,1600,1280,1024,800,640,512,384,256",
+                        help="시험할 최대 변 길이 (0 = 원본)")
+    parser.add_argument("--qualities", default="95,85,75,65,55")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--live", action="store_true", help="mock 대신 실제 Azure 엔드포인트 사용")
+    parser.add_argument("--uplink-mbps", type=float, default=20.0, help="mock 업로드 대역폭")
+    parser.add_argument("--write", action="store_true", help="고른 프로필을 image_profiles.json에 저장 (--live 필요)")
+    parser.add_argument("--out", help="측정 결과 JSON 저장 경로")
+    args = parser.parse_args()
+    if args.write and not args.live:
+        # mock 인식기 기준으로 고른 프로필을 실제 서비스 설정에 쓰면 안 됨
+        parser.error("--write는 --live와 함께만 쓸 수 있음 (mock 결과는 --out으로 저장)")
+
+    images = load_fixtures(args.fixtures)
+    backends = [b for b in args.backends.split(",") if b]
+
+    if not args.live:
+        pil = [img for _, img in images]
+        servers = mock_azure.start_servers(
+            uplink_mbps=args.uplink_mbps,
+            detect_recognizer=mock_azure.Recognizer(pil, MOCK_MIN_EDGE["detect"]),
+            ocr_recognizer=mock_azure.Recognizer(pil, MOCK_MIN_EDGE["ocr"]),
+        )
+        os.environ.update(mock_azure.mock_env(servers))
+
+    import image_profile
+    import newmain
+
+    max_edges = _ints(args.max_edges)
+    qualities = _ints(args.qualities)
+    crops = ["none", "center", "detection"] if args.live else ["none"]
+
+    # 기준 답 + OCR 자르기에 쓸 top-1 박스 (지금 설정으로 한 번)
+    base_detect = [run_detect(newmain, image_profile, img, dict(image_profile.DEFAULT)) for _, img in images]
+    boxes = [box for _, box, _, _ in base_detect]
+    labels = {}
+    if args.labels:
+        with open(args.labels, encoding="utf-8") as f:
+            labels = json.load(f)
+
+    runners = {
+        "detect": (
+            lambda i, img, p: _without_box(run_detect(newmain, image_profile, img, p)),
+            [labels.get(name, tag) for (name, _), (tag, _, _, _) in zip(images, base_detect)],
+        ),
+        "ocr": (
+            lambda i, img, p: run_ocr(newmain, image_profile, img, p, boxes[i]),
+            [run_ocr(newmain, image_profile, img, dict(image_profile.DEFAULT), boxes[i])[0]
+             for i, (_, img) in enumerate(images)],
+        ),
+    }
+
+    report = {"live": args.live, "tolerance": args.tolerance, "fixtures": [n for n, _ in images],
+              "backends": {}}
+    chosen = {}
+    for backend in backends:
+        run, expected = runners[backend]
+        grid = list(candidates(backend, max_edges, qualities, crops))
+        base, best, rows = tune(run, images, expected, grid, args.tolerance, args.repeat)
+        chosen[backend] = best["profile"]
+        saved = 1 - best["mean_bytes"] / base["mean_bytes"] if base["mean_bytes"] else 0.0
+        dlat = best["mean_ms"] / base["mean_ms"] - 1 if base["mean_ms"] else 0.0
+        report["backends"][backend] = {"baseline": base, "chosen": best, "candidates": rows}
+
+        p = best["profile"]
+        print(f"[{backend}] 조합 {len(grid)}개 시험")
+        print(f"  선택: 최대 변 {p['max_edge'] or '원본'}, {p['format']}"
+              f"{' q' + str(p['quality']) if p['quality'] else ''}, 자르기 {p['crop']}")
+        print(f"  정확도 {base['accuracy']:.0%} → {best['accuracy']:.0%}, "
+              f"평균 {base['mean_bytes'] / 1024:.1f} KB → {best['mean_bytes'] / 1024:.1f} KB "
+              f"({saved:.0%} 절약), 지연 {base['mean_ms']:.1f} → {best['mean_ms']:.1f} ms ({dlat:+.0%})")
+
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.write:
+        image_profile.save(chosen)
+        print(f"✅ 프로필 저장: {image_profile.IMAGE_PROFILES_PATH}")
+
+
+if __name__ == "__main__":
+    main()
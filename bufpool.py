@@ -0,0 +1,190 @@
+"""
+요청 처리 메모리 관리 (인코딩 버퍼 재사용 / 요청별 메모리 상한 / 워커 전체 예산).
+
+요청마다 백엔드별로 io.BytesIO를 새로 만들면 인코딩하면서 버퍼가 몇 번씩 다시 커지고,
+동시 요청이 몰리면 크기가 제각각인 버퍼가 한꺼번에 생겨 RSS가 튀고 조각난다.
+
+- pool: 미리 잡아 둔 bytearray를 돌려 쓰는 인코딩 버퍼 (프로세스(워커)마다 하나).
+  pool.writer()가 주는 파일 객체에 PIL save를 하고 getvalue()로 최종 바이트만 꺼낸다.
+  BUFFER_MAX_KEEP_BYTES보다 커진 버퍼는 돌려받지 않는다 (한 번 큰 사진 때문에 계속 잡고 있지 않도록)
+- budget: 디코딩한 이미지가 살아 있는 동안의 메모리 예약.
+  요청 하나가 REQUEST_MEMORY_MB를 넘으면 바로 거부하고(ingest.IngestError),
+  동시에 예약된 합이 WORKER_MEMORY_MB를 넘으면 다른 요청이 끝날 때까지 기다린다
+  (MEMORY_WAIT_SECONDS 넘게 기다리면 MemoryBusy).
+
+PIL 픽셀 메모리는 tracemalloc에 잡히지 않으므로 예약 크기는 ingest.estimate_memory()의 추정치를 쓴다.
+"""
+import io
+import os
+import threading
+
+import ingest
+
+BUFFER_POOL_SIZE = int(os.getenv("BUFFER_POOL_SIZE", "8"))
+BUFFER_INITIAL_BYTES = int(os.getenv("BUFFER_INITIAL_KB", "512")) * 1024
+BUFFER_MAX_KEEP_BYTES = int(os.getenv("BUFFER_MAX_KEEP_KB", "8192")) * 1024
+
+REQUEST_MEMORY_LIMIT = int(os.getenv("REQUEST_MEMORY_MB", "160")) * 1024 * 1024
+WORKER_MEMORY_BUDGET = int(os.getenv("WORKER_MEMORY_MB", "512")) * 1024 * 1024
+MEMORY_WAIT_SECONDS = float(os.getenv("MEMORY_WAIT_SECONDS", "30"))
+
+
+class PoolWriter(io.RawIOBase):
+    """bytearray 위에 쓰는 파일 객체 (PIL Image.save용). 버퍼는 모자랄 때만 늘림"""
+
+    def __init__(self, buf: bytearray):
+        super().__init__()
+        self._buf = buf
+        self._pos = 0
+        self._len = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, data):
+        n = len(data)
+        end = self._pos + n
+        if end > len(self._buf):
+            self._buf.extend(bytes(max(end, len(self._buf) * 2) - len(self._buf)))
+        self._buf[self._pos:end] = data
+        self._pos = end
+        self._len = max(self._len, end)
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._len}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def getvalue(self) -> bytes:
+        with memoryview(self._buf) as view:
+            return bytes(view[:self._len])
+
+
+class BufferPool:
+    def __init__(self, size: int = BUFFER_POOL_SIZE, initial: int = BUFFER_INITIAL_BYTES,
+                 max_keep: int = BUFFER_MAX_KEEP_BYTES):
+        self.size = size
+        self.initial = initial
+        self.max_keep = max_keep
+        self._free = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _acquire(self) -> bytearray:
+        with self._lock:
+            if self._free:
+                self.reused += 1
+                return self._free.pop()
+            self.created += 1
+        return bytearray(self.initial)
+
+    def _release(self, buf: bytearray):
+        if len(buf) > self.max_keep:
+            return
+        with self._lock:
+            if len(self._free) < self.size:
+                self._free.append(buf)
+
+    def writer(self):
+        """with pool.writer() as out: image.save(out, ...); data = out.getvalue()"""
+        return _Borrowed(self)
+
+    def preallocate(self, n: int = None):
+        """워커 시작 시 미리 n개 만들어 둠"""
+        n = min(self.size, n or self.size)
+        with self._lock:
+            while len(self._free) < n:
+                self._free.append(bytearray(self.initial))
+                self.created += 1
+
+
+class _Borrowed:
+    def __init__(self, pool):
+        self.pool = pool
+        self.buf = None
+
+    def __enter__(self) -> PoolWriter:
+        self.buf = self.pool._acquire()
+        return PoolWriter(self.buf)
+
+    def __exit__(self, *exc):
+        self.pool._release(self.buf)
+        self.buf = None
+
+
+class MemoryBusy(Exception):
+    """워커 메모리 예산이 오래 비지 않음 (잠시 후 다시 시도)"""
+
+
+class Lease:
+    """budget.reserve()가 돌려주는 예약. release()는 여러 번 불러도 됨"""
+
+    def __init__(self, budget, nbytes):
+        self.budget = budget
+        self.nbytes = nbytes
+
+    def release(self):
+        if self.nbytes:
+            self.budget._free(self.nbytes)
+            self.nbytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class MemoryBudget:
+    def __init__(self, limit: int = WORKER_MEMORY_BUDGET, per_request: int = REQUEST_MEMORY_LIMIT,
+                 wait: float = MEMORY_WAIT_SECONDS):
+        self.limit = limit
+        self.per_request = per_request
+        self.wait = wait
+        self._cond = threading.Condition()
+        self.used = 0
+        self.peak = 0
+        self.waited = 0
+        self.rejected = 0
+
+    def reserve(self, nbytes: int) -> Lease:
+        if nbytes > self.per_request:
+            self.rejected += 1
+            raise ingest.IngestError("이미지 해상도가 너무 큽니다. 더 작은 사진을 올려 주세요.")
+        with self._cond:
+            if self.used + nbytes > self.limit:
+                self.waited += 1
+                # 혼자일 때는 한도와 상관없이 통과 (per_request <= limit이 아니어도 멈추지 않도록)
+                if not self._cond.wait_for(lambda: self.used == 0 or self.used + nbytes <= self.limit,
+                                           timeout=self.wait):
+                    raise MemoryBusy("요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해 주세요.")
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+        return Lease(self, nbytes)
+
+    def _free(self, nbytes):
+        with self._cond:
+            self.used -= nbytes
+            self._cond.notify_all()
+
+
+pool = BufferPool()
+budget = MemoryBudget()
+
+
+def close_image(image):
+    """디코딩한 이미지 메모리를 바로 반환 (GC를 기다리지 않음)"""
+    if image is None:
+        return
+    if isinstance(image, ingest.JpegUpload):
+        image.release()
+    else:
+        image.close()
@@ -0,0 +1,176 @@
+"""
+실행 중 설정 다시 읽기 (재시작 없이 엔드포인트 / 키 / 배포 이름 교체).
+
+설정은 Settings 스냅샷 하나로 묶여 있고, 요청은 시작할 때 current()로 스냅샷을 한 번 가져가
+끝날 때까지 그것만 쓴다. 설정이 바뀌면 새 스냅샷(새 HTTP 세션, 새 OpenAI 클라이언트)으로
+참조만 통째로 바꾸므로, 이미 처리 중인 요청은 이전 설정으로 끝나고 다음 요청부터 새 설정을 쓴다.
+이전 스냅샷의 연결은 CONFIG_GRACE초 뒤에 닫는다.
+
+바뀐 것을 알아채는 방법:
+- .env 파일(ENV_FILE) 수정 시각을 CONFIG_CHECK_INTERVAL초마다 확인 (current() 안에서, 스레드 없음)
+- SIGHUP (install_signal_handler) → 즉시 다시 읽기
+
+프로세스 환경 변수로 직접 준 값은 .env보다 우선한다 (load_dotenv 기본 동작과 같음).
+설정이 바뀔 때 캐시를 비우는 등의 처리는 on_change(fn)으로 등록한다 (fn(old, new)).
+"""
+import os
+import signal
+import threading
+import time
+
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+
+# load_dotenv 전에 기록: 여기 있는 키는 .env가 바뀌어도 덮어쓰지 않음
+_process_keys = frozenset(os.environ)
+
+ENV_FILE = os.getenv("ENV_FILE") or find_dotenv(usecwd=True)
+CONFIG_CHECK_INTERVAL = float(os.getenv("CONFIG_CHECK_INTERVAL", "5"))
+CONFIG_GRACE = float(os.getenv("CONFIG_GRACE", "60"))
+
+load_dotenv(ENV_FILE or None)
+
+# Settings 속성 이름 → 환경 변수 이름
+FIELDS = {
+    "prediction_url": "PREDICTION_URL",
+    "prediction_key": "PREDICTION_KEY",
+    "openai_endpoint": "AZURE_OPENAI_ENDPOINT",
+    "openai_key": "AZURE_OPENAI_KEY",
+    "deployment_name": "DEPLOYMENT_NAME",
+    "vision_endpoint": "AZURE_VISION_ENDPOINT",
+    "vision_key": "AZURE_VISION_KEY",
+    "http_pool_size": "HTTP_POOL_SIZE",
+}
+
+
+class Settings:
+    """한 시점의 설정 + 그 설정으로 만든 HTTP 세션 / OpenAI 클라이언트 (처음 쓸 때 생성)"""
+
+    def __init__(self, values: dict, version: int = 0):
+        self.values = {attr: values.get(key) for attr, key in FIELDS.items()}
+        self.version = version
+        for attr, value in self.values.items():
+            setattr(self, attr, value)
+        self.http_pool_size = int(self.http_pool_size or 16)
+        self._session = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        """Custom Vision / OCR 호출용 requests.Session (keep-alive 연결 재사용)"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.http_pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def client(self):
+        """Azure OpenAI 클라이언트"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import AzureOpenAI
+
+                    self._client = AzureOpenAI(
+                        api_key=self.openai_key,
+                        api_version="2024-02-15-preview",
+                        azure_endpoint=self.openai_endpoint,
+                    )
+        return self._client
+
+    def close(self):
+        with self._lock:
+            for res in (self._session, self._client):
+                if res is not None:
+                    try:
+                        res.close()
+                    except Exception as e:
+                        print("이전 설정 연결 닫기 에러:", e)
+            self._session = self._client = None
+
+    def changed(self, other, *attrs) -> bool:
+        return any(self.values[a] != other.values[a] for a in attrs)
+
+
+_current = Settings(os.environ)
+_listeners = []
+_lock = threading.Lock()
+_watch = {"checked": time.monotonic(), "mtime": None}
+
+
+def _env_mtime():
+    try:
+        return os.stat(ENV_FILE).st_mtime_ns if ENV_FILE else None
+    except OSError:
+        return None
+
+
+_watch["mtime"] = _env_mtime()
+
+
+def current() -> Settings:
+    """지금 설정. 요청 하나 안에서는 처음 받은 스냅샷을 계속 쓸 것"""
+    now = time.monotonic()
+    if ENV_FILE and now - _watch["checked"] >= CONFIG_CHECK_INTERVAL:
+        _watch["checked"] = now
+        mtime = _env_mtime()
+        if mtime != _watch["mtime"]:
+            _watch["mtime"] = mtime
+            reload()
+    return _current
+
+
+def on_change(fn):
+    """설정이 바뀔 때 fn(old, new) 호출 (캐시 무효화 등)"""
+    _listeners.append(fn)
+    return fn
+
+
+def reload() -> bool:
+    """.env를 다시 읽어 값이 바뀌었으면 스냅샷 교체. 교체했으면 True"""
+    global _current
+    with _lock:
+        if ENV_FILE:
+            for key, value in dotenv_values(ENV_FILE).items():
+                if key not in _process_keys and value is not None:
+                    os.environ[key] = value
+        old = _current
+        new = Settings(os.environ, old.version + 1)
+        if new.values == old.values:
+            return False
+        _current = new
+
+    changed = [FIELDS[a] for a in FIELDS if old.values[a] != new.values[a]]
+    print(f"🔥 설정 다시 읽음 (v{new.version}): {', '.join(changed)}")
+    for fn in _listeners:
+        try:
+            fn(old, new)
+        except Exception as e:
+            print("설정 변경 처리 에러:", e)
+
+    # 처리 중인 요청이 끝날 시간을 준 뒤 이전 연결 정리
+    timer = threading.Timer(CONFIG_GRACE, old.close)
+    timer.daemon = True
+    timer.start()
+    return True
+
+
+def install_signal_handler(extra=None):
+    """SIGHUP을 받으면 즉시 reload (메인 스레드에서만 호출 가능, Windows는 무시)"""
+    if not hasattr(signal, "SIGHUP"):
+        return False
+
+    def handle(signum, frame):
+        # 시그널 핸들러 안에서 락을 오래 잡지 않도록 별도 스레드에서 처리
+        threading.Thread(target=reload, daemon=True).start()
+        if extra is not None:
+            extra()
+
+    signal.signal(signal.SIGHUP, handle)
+    return True
@@ -0,0 +1,332 @@
+"""
+라벨링 데이터 통계 / 태그 균형 리포트 (한 번 훑기, 메모리 일정).
+
+학습 전에 태그별 이미지 수, 박스 크기 분포, 업로드 때 조용히 버려지거나 고쳐지는 라벨을 확인한다.
+upload.py는 박스를 [0.001, 0.99] 비율로 잘라 내고(clamp) 박스가 없는 파일은 그냥 건너뛰는데,
+여기서는 그런 파일 / 박스를 이유별로 세고 예시를 몇 개 남긴다.
+
+라벨 JSON을 하나씩 읽고 바로 버리므로 메모리는 태그 수에만 비례한다
+(원천 폴더를 주면 이미지 파일명 목록은 따로 들고 있음).
+박스 크기는 고정 구간 히스토그램 + 태그별 평균/표준편차(Welford)로만 모은다.
+
+태그 판정 (업로드 가능한 이미지 수 기준, 중앙값 = 태그별 이미지 수의 중앙값):
+    부족  max(--min-images, 중앙값 * --under) 미만 → 더 모아야 할 장수(need)
+    과다  중앙값 * --over 초과                     → 그 이상은 업로드 / 학습 효과가 적음(excess)
+Custom Vision 객체 검출은 태그당 최소 15장이 필요해서 --min-images 기본값이 15.
+
+예시:
+    python dataset_stats.py 라벨링데이터 원천데이터 --out dataset_report.json
+    python dataset_stats.py 라벨링데이터 --min-images 30 --over 3
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+from labelrules import bbox_values, clamp_ratios, image_size, label_image_name, scan_images
+
+MIN_IMAGES = int(os.getenv('STATS_MIN_IMAGES', '15'))
+UNDER_RATIO = float(os.getenv('STATS_UNDER_RATIO', '0.5'))
+OVER_RATIO = float(os.getenv('STATS_OVER_RATIO', '2.0'))
+MAX_EXAMPLES = int(os.getenv('STATS_MAX_EXAMPLES', '20'))
+
+# 박스 넓이 / 이미지 넓이, 박스 변 / 이미지 변 히스토그램 구간 (마지막 구간은 1.0 초과 = 이미지 밖)
+AREA_EDGES = (0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0)
+SIDE_EDGES = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0)
+
+
+class Histogram:
+    """고정 구간 히스토그램 (구간 경계 edges, 마지막 칸은 edges[-1] 초과)"""
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+
+    def add(self, value):
+        for i, edge in enumerate(self.edges):
+            if value <= edge:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q):
+        """q 분위수가 들어 있는 구간의 위쪽 경계 (대략값)"""
+        total = sum(self.counts)
+        if not total:
+            return None
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= q * total:
+                return self.edges[i] if i < len(self.edges) else math.inf
+        return math.inf
+
+    def to_dict(self):
+        labels = [f"<={e:g}" for e in self.edges] + [f">{self.edges[-1]:g}"]
+        return dict(zip(labels, self.counts))
+
+
+class Running:
+    """개수 / 평균 / 표준편차 / 최소 / 최대 (Welford, 값을 저장하지 않음)"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def to_dict(self, digits=4):
+        if not self.n:
+            return {'n': 0}
+        std = math.sqrt(self._m2 / self.n)
+        return {'n': self.n, 'mean': round(self.mean, digits), 'std': round(std, digits),
+                'min': round(self.min, digits), 'max': round(self.max, digits)}
+
+
+class DatasetStats:
+    """라벨 JSON을 하나씩 add()로 넣고 report()로 결과 dict"""
+
+    def __init__(self, image_names=None, max_examples=MAX_EXAMPLES):
+        self.image_names = image_names   # 원천 폴더 파일명(소문자) set, None이면 확인 안 함
+        self.max_examples = max_examples
+        self.files = 0
+        self.usable = 0
+        self.boxes = 0
+        self.dropped = {}      # 이유 → 파일 수 (업로드 안 되는 라벨)
+        self.invalid = {}      # 이유 → 박스 수 (bbox_missing만 버려지고 나머지는 잘려서 업로드됨)
+        self.clamped = 0       # 업로드 때 [0.001, 0.99] 범위로 좌표가 바뀌는 박스 수
+        self.examples = {}     # 이유 → [{json, detail}] (최대 max_examples개)
+        self.tags = {}         # 태그 → {'images', 'boxes', 'dropped', 'clamped', 'area': Running}
+        self.area_hist = Histogram(AREA_EDGES)
+        self.width_hist = Histogram(SIDE_EDGES)
+        self.height_hist = Histogram(SIDE_EDGES)
+
+    def _note(self, table, reason, json_path, detail=''):
+        table[reason] = table.get(reason, 0) + 1
+        examples = self.examples.setdefault(reason, [])
+        if len(examples) < self.max_examples:
+            examples.append({'json': json_path, 'detail': detail})
+
+    def _tag(self, name):
+        entry = self.tags.get(name)
+        if entry is None:
+            entry = self.tags[name] = {'images': 0, 'boxes': 0, 'dropped': 0, 'clamped': 0,
+                                       'area': Running()}
+        return entry
+
+    def add_file(self, json_path):
+        self.files += 1
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            self._note(self.dropped, 'broken_json', json_path, str(e))
+            return
+        self.add(json_path, data)
+
+    def add(self, json_path, data):
+        """upload.py가 버리는 경우와 같은 순서로 확인 (라벨 없음 → 태그 없음 → 이미지 없음 → 박스 없음)"""
+        if not data.get('images'):
+            self._note(self.dropped, 'no_images', json_path)
+            return
+        img_info = data['images'][0]
+        tag = (img_info.get('dl_name') or '').strip()
+        if not tag:
+            self._note(self.dropped, 'no_tag', json_path)
+            return
+        entry = self._tag(tag)
+        if not data.get('annotations'):
+            entry['dropped'] += 1
+            self._note(self.dropped, 'no_annotations', json_path, tag)
+            return
+
+        img_name = label_image_name(img_info)
+        if self.image_names is not None and img_name not in self.image_names:
+            entry['dropped'] += 1
+            self._note(self.dropped, 'image_missing', json_path, img_name)
+            return
+
+        try:
+            w_img, h_img = image_size(img_info)
+        except ValueError:
+            entry['dropped'] += 1
+            self._note(self.dropped, 'bad_image_size', json_path,
+                       f"{img_info.get('width')}x{img_info.get('height')}")
+            return
+
+        valid = 0
+        for ann in data['annotations']:
+            bbox = ann.get('bbox')
+            values = bbox_values(bbox)
+            if values is None:
+                # upload.py도 이 박스는 버림
+                self._note(self.invalid, 'bbox_missing', json_path, repr(bbox))
+                continue
+            x, y, w, h = values
+            valid += 1
+            ratios = (x / w_img, y / h_img, w / w_img, h / h_img)
+            clamped = clamp_ratios(values, w_img, h_img)
+            if w <= 0 or h <= 0:
+                # 업로드는 되지만 최소 크기(0.01) 박스로 바뀜
+                self._note(self.invalid, 'bbox_empty', json_path, repr(bbox))
+            elif x < 0 or y < 0 or x + w > w_img or y + h > h_img:
+                self._note(self.invalid, 'bbox_outside', json_path, f"{bbox} ({w_img:g}x{h_img:g})")
+            if any(abs(a - b) > 1e-9 for a, b in zip(ratios, clamped)):
+                self.clamped += 1
+                entry['clamped'] += 1
+                if len(self.examples.setdefault('clamped', [])) < self.max_examples:
+                    self.examples['clamped'].append({
+                        'json': json_path,
+                        'detail': f"{[round(v, 4) for v in ratios]} → {[round(v, 4) for v in clamped]}",
+                    })
+            if w <= 0 or h <= 0:
+                continue
+            area = ratios[2] * ratios[3]
+            self.area_hist.add(area)
+            self.width_hist.add(ratios[2])
+            self.height_hist.add(ratios[3])
+            entry['area'].add(area)
+
+        if not valid:
+            entry['dropped'] += 1
+            self._note(self.dropped, 'no_valid_regions', json_path, tag)
+            return
+        self.usable += 1
+        self.boxes += valid
+        entry['images'] += 1
+        entry['boxes'] += valid
+
+    def report(self, min_images=MIN_IMAGES, under=UNDER_RATIO, over=OVER_RATIO) -> dict:
+        counts = sorted(e['images'] for e in self.tags.values())
+        median = _median(counts)
+        low = max(min_images, math.ceil(median * under))
+        high = math.floor(median * over)
+
+        tags = {}
+        under_tags, over_tags = [], []
+        for name, e in sorted(self.tags.items(), key=lambda kv: (kv[1]['images'], kv[0])):
+            row = {'images': e['images'], 'boxes': e['boxes'], 'dropped': e['dropped'],
+                   'clamped': e['clamped'], 'area': e['area'].to_dict()}
+            if e['images'] < low:
+                row['flag'] = 'under'
+                row['need'] = low - e['images']
+                under_tags.append(name)
+            elif median and e['images'] > high:
+                row['flag'] = 'over'
+                row['excess'] = e['images'] - high
+                over_tags.append(name)
+            tags[name] = row
+
+        return {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'files': self.files,
+            'usable_images': self.usable,
+            'boxes': self.boxes,
+            'dropped_files': dict(sorted(self.dropped.items())),
+            'invalid_boxes': dict(sorted(self.invalid.items())),
+            'clamped_boxes': self.clamped,
+            'box_area': {'hist': self.area_hist.to_dict(),
+                         'p10': self.area_hist.quantile(0.1),
+                         'p50': self.area_hist.quantile(0.5),
+                         'p90': self.area_hist.quantile(0.9)},
+            'box_width': self.width_hist.to_dict(),
+            'box_height': self.height_hist.to_dict(),
+            'balance': {
+                'tags': len(counts),
+                'median_images': median,
+                'min_images': counts[0] if counts else 0,
+                'max_images': counts[-1] if counts else 0,
+                'under_below': low,
+                'over_above': high,
+                'under': under_tags,
+                'over': over_tags,
+                'need_total': sum(tags[t]['need'] for t in under_tags),
+                'excess_total': sum(tags[t]['excess'] for t in over_tags),
+            },
+            'tags': tags,
+            'examples': self.examples,
+        }
+
+
+def _median(values):
+    if not values:
+        return 0
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2
+
+
+def analyze(json_root, image_root=None, max_examples=MAX_EXAMPLES) -> DatasetStats:
+    # 파일명(소문자)만 필요하므로 경로는 버림
+    image_names = set(scan_images(image_root)) if image_root else None
+    stats = DatasetStats(image_names, max_examples)
+    for root, _, files in os.walk(json_root):
+        for file in files:
+            if file.lower().endswith('.json'):
+                stats.add_file(os.path.join(root, file))
+    return stats
+
+
+def write_report(report, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def summary(report) -> str:
+    """사람이 읽는 요약 (콘솔용)"""
+    b = report['balance']
+    lines = [
+        f"라벨 파일 {report['files']}개 → 업로드 가능 이미지 {report['usable_images']}장, "
+        f"박스 {report['boxes']}개 (좌표 잘림 {report['clamped_boxes']}개)",
+        f"버려지는 파일: {report['dropped_files'] or '없음'}",
+        f"문제 있는 박스: {report['invalid_boxes'] or '없음'} (bbox_missing만 버려지고 나머지는 잘려서 업로드)",
+        f"박스 넓이 비율 p10 / p50 / p90: {report['box_area']['p10']} / "
+        f"{report['box_area']['p50']} / {report['box_area']['p90']}",
+        f"태그 {b['tags']}개, 태그당 이미지 최소 {b['min_images']} / 중앙값 {b['median_images']} / "
+        f"최대 {b['max_images']}",
+    ]
+    tags = report['tags']
+    if b['under']:
+        lines.append(f"⚠️ 부족한 태그 {len(b['under'])}개 ({b['under_below']}장 미만, 총 {b['need_total']}장 더 필요):")
+        lines += [f"   {t}: {tags[t]['images']}장 (+{tags[t]['need']})" for t in b['under'][:20]]
+    if b['over']:
+        lines.append(f"⚠️ 과다한 태그 {len(b['over'])}개 ({b['over_above']}장 초과, 총 {b['excess_total']}장 초과):")
+        lines += [f"   {t}: {tags[t]['images']}장 (-{tags[t]['excess']})" for t in b['over'][-20:]]
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="라벨링 데이터 통계 / 태그 균형 리포트")
+    parser.add_argument('json_root', nargs='?', default='라벨링데이터')
+    parser.add_argument('image_root', nargs='?', default=None,
+                        help='원천 폴더 (주면 이미지가 없는 라벨도 셈)')
+    parser.add_argument('--out', default='dataset_report.json')
+    parser.add_argument('--min-images', type=int, default=MIN_IMAGES)
+    parser.add_argument('--under', type=float, default=UNDER_RATIO, help='중앙값 대비 부족 기준')
+    parser.add_argument('--over', type=float, default=OVER_RATIO, help='중앙값 대비 과다 기준')
+    parser.add_argument('--examples', type=int, default=MAX_EXAMPLES, help='이유별로 남길 예시 파일 수')
+    args = parser.parse_args()
+
+    t0 = time.time()
+    stats = analyze(args.json_root, args.image_root, args.examples)
+    report = stats.report(args.min_images, args.under, args.over)
+    write_report(report, args.out)
+    print(summary(report))
+    print(f"✅ 리포트 저장: {args.out} ({time.time() - t0:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
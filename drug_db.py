@@ -0,0 +1,244 @@
+"""
+로컬 의약품 정보(모노그래프) DB.
+
+식약처 공공데이터(e약은요 의약품개요정보 + 의약품 낱알식별 정보)를 오프라인으로 내려받은 파일을
+SQLite 하나로 만들어 두고, Custom Vision 태그 이름으로 바로 찾아 쓴다.
+찾으면 효능·복용법·주의사항·부작용을 DB 내용으로 채우고 GPT는 (켜져 있을 때만) 짧게 다듬는 데만 쓴다.
+
+설명은 태그 이름(원래 이름 / 정규화 이름)으로만 찾는다. 같은 각인을 쓰는 제품이 여러 개라서
+각인으로 찾으면 다른 약의 정보를 이 태그 이름으로 보여 주게 된다.
+각인 별칭은 확인용(lookup --ocr, imprint_candidates)으로만 남겨 둔다.
+
+만들기:
+    python drug_db.py build --easy e약은요.json --pill 낱알식별.csv --out drug_db.sqlite3
+찾아보기:
+    python drug_db.py lookup 타이레놀정500밀리그람 --ocr "TYLENOL 500"  (각인이 같은 제품 목록도 출력)
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import threading
+
+from textnorm import normalize as _key  # 검색 키: newmain / imprint_alias와 같은 정규화
+
+DRUG_DB_PATH = os.getenv("DRUG_DB_PATH", "drug_db.sqlite3")
+
+# 원본 필드 → DB 컬럼 (e약은요 API 이름 / 대문자 API 이름 / CSV 한글 컬럼 모두 허용)
+FIELD_ALIASES = {
+    "item_seq": ("itemSeq", "ITEM_SEQ", "품목일련번호"),
+    "name": ("itemName", "ITEM_NAME", "품목명"),
+    "company": ("entpName", "ENTP_NAME", "업소명"),
+    "efficacy": ("efcyQesitm", "효능"),
+    "usage": ("useMethodQesitm", "사용법"),
+    "warning": ("atpnWarnQesitm", "주의사항경고"),
+    "caution": ("atpnQesitm", "주의사항"),
+    "interaction": ("intrcQesitm", "상호작용"),
+    "side_effect": ("seQesitm", "부작용"),
+    "storage": ("depositMethodQesitm", "보관법"),
+    "print_front": ("PRINT_FRONT", "print_front", "표시앞"),
+    "print_back": ("PRINT_BACK", "print_back", "표시뒤"),
+}
+
+TEXT_FIELDS = ("company", "efficacy", "usage", "warning", "caution",
+               "interaction", "side_effect", "storage")
+
+
+def _pick(row: dict, field: str) -> str:
+    for name in FIELD_ALIASES[field]:
+        value = row.get(name)
+        if value:
+            return str(value).strip()
+    return ""
+
+
+# 원본 파일 읽기
+
+def _read_rows(path: str):
+    """JSON(list, API 응답 body.items) 또는 CSV 파일을 dict 행으로 읽음"""
+    if path.lower().endswith(".csv"):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f)
+        return
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        body = data.get("body", data)
+        data = body.get("items", [])
+        if isinstance(data, dict):
+            data = data.get("item", [])
+    for row in data:
+        yield row.get("item", row) if isinstance(row, dict) else row
+
+
+# DB 만들기
+
+def build(easy_paths, pill_paths=(), out_path=DRUG_DB_PATH) -> int:
+    """원본 파일들로 새 DB를 만들고 임시 파일 → os.replace로 원자적으로 교체"""
+    tmp_path = out_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(
+        """
+        CREATE TABLE monograph (
+            item_seq TEXT PRIMARY KEY, name TEXT NOT NULL,
+            company TEXT, efficacy TEXT, usage TEXT, warning TEXT, caution TEXT,
+            interaction TEXT, side_effect TEXT, storage TEXT
+        );
+        CREATE TABLE alias (
+            key TEXT NOT NULL, kind TEXT NOT NULL, item_seq TEXT NOT NULL,
+            PRIMARY KEY (key, kind, item_seq)
+        ) WITHOUT ROWID;
+        """
+    )
+
+    count = 0
+    for path in easy_paths:
+        for row in _read_rows(path):
+            seq, name = _pick(row, "item_seq"), _pick(row, "name")
+            if not seq or not name:
+                continue
+            conn.execute(
+                "INSERT OR REPLACE INTO monograph VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (seq, name, *[_pick(row, f) for f in TEXT_FIELDS]),
+            )
+            conn.execute("INSERT OR IGNORE INTO alias VALUES (?, 'name', ?)", (name, seq))
+            conn.execute("INSERT OR IGNORE INTO alias VALUES (?, 'name_key', ?)", (_key(name), seq))
+            count += 1
+
+    # 낱알식별 정보: 각인(앞/뒤) → 품목
+    for path in pill_paths:
+        for row in _read_rows(path):
+            seq = _pick(row, "item_seq")
+            if not seq:
+                continue
+            for field in ("print_front", "print_back"):
+                imprint = _key(_pick(row, field))
+                if imprint:
+                    conn.execute("INSERT OR IGNORE INTO alias VALUES (?, 'imprint', ?)",
+                                 (imprint, seq))
+            name = _pick(row, "name")
+            if name:
+                conn.execute("INSERT OR IGNORE INTO alias VALUES (?, 'name_key', ?)",
+                             (_key(name), seq))
+
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    os.replace(tmp_path, out_path)
+    return count
+
+
+# 조회
+
+_local = threading.local()
+
+
+def _conn():
+    path = os.getenv("DRUG_DB_PATH", DRUG_DB_PATH)
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != path:
+        if not os.path.exists(path):
+            return None
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        _local.conn, _local.path = conn, path
+    return conn
+
+
+def _find(conn, kind: str, key: str):
+    if not key:
+        return None
+    return conn.execute(
+        "SELECT m.* FROM alias a JOIN monograph m ON m.item_seq = a.item_seq "
+        "WHERE a.key = ? AND a.kind = ? LIMIT 1",
+        (key, kind),
+    ).fetchone()
+
+
+def lookup(tag_name: str):
+    """태그 이름 → 정규화 이름 순서로 찾아서 dict 반환. 없거나 DB가 없으면 None"""
+    conn = _conn()
+    if conn is None:
+        return None
+
+    row = (_find(conn, "name", (tag_name or "").strip())
+           or _find(conn, "name_key", _key(tag_name)))
+    return dict(row) if row is not None else None
+
+
+def imprint_candidates(ocr_text: str) -> list:
+    """OCR 글자(전체 또는 단어별)와 각인이 같은 제품 이름 전부 (확인용, 설명에는 쓰지 않음)"""
+    conn = _conn()
+    if conn is None or not ocr_text:
+        return []
+    keys = [_key(ocr_text)] + [_key(word) for word in ocr_text.split()]
+    names = []
+    for key in dict.fromkeys(k for k in keys if k):
+        for (name,) in conn.execute(
+            "SELECT m.name FROM alias a JOIN monograph m ON m.item_seq = a.item_seq "
+            "WHERE a.key = ? AND a.kind = 'imprint' ORDER BY m.name",
+            (key,),
+        ):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def _short(text: str, limit: int = 220) -> str:
+    """긴 공공데이터 문장을 문장 단위로 잘라 limit 글자 안으로"""
+    text = " ".join((text or "").split())
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(".", 0, limit)
+    return text[: cut + 1] if cut > 0 else text[:limit] + "…"
+
+
+def format_monograph(mono: dict) -> str:
+    """DB 내용을 explain_pill_with_gpt 답변과 같은 bullet 형식으로"""
+    caution = " ".join(t for t in (mono.get("warning"), mono.get("caution")) if t)
+    lines = [
+        f"- 어떤 약인지: {mono['name']}" + (f" ({mono['company']})" if mono.get("company") else ""),
+        f"- 효능: {_short(mono.get('efficacy')) or '정보 없음'}",
+        f"- 복용 방법: {_short(mono.get('usage')) or '정보 없음'}",
+        f"- 주의사항: {_short(caution) or '정보 없음'}",
+    ]
+    if mono.get("side_effect"):
+        lines.append(f"- 부작용: {_short(mono['side_effect'])}")
+    if mono.get("interaction"):
+        lines.append(f"- 함께 복용 시 주의: {_short(mono['interaction'])}")
+    lines.append("정확한 복약 안내는 약사·의사와 상의해 주세요.")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 의약품 정보 DB")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build", help="공공데이터 파일로 DB 생성")
+    p_build.add_argument("--easy", nargs="+", required=True, help="e약은요 JSON/CSV")
+    p_build.add_argument("--pill", nargs="*", default=[], help="낱알식별 JSON/CSV (각인 정보)")
+    p_build.add_argument("--out", default=DRUG_DB_PATH)
+
+    p_lookup = sub.add_parser("lookup", help="태그 이름으로 조회")
+    p_lookup.add_argument("tag")
+    p_lookup.add_argument("--ocr", default="", help="각인이 같은 제품 목록도 출력")
+
+    args = parser.parse_args()
+    if args.cmd == "build":
+        n = build(args.easy, args.pill, args.out)
+        print(f"✅ {n}개 품목 저장: {args.out}")
+    else:
+        mono = lookup(args.tag)
+        print(format_monograph(mono) if mono else "❌ DB에 없는 약입니다.")
+        if args.ocr:
+            names = imprint_candidates(args.ocr)
+            print(f"각인 '{args.ocr}' 제품 {len(names)}개: {', '.join(names) or '없음'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+라벨링 데이터 컬럼형 내보내기.
+
+수천 개의 이미지별 라벨 JSON을 매번 다시 읽지 않도록, 라벨 트리를 한 번 읽어서
+NumPy 구조화 배열(.npy) 몇 개로 저장한다. np.load(mmap_mode="r")로 열면
+업로드 / 중복 제거 / 통계 / 로컬 학습 단계가 파일을 복사 없이 바로 읽을 수 있다.
+
+출력 폴더 구성 (내보낼 때마다 새 버전 폴더에 쓰고 CURRENT 파일만 원자적으로 바꿈):
+    CURRENT          지금 버전 폴더 이름 (load()가 이것부터 읽음)
+    v<번호>/
+      images.npy     이미지당 1행: path, file_name, width, height, tag_id,
+                     imprint_front, imprint_back, bbox_start, bbox_count
+      bboxes.npy     (박스 수, 4) float32 픽셀 좌표 [x, y, w, h]
+      tags.json      tag_id → 태그 이름(dl_name)
+      meta.json      버전, 개수, 원본 폴더, 건너뛴 라벨 수
+직전 버전 폴더는 남겨 둬서 교체 순간에 열고 있던 쪽도 끝까지 읽을 수 있다.
+이미지 크기(width / height)가 깨진 라벨은 그 라벨만 건너뛰고 개수를 세고,
+숫자가 아닌 bbox는 그 박스만 버린다 (업로드와 같은 규칙, labelrules.py).
+
+예시:
+    python export_labels.py 라벨링데이터 원천데이터 --out labels_export
+    python -c "import export_labels as e; d = e.load('labels_export'); print(d['images'][:3])"
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from labelrules import bbox_values, image_size, label_image_name, scan_images
+
+EXPORT_VERSION = 1
+CURRENT_FILE = 'CURRENT'
+DATA_FILES = ('images.npy', 'bboxes.npy', 'tags.json', 'meta.json')
+
+
+def iter_labels(json_root):
+    """(json 경로, 파싱된 dict)를 하나씩. 깨진 파일은 건너뛰고 경고만 출력"""
+    for root, _, files in os.walk(json_root):
+        for file in files:
+            if not file.lower().endswith('.json'):
+                continue
+            json_path = os.path.join(root, file)
+            try:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    yield json_path, json.load(f)
+            except Exception as e:
+                print(f"❌ {file} 처리 중 오류: {e}")
+
+
+def export(json_root, image_root, out_dir):
+    image_map = scan_images(image_root)
+
+    rows = []
+    bboxes = []
+    tags = []
+    tag_ids = {}
+    skipped = 0
+
+    for json_path, data in iter_labels(json_root):
+        if not data.get('images') or not data.get('annotations'):
+            continue
+        img_info = data['images'][0]
+        try:
+            size = tuple(int(v) for v in image_size(img_info))
+        except ValueError as e:
+            # 한 라벨이 깨져도 전체 내보내기는 계속
+            print(f"⚠️ {os.path.basename(json_path)} 건너뜀 (숫자 값 오류: {e})")
+            skipped += 1
+            continue
+        # 깨진 박스는 upload.py와 같이 그 박스만 버림 (labelrules.bbox_values)
+        boxes = [list(b) for b in (bbox_values(ann.get('bbox')) for ann in data['annotations'])
+                 if b is not None]
+
+        tag = (img_info.get('dl_name') or '').strip()
+        if tag not in tag_ids:
+            tag_ids[tag] = len(tags)
+            tags.append(tag)
+
+        img_name = label_image_name(img_info)
+        start = len(bboxes)
+        bboxes.extend(boxes)
+
+        rows.append((
+            image_map.get(img_name, ''),
+            img_name,
+            size[0],
+            size[1],
+            tag_ids[tag],
+            str(img_info.get('print_front') or ''),
+            str(img_info.get('print_back') or ''),
+            start,
+            len(bboxes) - start,
+        ))
+
+    def width(i):
+        return max([1] + [len(r[i]) for r in rows])
+
+    dtype = np.dtype([
+        ('path', f'U{width(0)}'),
+        ('file_name', f'U{width(1)}'),
+        ('width', np.int32),
+        ('height', np.int32),
+        ('tag_id', np.int32),
+        ('imprint_front', f'U{width(5)}'),
+        ('imprint_back', f'U{width(6)}'),
+        ('bbox_start', np.int64),
+        ('bbox_count', np.int32),
+    ])
+    images = np.array(rows, dtype=dtype)
+    boxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+
+    # 새 버전 폴더에 다 쓴 뒤 CURRENT만 바꿈 (읽는 쪽은 항상 완성된 한 버전만 봄)
+    os.makedirs(out_dir, exist_ok=True)
+    version_name = f'v{time.time_ns()}'
+    tmp_dir = os.path.join(out_dir, version_name)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'images.npy'), images)
+    np.save(os.path.join(tmp_dir, 'bboxes.npy'), boxes)
+    with open(os.path.join(tmp_dir, 'tags.json'), 'w', encoding='utf-8') as f:
+        json.dump(tags, f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': EXPORT_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'json_root': os.path.abspath(json_root),
+            'image_root': os.path.abspath(image_root),
+            'images': len(images),
+            'bboxes': len(boxes),
+            'tags': len(tags),
+            'missing_images': int((images['path'] == '').sum()),
+            'skipped_labels': skipped,
+        }, f, ensure_ascii=False, indent=2)
+
+    previous = _current(out_dir)
+    _switch(out_dir, version_name)
+    _cleanup(out_dir, keep={version_name, previous})
+    if skipped:
+        print(f"⚠️ 숫자 값이 깨진 라벨 {skipped}개 건너뜀")
+    return len(images), len(boxes), len(tags)
+
+
+def _current(out_dir):
+    """CURRENT가 가리키는 버전 폴더 이름 (없으면 None)"""
+    try:
+        with open(os.path.join(out_dir, CURRENT_FILE), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _switch(out_dir, version_name):
+    tmp = os.path.join(out_dir, CURRENT_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(version_name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(out_dir, CURRENT_FILE))
+
+
+def _cleanup(out_dir, keep):
+    """지금 / 직전 버전만 남기고 지움 (예전 형식으로 폴더 바로 아래 있던 파일도)"""
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if name.startswith('v') and os.path.isdir(path) and name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+        elif name in DATA_FILES:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # 열려 있으면(Windows) 다음 내보내기 때 지움
+
+
+def load(export_dir, mmap=True):
+    """내보낸 폴더 읽기. mmap=True면 .npy를 메모리 매핑 (복사 없음)"""
+    mode = 'r' if mmap else None
+    for attempt in range(3):
+        # CURRENT는 한 번만 읽음 → 도중에 교체돼도 네 파일이 모두 같은 버전
+        version_name = _current(export_dir)
+        data_dir = export_dir if version_name is None else os.path.join(export_dir, version_name)
+        try:
+            return _load_dir(data_dir, mode)
+        except FileNotFoundError:
+            # 읽는 사이에 내보내기가 두 번 돌아 그 버전이 지워짐 → CURRENT부터 다시
+            if version_name is None or attempt == 2:
+                raise
+
+
+def _load_dir(data_dir, mode):
+    with open(os.path.join(data_dir, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != EXPORT_VERSION:
+        raise ValueError(f"지원하지 않는 export 버전: {meta.get('version')}")
+    with open(os.path.join(data_dir, 'tags.json'), encoding='utf-8') as f:
+        tags = json.load(f)
+    return {
+        'meta': meta,
+        'tags': tags,
+        'images': np.load(os.path.join(data_dir, 'images.npy'), mmap_mode=mode),
+        'bboxes': np.load(os.path.join(data_dir, 'bboxes.npy'), mmap_mode=mode),
+    }
+
+
+def image_bboxes(data, i):
+    """i번째 이미지의 박스들 (bboxes 배열의 view, 복사 없음)"""
+    row = data['images'][i]
+    start = int(row['bbox_start'])
+    return data['bboxes'][start:start + int(row['bbox_count'])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="라벨링 데이터 컬럼형(.npy) 내보내기")
+    parser.add_argument('json_root', nargs='?', default='라벨링데이터')
+    parser.add_argument('image_root', nargs='?', default='원천데이터')
+    parser.add_argument('--out', default='labels_export')
+    args = parser.parse_args()
+
+    t0 = time.time()
+    n_images, n_boxes, n_tags = export(args.json_root, args.image_root, args.out)
+    print(f"✅ 이미지 {n_images}개, 박스 {n_boxes}개, 태그 {n_tags}개 → {args.out} "
+          f"({time.time() - t0:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+신뢰도 기준으로 단계 건너뛰기 (Custom Vision 결과를 보고 OCR / GPT 설명을 할지 결정).
+
+main.py는 신뢰도 30% 미만을 인식 실패로 처리했는데 newmain.py는 검출이 약해도
+항상 OCR과 GPT 설명까지 돌렸다. Custom Vision top-1 확률(%)로 세 구간을 나눈다.
+
+- GATE_RETAKE_BELOW 미만           → 바로 재촬영 안내 (OCR, GPT 설명 모두 생략)
+- GATE_SKIP_OCR_ABOVE 이상이고
+  2등과 GATE_SKIP_OCR_MARGIN 이상 차이 → OCR 생략 (후보를 가를 필요가 없음)
+- 그 사이                           → 기존 전체 파이프라인
+
+게이트마다 몇 번 걸렸는지, 그래서 아낀 호출 수 / 추정 비용 / 추정 지연을 센다.
+지연은 실제로 돌았을 때 잰 단계별 평균(observe, 없으면 GATE_LATENCY_*), 비용은 호출당 단가(GATE_COST_*) 추정치.
+GATE_RETAKE_BELOW=0, GATE_SKIP_OCR_ABOVE=101 이면 게이트를 모두 끈 것과 같다.
+"""
+import os
+import threading
+
+RETAKE_BELOW = float(os.getenv("GATE_RETAKE_BELOW", "30"))
+SKIP_OCR_ABOVE = float(os.getenv("GATE_SKIP_OCR_ABOVE", "95"))
+SKIP_OCR_MARGIN = float(os.getenv("GATE_SKIP_OCR_MARGIN", "30"))
+
+# 호출 1번당 추정 단가 (USD). OCR = Image Analysis Read, explain = GPT 설명 1건
+STAGE_COST = {
+    "ocr": float(os.getenv("GATE_COST_OCR", "0.0015")),
+    "explain": float(os.getenv("GATE_COST_EXPLAIN", "0.004")),
+}
+# 아직 한 번도 안 돌아서 잰 값이 없을 때 쓰는 단계별 지연 추정치 (초)
+STAGE_LATENCY = {
+    "ocr": float(os.getenv("GATE_LATENCY_OCR_MS", "300")) / 1000,
+    "explain": float(os.getenv("GATE_LATENCY_EXPLAIN_MS", "2000")) / 1000,
+}
+
+# 재촬영 안내 때 쓰는 태그 이름 (main.py와 같은 문구)
+RETAKE_TAG = "인식 결과 불분명"
+RETAKE_MESSAGE = (
+    "알약이 잘 보이지 않아 신뢰도가 낮습니다. "
+    "밝은 곳에서 알약 표면 글자가 보이도록 가까이 다시 촬영해 주세요."
+)
+
+# 게이트 이름 → 건너뛰는 단계
+GATES = {
+    "retake": ("ocr", "explain"),
+    "skip_ocr": ("ocr",),
+}
+
+
+class GateStats:
+    """게이트별 통과 횟수와 단계별 평균 지연 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.hits = {name: 0 for name in GATES}
+        self._latency = {stage: [0, 0.0] for stage in STAGE_COST}  # 단계 → [횟수, 합(초)]
+
+    def record(self, gate):
+        """gate: GATES의 이름 또는 None(전체 파이프라인)"""
+        with self._lock:
+            self.total += 1
+            if gate is not None:
+                self.hits[gate] += 1
+
+    def observe(self, stage, seconds: float):
+        with self._lock:
+            entry = self._latency[stage]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def avg_latency(self, stage) -> float:
+        n, total = self._latency[stage]
+        return total / n if n else STAGE_LATENCY[stage]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            gates = {}
+            for name, stages in GATES.items():
+                hits = self.hits[name]
+                gates[name] = {
+                    "hits": hits,
+                    "saved_calls": {s: hits for s in stages},
+                    "saved_cost_usd": round(hits * sum(STAGE_COST[s] for s in stages), 4),
+                    "saved_latency_s": round(hits * sum(self.avg_latency(s) for s in stages), 2),
+                }
+            return {
+                "total": self.total,
+                "full": self.total - sum(self.hits.values()),
+                "gates": gates,
+                "avg_latency_ms": {s: round(self.avg_latency(s) * 1000, 1) for s in STAGE_COST},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.total = 0
+            self.hits = {name: 0 for name in GATES}
+            self._latency = {stage: [0, 0.0] for stage in STAGE_COST}
+
+
+stats = GateStats()
+
+
+def decide(preds):
+    """Custom Vision predictions → "retake" / "skip_ocr" / None(전체 파이프라인)"""
+    probs = sorted((p["probability"] * 100 for p in preds), reverse=True)
+    top = probs[0]
+    second = probs[1] if len(probs) > 1 else 0.0
+    if top < RETAKE_BELOW:
+        return "retake"
+    if top >= SKIP_OCR_ABOVE and top - second >= SKIP_OCR_MARGIN:
+        return "skip_ocr"
+    return None
+
+
+def report() -> str:
+    """사람이 읽는 한 줄 요약"""
+    snap = stats.snapshot()
+    parts = [f"전체 {snap['total']}건 중 전체 파이프라인 {snap['full']}건"]
+    for name, g in snap["gates"].items():
+        parts.append(f"{name} {g['hits']}건 (약 ${g['saved_cost_usd']:.4f}, {g['saved_latency_s']:.1f}s 절약)")
+    return ", ".join(parts)
@@ -0,0 +1,150 @@
+"""
+백엔드별 이미지 전송 프로필 (최대 변 길이, 포맷, JPEG 품질, 자르기 방식).
+
+Custom Vision 예측 / Azure OCR / (예정) 로컬 모델은 잘 동작하는 입력 크기가 서로 다른데
+지금까지는 사용자가 올린 해상도를 그대로 JPEG(품질 75)로 보냈다.
+여기서 백엔드마다 인코딩 방식을 정하고, bench/tune_profiles.py가 픽스처로 측정해
+정확도를 유지하는 가장 작은 설정을 image_profiles.json에 써 둔다.
+
+기본값은 지금까지와 같은 바이트를 만든다 (원본 크기, JPEG 75, 자르지 않음).
+image_profiles.json이 있으면 그 값이 기본값을 덮어쓴다.
+
+자르기 방식 (crop):
+    none        자르지 않음
+    center      가운데 정사각형
+    detection   Custom Vision top-1 박스(+여백) — OCR처럼 예측 뒤에 부르는 백엔드용, 박스 없으면 none
+
+파일 형식 (image_profiles.json):
+    {"detect": {"max_edge": 1024, "format": "JPEG", "quality": 85, "crop": "none"}, "ocr": {...}}
+"""
+import json
+import os
+import threading
+
+import bufpool
+import ingest
+
+IMAGE_PROFILES_PATH = os.getenv("IMAGE_PROFILES_PATH", "image_profiles.json")
+
+# detection 자르기 때 박스 주변에 붙이는 여백 (박스 크기 대비)
+CROP_MARGIN = 0.15
+
+DEFAULT = {"max_edge": None, "format": "JPEG", "quality": 75, "crop": "none"}
+
+DEFAULT_PROFILES = {
+    "detect": dict(DEFAULT),
+    "ocr": dict(DEFAULT),
+    # 로컬 분류 모델용 (아직 연결 안 됨): 작은 정사각형 입력
+    "local": {"max_edge": 224, "format": "PNG", "quality": None, "crop": "center"},
+}
+
+CROPS = ("none", "center", "detection")
+FORMATS = ("JPEG", "PNG", "WEBP")
+
+_profiles = None
+_profiles_lock = threading.Lock()
+
+
+def _load():
+    global _profiles
+    if _profiles is None:
+        with _profiles_lock:
+            if _profiles is None:
+                profiles = {k: dict(v) for k, v in DEFAULT_PROFILES.items()}
+                path = os.getenv("IMAGE_PROFILES_PATH", IMAGE_PROFILES_PATH)
+                if os.path.exists(path):
+                    try:
+                        with open(path, encoding="utf-8") as f:
+                            for backend, values in json.load(f).items():
+                                profiles.setdefault(backend, dict(DEFAULT)).update(values)
+                    except (OSError, ValueError) as e:
+                        print("image_profiles.json 읽기 에러:", e)
+                _profiles = profiles
+    return _profiles
+
+
+def reload():
+    """프로필 파일이 바뀌었을 때 다음 인코딩에서 다시 읽도록"""
+    global _profiles
+    with _profiles_lock:
+        _profiles = None
+
+
+def get_profile(backend: str) -> dict:
+    return _load().get(backend, DEFAULT)
+
+
+def save(profiles: dict, path: str = IMAGE_PROFILES_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    reload()
+
+
+def _crop(image, crop, box):
+    w, h = image.size
+    if crop == "center":
+        side = min(w, h)
+        left, top = (w - side) // 2, (h - side) // 2
+        return image.crop((left, top, left + side, top + side))
+    if crop == "detection" and box:
+        # boundingBox는 0~1 비율 (left, top, width, height)
+        mx, my = box["width"] * CROP_MARGIN, box["height"] * CROP_MARGIN
+        left = max(0.0, box["left"] - mx)
+        top = max(0.0, box["top"] - my)
+        right = min(1.0, box["left"] + box["width"] + mx)
+        bottom = min(1.0, box["top"] + box["height"] + my)
+        if right > left and bottom > top:
+            return image.crop((int(left * w), int(top * h), int(right * w), int(bottom * h)))
+    return image
+
+
+def _replace(old, new, source):
+    """중간 사본(old)을 new로 바꾸면서 바로 닫음. 호출한 쪽 이미지(source)는 닫지 않음"""
+    if old is not source:
+        old.close()
+    return new
+
+
+def encode(image, backend_or_profile, box=None) -> bytes:
+    """PIL 이미지 → 백엔드 프로필대로 자르고 줄이고 인코딩한 바이트"""
+    profile = backend_or_profile
+    if isinstance(profile, str):
+        profile = get_profile(profile)
+
+    max_edge = profile.get("max_edge")
+    fmt = (profile.get("format") or "JPEG").upper()
+    crop = profile.get("crop") or "none"
+
+    if isinstance(image, ingest.JpegUpload):
+        # 브라우저에서 이미 줄인 JPEG: 자르거나 줄일 필요가 없으면 바이트 그대로 (품질은 브라우저 설정)
+        if (fmt == "JPEG" and (crop == "none" or (crop == "detection" and not box))
+                and (not max_edge or max(image.size) <= max_edge)):
+            return image.data
+        image = image.decode()
+
+    source = image
+    image = _crop(image, crop, box)
+
+    if max_edge and max(image.size) > max_edge:
+        from PIL import Image
+
+        scale = max_edge / max(image.size)
+        size = (max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale)))
+        image = _replace(image, image.resize(size, Image.LANCZOS, reducing_gap=3.0), source)
+
+    if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+        image = _replace(image, image.convert("RGB"), source)
+
+    # 인코딩 버퍼는 워커의 버퍼 풀에서 빌려 씀 (bufpool.py)
+    try:
+        with bufpool.pool.writer() as buf:
+            if fmt in ("JPEG", "WEBP") and profile.get("quality"):
+                image.save(buf, format=fmt, quality=int(profile["quality"]))
+            else:
+                image.save(buf, format=fmt)
+            return buf.getvalue()
+    finally:
+        if image is not source:
+            image.close()  # 자르기 / 축소 사본은 바로 반환 (원본은 호출한 쪽 소유)
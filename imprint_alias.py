@@ -0,0 +1,192 @@
+"""
+알약 각인(OCR 글자) → Custom Vision 태그 이름 별칭 인덱스.
+
+태그는 한글 제품명(dl_name)인데 OCR은 "IDG", "TYLENOL 500" 같은 영문 각인을 돌려주기 때문에
+이름끼리 비교하면 거의 겹치지 않는다. 라벨 JSON의 print_front / print_back 값을 모아
+"정규화 각인 → 태그 목록" 인덱스를 만들어 두고, 실행 중에는
+1) 전체 글자 / 단어별 정확히 일치(dict, O(1))
+2) 없으면 scoring.CandidateScorer로 비슷한 각인 찾기 (유사도 FUZZY_CUTOFF 이상)
+순서로 태그를 찾는다.
+
+인덱스 파일 형식 (imprint_alias.json):
+    {"v": 1, "tags": ["타이레놀정500밀리그람", ...], "aliases": {"TYLENOL": [0], "TYLENOL500": [0]}}
+
+만들기:
+    python upload.py                       (업로드하면서 같이 생성)
+    python imprint_alias.py build 라벨링데이터  (업로드 없이 라벨만 읽어서 생성)
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from textnorm import normalize as _normalize
+
+IMPRINT_ALIAS_PATH = os.getenv("IMPRINT_ALIAS_PATH", "imprint_alias.json")
+FUZZY_CUTOFF = float(os.getenv("IMPRINT_FUZZY_CUTOFF", "0.8"))
+# 인덱스 파일이 바뀌었는지 확인하는 간격 (초) — upload.py / train.py가 새로 쓰면 재시작 없이 반영
+CHECK_INTERVAL = float(os.getenv("IMPRINT_ALIAS_CHECK_INTERVAL", "2"))
+
+IMPRINT_FIELDS = ("print_front", "print_back")
+
+
+def _usable(key: str) -> bool:
+    # "마크", "분할선" 같은 한글 설명값은 OCR(영문 각인)과 맞을 일이 없으니 제외
+    return len(key) >= 2 and any(ch.isascii() for ch in key)
+
+
+def extract_imprints(img_info: dict):
+    """라벨 JSON images[0]에서 정규화된 각인 키 목록 (앞, 뒤, 앞+뒤)"""
+    parts = [_normalize(str(img_info.get(f) or "")) for f in IMPRINT_FIELDS]
+    keys = [p for p in parts if _usable(p)]
+    if len(keys) == 2:
+        keys.append(keys[0] + keys[1])
+    return keys
+
+
+class AliasBuilder:
+    """라벨을 하나씩 넣어 인덱스를 만들고 save()로 파일에 기록"""
+
+    def __init__(self):
+        self.tags = []
+        self._tag_ids = {}
+        self.aliases = {}
+
+    def add(self, tag_name: str, img_info: dict):
+        tag_name = tag_name.strip()
+        if tag_name not in self._tag_ids:
+            self._tag_ids[tag_name] = len(self.tags)
+            self.tags.append(tag_name)
+        tid = self._tag_ids[tag_name]
+        for key in extract_imprints(img_info):
+            ids = self.aliases.setdefault(key, [])
+            if tid not in ids:
+                ids.append(tid)
+
+    def save(self, path: str = IMPRINT_ALIAS_PATH):
+        data = {"v": 1, "tags": self.tags, "aliases": self.aliases}
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        return len(self.aliases)
+
+
+def build_from_labels(json_root: str, path: str = IMPRINT_ALIAS_PATH) -> int:
+    builder = AliasBuilder()
+    for root, _, files in os.walk(json_root):
+        for file in files:
+            if not file.lower().endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(root, file), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                img_info = (data.get("images") or [None])[0]
+                if img_info and img_info.get("dl_name"):
+                    builder.add(img_info["dl_name"], img_info)
+            except Exception as e:
+                print(f"❌ {file} 처리 중 오류: {e}")
+    return builder.save(path)
+
+
+# 실행 중 조회
+
+_EMPTY = ({}, [])
+_state = {"checked": 0.0, "mtime": None, "index": None}
+_index_lock = threading.Lock()
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    tags = data["tags"]
+    aliases = {k: [tags[i] for i in ids] for k, ids in data["aliases"].items()}
+    return aliases, list(aliases)
+
+
+def _load():
+    """
+    (각인 → 태그 목록, 각인 키 목록). 파일 확인은 CHECK_INTERVAL초에 한 번만,
+    mtime이 바뀌었을 때만 다시 읽음 (newmain.current_iteration과 같은 방식)
+    """
+    now = time.monotonic()
+    if _state["index"] is not None and now - _state["checked"] < CHECK_INTERVAL:
+        return _state["index"]
+    with _index_lock:
+        if _state["index"] is not None and now - _state["checked"] < CHECK_INTERVAL:
+            return _state["index"]
+        _state["checked"] = now
+        path = os.getenv("IMPRINT_ALIAS_PATH", IMPRINT_ALIAS_PATH)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            _state["mtime"], _state["index"] = None, _EMPTY
+            return _EMPTY
+        if mtime != _state["mtime"]:
+            try:
+                index = _read(path)
+            except (OSError, ValueError, KeyError, IndexError) as e:
+                # 쓰는 중이거나 깨진 파일이면 이전 인덱스를 계속 씀
+                print("imprint_alias.json 읽기 에러:", e)
+                index = _state["index"] or _EMPTY
+            else:
+                if _state["mtime"] is not None:
+                    print(f"🔥 각인 인덱스 다시 읽음: 각인 {len(index[1])}개")
+            _state["mtime"], _state["index"] = mtime, index
+        return _state["index"]
+
+
+def reload():
+    """다음 조회에서 파일을 바로 다시 확인하도록 (확인 간격을 기다리지 않음)"""
+    with _index_lock:
+        _state["checked"] = 0.0
+        _state["mtime"] = None
+
+
+def lookup(ocr_text: str, scorer=None):
+    """OCR 글자 → 태그 이름 목록. 정확히 일치 → 단어별 일치 → (scorer가 있으면) 유사 각인"""
+    aliases, keys = _load()
+    if not aliases or not ocr_text:
+        return []
+
+    full = _normalize(ocr_text)
+    tags = aliases.get(full)
+    if tags:
+        return tags
+
+    found = []
+    for word in ocr_text.split():
+        for tag in aliases.get(_normalize(word), ()):
+            if tag not in found:
+                found.append(tag)
+    if found or scorer is None:
+        return found
+
+    i, sim = scorer.best(full, keys, [0.0] * len(keys))
+    if i is not None and sim >= FUZZY_CUTOFF:
+        return aliases[keys[i]]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="각인 → 태그 별칭 인덱스")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="라벨링 JSON 폴더로 인덱스 생성")
+    p_build.add_argument("json_root")
+    p_build.add_argument("--out", default=IMPRINT_ALIAS_PATH)
+    p_lookup = sub.add_parser("lookup", help="OCR 글자로 태그 찾기")
+    p_lookup.add_argument("ocr_text")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        n = build_from_labels(args.json_root, args.out)
+        print(f"✅ 각인 {n}개 저장: {args.out}")
+    else:
+        import scoring
+
+        print(lookup(args.ocr_text, scoring.CandidateScorer()) or "❌ 일치하는 각인 없음")
+
+
+if __name__ == "__main__":
+    main()
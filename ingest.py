@@ -0,0 +1,188 @@
+"""
+업로드 이미지 입구 검사 (디코딩 전에 크기 / 포맷 / 픽셀 수 확인).
+
+gr.Image(type="pil")은 올라온 파일을 전부 디코딩한 뒤에 analyze_pill을 부르기 때문에
+아주 큰 이미지나 압축 폭탄도 요청마다 메모리와 CPU를 다 쓴다.
+UI는 type="filepath"로 파일 경로만 넘기고, 여기서
+1) 파일 바이트 수 (MAX_UPLOAD_BYTES, 화면 안내와 같은 6MB)
+2) 헤더만 읽어서 포맷(ALLOWED_FORMATS)과 가로x세로
+3) 디코딩에 필요한 메모리 추정치 (MAX_DECODE_BYTES, 요청당 상한)
+를 먼저 확인하고, 통과한 이미지만 INGEST_MAX_EDGE 이하로 줄여서 디코딩한다.
+JPEG는 draft 모드(DCT 단계에서 1/2, 1/4, 1/8로 줄여 읽기)라 원본 크기로 펼치지 않는다.
+
+거부 사유는 IngestError 메시지(사용자에게 그대로 보여 줄 한국어 문장)로 올린다.
+
+브라우저(ui.py)는 올리기 전에 사진을 CLIENT_MAX_EDGE / CLIENT_JPEG_QUALITY로 줄여 JPEG로 보낸다.
+open_upload()는 그렇게 이미 작은 JPEG(EXIF 회전 없음, PASSTHROUGH_MAX_BYTES 이하)면
+디코딩하지 않고 JpegUpload로 바이트를 그대로 들고 가고, image_profile.encode가
+다시 인코딩할 필요가 없으면 그 바이트를 Azure에 바로 보낸다.
+"""
+import io
+import os
+
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "6")) * 1024 * 1024)
+MAX_PIXELS = int(os.getenv("INGEST_MAX_PIXELS", str(50_000_000)))
+MAX_DECODE_BYTES = int(os.getenv("INGEST_MAX_DECODE_MB", "96")) * 1024 * 1024
+INGEST_MAX_EDGE = int(os.getenv("INGEST_MAX_EDGE", "2048"))
+
+# 브라우저 쪽 압축 설정 (ui.py 스크립트에 그대로 들어감)
+CLIENT_MAX_EDGE = int(os.getenv("CLIENT_MAX_EDGE", "1600"))
+CLIENT_JPEG_QUALITY = float(os.getenv("CLIENT_JPEG_QUALITY", "0.85"))
+# 이 크기 이하의 JPEG만 디코딩 없이 그대로 보냄 (큰 원본을 그대로 Azure에 올리지 않도록)
+PASSTHROUGH_MAX_BYTES = int(float(os.getenv("PASSTHROUGH_MAX_MB", "1.5")) * 1024 * 1024)
+
+ALLOWED_FORMATS = ("JPEG", "PNG", "WEBP", "BMP", "MPO")
+
+# 모드별 픽셀당 바이트 (디코딩 메모리 추정용, 모르는 모드는 4)
+_MODE_BYTES = {"1": 1, "L": 1, "P": 1, "RGB": 3, "YCbCr": 3, "LAB": 3, "HSV": 3,
+               "RGBA": 4, "CMYK": 4, "I": 4, "F": 4, "I;16": 2}
+
+
+class IngestError(ValueError):
+    """업로드 이미지 거부 (메시지는 화면에 그대로 표시)"""
+
+
+def _is_bytes(source) -> bool:
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def too_large(size: int) -> IngestError:
+    return IngestError(
+        f"이미지 용량이 너무 큽니다 ({size / 1024 / 1024:.1f}MB). "
+        f"{MAX_UPLOAD_BYTES / 1024 / 1024:.0f}MB 이하의 사진을 올려 주세요."
+    )
+
+
+def check_size(source) -> int:
+    """source: 파일 경로 또는 이미지 바이트 (REST API)"""
+    size = len(source) if _is_bytes(source) else os.path.getsize(source)
+    if size > MAX_UPLOAD_BYTES:
+        raise too_large(size)
+    return size
+
+
+def load_image(source, max_edge: int = INGEST_MAX_EDGE):
+    """검사를 통과한 이미지(경로 또는 바이트)를 max_edge 이하 RGB PIL 이미지로 디코딩"""
+    from PIL import Image, ImageOps
+
+    check_size(source)
+    try:
+        im = Image.open(io.BytesIO(source) if _is_bytes(source) else source)  # 여기서는 헤더만 읽음
+    except Exception:
+        raise IngestError("이미지 파일을 읽을 수 없습니다. JPG 또는 PNG 사진을 올려 주세요.")
+
+    with im:
+        if im.format not in ALLOWED_FORMATS:
+            raise IngestError(f"지원하지 않는 이미지 형식입니다 ({im.format}). JPG 또는 PNG 사진을 올려 주세요.")
+
+        w, h = im.size
+        if w * h > MAX_PIXELS:
+            raise IngestError(f"이미지 해상도가 너무 큽니다 ({w}x{h}). 더 작은 사진을 올려 주세요.")
+
+        if im.format in ("JPEG", "MPO") and max(w, h) > max_edge:
+            # DCT 축소 디코딩: 요청 크기 이상인 가장 작은 1/2^n 크기로 읽음
+            scale = max_edge / max(w, h)
+            im.draft("RGB", (int(w * scale) + 1, int(h * scale) + 1))
+
+        need = im.size[0] * im.size[1] * _MODE_BYTES.get(im.mode, 4)
+        if need > MAX_DECODE_BYTES:
+            raise IngestError(f"이미지 해상도가 너무 큽니다 ({w}x{h}). 더 작은 사진을 올려 주세요.")
+
+        try:
+            im.load()
+        except Exception:
+            raise IngestError("이미지 파일이 손상되었습니다. 다시 촬영해 주세요.")
+
+        # 줄인 다음에 회전 (회전 복사본이 작아지도록)
+        if max(im.size) > max_edge:
+            im.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=3.0)
+        out = ImageOps.exif_transpose(im)  # 항상 새 이미지를 돌려줌
+        if out.mode != "RGB":
+            rgb = out.convert("RGB")
+            out.close()  # 중간 사본은 바로 반환
+            out = rgb
+    return out
+
+
+def estimate_memory(source, max_edge: int = INGEST_MAX_EDGE) -> int:
+    """
+    요청 하나가 이 이미지 때문에 잡는 메모리 추정치(바이트, 헤더만 읽음).
+    원본 바이트 + 디코딩 버퍼(JPEG는 draft 축소 후) + 회전/RGB 사본과 인코딩용 축소/자르기 사본.
+    bufpool.budget 예약 크기로 쓴다.
+    """
+    from PIL import Image
+
+    raw = check_size(source)
+    try:
+        with Image.open(io.BytesIO(source) if _is_bytes(source) else source) as im:
+            fmt, (w, h), mode = im.format, im.size, im.mode
+    except Exception:
+        return raw  # 못 읽는 파일은 load_image에서 거부됨
+
+    dw, dh = w, h
+    if fmt in ("JPEG", "MPO"):
+        scale = 1
+        while scale < 8 and max(w, h) / (scale * 2) >= max_edge:
+            scale *= 2
+        dw, dh = -(-w // scale), -(-h // scale)
+    fit = min(1.0, max_edge / max(w, h, 1))
+    final = int(w * fit) * int(h * fit) * 3
+    return raw + dw * dh * _MODE_BYTES.get(mode, 4) + 2 * final
+
+
+class JpegUpload:
+    """
+    디코딩하지 않은 JPEG 업로드. data = 원본 바이트, size = (가로, 세로).
+    PIL 이미지가 필요한 곳(자르기 / 축소 / 다른 포맷)은 decode()로 그때 디코딩한다.
+    """
+
+    mode = "RGB"
+
+    def __init__(self, data: bytes, size):
+        self.data = data
+        self.size = size
+        self._image = None
+
+    def decode(self):
+        if self._image is None:
+            self._image = load_image(self.data)
+        return self._image
+
+    def release(self):
+        if self._image is not None:
+            self._image.close()
+            self._image = None
+
+
+def _read(source) -> bytes:
+    if _is_bytes(source):
+        return bytes(source)
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def open_upload(source, max_edge: int = INGEST_MAX_EDGE):
+    """
+    이미 작은 JPEG면 JpegUpload(바이트 그대로), 아니면 load_image()와 같은 PIL 이미지.
+    검사 항목(크기 / 포맷 / 해상도)은 load_image와 같다.
+    """
+    from PIL import Image
+
+    if check_size(source) > PASSTHROUGH_MAX_BYTES:
+        return load_image(source, max_edge)
+
+    data = _read(source)
+    # 끝 표시(EOI)가 없으면 잘린 파일일 수 있으니 디코딩해서 확인
+    if not data.startswith(b"\xff\xd8") or not data.rstrip(b"\x00").endswith(b"\xff\xd9"):
+        return load_image(data, max_edge)
+    try:
+        with Image.open(io.BytesIO(data)) as im:  # 헤더만 읽음
+            ok = (im.format == "JPEG" and im.mode == "RGB" and max(im.size) <= max_edge
+                  and im.size[0] * im.size[1] <= MAX_PIXELS
+                  and im.getexif().get(0x0112, 1) == 1)  # EXIF 회전이 있으면 돌려야 하므로 디코딩
+            size = im.size
+    except Exception:
+        ok = False
+    if not ok:
+        return load_image(data, max_edge)
+    return JpegUpload(data, size)
@@ -0,0 +1,89 @@
+"""
+라벨링 데이터 → 원천 이미지 매칭 / 숫자 값 / 박스 비율 변환 규칙.
+
+upload(업로드), export_labels(컬럼형 내보내기), dataset_stats(통계), train(홀드아웃 평가)이
+모두 이 함수들을 쓴다.
+    홀드아웃(평가용)은 이미지 이름 해시로 정함 → upload.py / train.py 어느 쪽으로 올려도 학습에 안 들어감
+    이미지 크기(width / height)가 비었거나 숫자가 아니거나 0 이하 → 그 라벨은 버림
+    bbox가 없거나 4개가 아니거나 숫자가 아님                      → 그 박스만 버림
+    나머지 박스는 Azure가 요구하는 비율로 바꾸고 [0.001, 0.99] 범위로 자름(clamp)
+Azure / NumPy를 import하지 않으므로 업로드 전처리 워커 프로세스에서도 가볍게 불러올 수 있다.
+규칙을 바꿀 때는 여기만 고친다 (모듈마다 복사해 두면 한쪽만 바뀌어 이미지가 조용히 빠짐).
+"""
+import hashlib
+import math
+import os
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg')
+HOLDOUT_RATIO = float(os.getenv('TRAIN_HOLDOUT_RATIO', '0.1'))
+
+
+def scan_images(image_root):
+    """원천 폴더의 이미지 파일을 {소문자 파일명: 경로}로 (확장자 소문자 대응)"""
+    image_map = {}
+    for root, _, files in os.walk(image_root):
+        for f in files:
+            if f.lower().endswith(IMAGE_EXTS):
+                image_map[f.lower()] = os.path.join(root, f)
+    return image_map
+
+
+def label_image_name(img_info):
+    """라벨의 file_name → 원천 폴더의 실제 파일명 (jpg 라벨이지만 원본은 png, 없으면 '')"""
+    return (img_info.get('file_name') or '').replace('.jpg', '.png').replace('.JPG', '.png').lower()
+
+
+def is_holdout(img_name: str, ratio: float = HOLDOUT_RATIO) -> bool:
+    """이미지 이름 해시로 정하는 평가용 분할 (실행할 때마다 같은 이미지가 같은 쪽)"""
+    h = int(hashlib.sha1(img_name.encode('utf-8')).hexdigest()[:8], 16)
+    return h < ratio * 0x100000000
+
+
+def parse_number(value, cast=float):
+    """라벨의 숫자 값 → cast 결과. 비어 있거나(None / '') 숫자가 아니거나 nan / inf면 ValueError"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        raise ValueError(f"값이 없음: {value!r}")
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"숫자가 아님: {value!r}")
+    return cast(number)
+
+
+def image_size(img_info):
+    """라벨의 (width, height) 픽셀 크기. 없거나 숫자가 아니거나 0 이하면 ValueError"""
+    try:
+        w_img, h_img = parse_number(img_info.get('width')), parse_number(img_info.get('height'))
+    except TypeError as e:
+        raise ValueError(str(e)) from None
+    if w_img <= 0 or h_img <= 0:
+        raise ValueError(f"이미지 크기 오류: {img_info.get('width')}x{img_info.get('height')}")
+    return w_img, h_img
+
+
+def bbox_values(bbox):
+    """라벨의 bbox → (x, y, w, h) 픽셀 좌표. 없거나 4개가 아니거나 숫자가 아니면 None"""
+    if not bbox or not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+        return None
+    try:
+        return tuple(parse_number(v) for v in bbox)
+    except (TypeError, ValueError):
+        return None
+
+
+def clamp_ratios(bbox, w_img, h_img):
+    """픽셀 (x, y, w, h) → Azure가 요구하는 0.0 ~ 1.0 비율 (left, top, width, height), 1.0을 넘지 않게 자름"""
+    left = max(0.001, min(0.99, bbox[0] / w_img))
+    top = max(0.001, min(0.99, bbox[1] / h_img))
+    width = max(0.01, min(1.0 - left, bbox[2] / w_img))
+    height = max(0.01, min(1.0 - top, bbox[3] / h_img))
+    return left, top, width, height
+
+
+def region_ratios(annotations, w_img, h_img):
+    """라벨의 annotations → [(left, top, width, height)] 비율 (깨진 박스는 빠짐)"""
+    ratios = []
+    for ann in annotations:
+        bbox = bbox_values(ann.get('bbox'))
+        if bbox is not None:
+            ratios.append(clamp_ratios(bbox, w_img, h_img))
+    return ratios
@@ -1,8 +1,6 @@
 import io
 import os
-import requests
-import gradio as gr
-from openai import AzureOpenAI
+import threading
 from dotenv import load_dotenv
 
 # 환경 변수 로드 (.env 사용 시)
@@ -17,12 +15,24 @@ AZURE_OPENAI_ENDPOINT = "https://pill-vision-team5.cognitiveservices.azure.com/"
 AZURE_OPENAI_API_KEY = "1zMeGpeavZ7XDghNmt5m9RS6jo1yDOnt8aSfWiFwU2aMmr9Er9d7JQQJ99BLACL93NaXJ3w3AAAEACOGUd7Q"
 DEPLOYMENT_NAME = "pill-vision-team5"
 
-# Azure OpenAI 클라이언트 생성
-client = AzureOpenAI(
-    api_key=AZURE_OPENAI_API_KEY,
-    api_version="2024-02-15-preview",
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-)
+# Azure OpenAI 클라이언트 (처음 쓸 때 생성)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import AzureOpenAI
+
+                _client = AzureOpenAI(
+                    api_key=AZURE_OPENAI_API_KEY,
+                    api_version="2024-02-15-preview",
+                    azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                )
+    return _client
 
 # --- 1. Custom Vision Object Detection 함수 ---
 def classify_pill(image):
@@ -43,6 +53,8 @@ def classify_pill(image):
     }
 
     try:
+        import requests
+
         # API 호출
         resp = requests.post(PREDICTION_URL, headers=headers, data=img_bytes)
         
@@ -88,7 +100,7 @@ def explain_pill_with_gpt(pill_name: str) -> str:
     user_msg = f"약 이름: {pill_name}\n이 약에 대해 위 기준에 맞게 한국어로 설명해 주세요."
 
     try:
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model=DEPLOYMENT_NAME,
             messages=[
                 {"role": "system", "content": system_msg},
@@ -125,11 +137,16 @@ body, .gradio-container { background-color: #ffffff !important; font-family: san
 .pill-result-title { font-size: 14px; font-weight: 700; color: #2C7A7B; margin-bottom: 8px; }
 """
 
-with gr.Blocks(css=custom_css, title="AI 복약 가이드") as demo:
-    with gr.Column(elem_classes=["pill-phone-card"]):
-        # 1화면: 랜딩
-        with gr.Column(visible=True) as landing_group:
-            gr.Markdown("""
+
+def build_demo():
+    """gradio는 UI를 만들 때만 import"""
+    import gradio as gr
+
+    with gr.Blocks(css=custom_css, title="AI 복약 가이드") as demo:
+        with gr.Column(elem_classes=["pill-phone-card"]):
+            # 1화면: 랜딩
+            with gr.Column(visible=True) as landing_group:
+                gr.Markdown("""
             <div class="pill-landing-title">AI 복약 가이드</div>
             <div class="pill-landing-sub">사진 한 장으로 약 정보를 빠르게 확인하세요.</div>
             <div class="pill-landing-box">
@@ -138,29 +155,32 @@ with gr.Blocks(css=custom_css, title="AI 복약 가이드") as demo:
               <div class="pill-landing-step">③ 상세한 복약 가이드를 확인하세요.</div>
             </div>
             """)
-            start_btn = gr.Button("시작하기", elem_classes=["pill-landing-start-btn"])
+                start_btn = gr.Button("시작하기", elem_classes=["pill-landing-start-btn"])
 
-        # 2화면: 도구
-        with gr.Column(visible=False) as tool_group:
-            gr.Markdown('<div class="pill-header-title">AI 복약 가이드</div>')
-            image_in = gr.Image(type="pil", label="알약 사진 업로드", height=280)
+            # 2화면: 도구
+            with gr.Column(visible=False) as tool_group:
+                gr.Markdown('<div class="pill-header-title">AI 복약 가이드</div>')
+                image_in = gr.Image(type="pil", label="알약 사진 업로드", height=280)
             
-            with gr.Row():
-                clear_btn = gr.Button("다시 선택", elem_classes=["pill-btn-sub"])
-                submit_btn = gr.Button("결과 분석하기", elem_classes=["pill-btn-main"])
+                with gr.Row():
+                    clear_btn = gr.Button("다시 선택", elem_classes=["pill-btn-sub"])
+                    submit_btn = gr.Button("결과 분석하기", elem_classes=["pill-btn-main"])
+
+                with gr.Column(elem_classes=["pill-result-box"]):
+                    gr.Markdown('<div class="pill-result-title">🔍 인식된 약품 정보</div>')
+                    pill_header = gr.Textbox(label="", interactive=False, placeholder="결과가 여기에 표시됩니다.")
+
+                with gr.Column(elem_classes=["pill-result-box"]):
+                    gr.Markdown('<div class="pill-result-title">💊 상세 복약 가이드</div>')
+                    pill_detail = gr.Textbox(label="", interactive=False, lines=10, placeholder="설명이 여기에 표시됩니다.")
 
-            with gr.Column(elem_classes=["pill-result-box"]):
-                gr.Markdown('<div class="pill-result-title">🔍 인식된 약품 정보</div>')
-                pill_header = gr.Textbox(label="", interactive=False, placeholder="결과가 여기에 표시됩니다.")
+        # 버튼 이벤트
+        start_btn.click(lambda: (gr.update(visible=False), gr.update(visible=True)), None, [landing_group, tool_group])
+        submit_btn.click(analyze_pill, image_in, [pill_header, pill_detail])
+        clear_btn.click(lambda: (None, "", ""), None, [image_in, pill_header, pill_detail])
 
-            with gr.Column(elem_classes=["pill-result-box"]):
-                gr.Markdown('<div class="pill-result-title">💊 상세 복약 가이드</div>')
-                pill_detail = gr.Textbox(label="", interactive=False, lines=10, placeholder="설명이 여기에 표시됩니다.")
+    return demo
 
-    # 버튼 이벤트
-    start_btn.click(lambda: (gr.update(visible=False), gr.update(visible=True)), None, [landing_group, tool_group])
-    submit_btn.click(analyze_pill, image_in, [pill_header, pill_detail])
-    clear_btn.click(lambda: (None, "", ""), None, [image_in, pill_header, pill_detail])
 
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    build_demo().launch()
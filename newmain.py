@@ -1,18 +1,43 @@
-import io
 import os
-import requests
-import difflib 
-import gradio as gr
-from openai import AzureOpenAI
-from dotenv import load_dotenv
-
-#  환경 변수 로드 (.env 사용)
-load_dotenv()
+import sys
+import difflib
+import hashlib
+import json
+import re
+import threading
+import time
+from urllib.parse import quote
+
+import bufpool
+import config
+import drug_db
+import gating
+import image_profile
+import imprint_alias
+import ingest
+import pill_cache
+import prompts
+import singleflight
+import speculative
+import textnorm
+
+# gradio / openai / requests는 무거워서 import 시점에 불러오지 않음.
+# 실제로 쓰는 함수 안에서 처음 호출될 때만 import 한다.
+# (bench/importtime.py 로 시작 시간 예산을 확인)
+
+#  환경 변수 로드 (.env 사용) — config.py가 import 될 때 읽고, 파일이 바뀌면 다시 읽는다.
+# 요청 처리 함수는 시작할 때 config.current()로 설정 스냅샷을 받아 끝까지 그것만 쓴다.
+# 아래 모듈 상수는 기존 코드(warmup.py 등) 호환용으로, 설정이 바뀌면 같이 갱신된다.
 
 # Custom Vision
 PREDICTION_URL = os.getenv("PREDICTION_URL")
 PREDICTION_KEY = os.getenv("PREDICTION_KEY")
 
+# 서비스 중인 Custom Vision 반복(iteration) 이름. train.py가 새 모델을 게시하면
+# 이 파일을 원자적으로 교체하고, 실행 중인 서버는 재시작 없이 다음 요청부터 새 이름을 쓴다.
+SERVING_ITERATION_PATH = os.getenv("SERVING_ITERATION_PATH", "serving_iteration.json")
+ITERATION_CHECK_INTERVAL = float(os.getenv("ITERATION_CHECK_INTERVAL", "2"))
+
 # Azure OpenAI
 AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_KEY")
@@ -22,18 +47,164 @@ DEPLOYMENT_NAME = os.getenv("DEPLOYMENT_NAME")
 AZURE_VISION_ENDPOINT = os.getenv("AZURE_VISION_ENDPOINT")  # https://pill-vision-team5.cognitiveservices.azure.com/
 AZURE_VISION_KEY = os.getenv("AZURE_VISION_KEY")
 
-client = AzureOpenAI(
-    api_key=AZURE_OPENAI_API_KEY,
-    api_version="2024-02-15-preview",
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
+
+def get_client():
+    """지금 설정의 Azure OpenAI 클라이언트 (설정 스냅샷마다 처음 쓸 때 한 번만 생성)"""
+    return config.current().client()
+
+
+def get_session():
+    """지금 설정의 Custom Vision / OCR 호출용 requests.Session (keep-alive 연결 재사용)"""
+    return config.current().session()
+
+
+_ITERATION_RE = re.compile(r"/iterations/([^/]+)/")
+_serving = {"checked": 0.0, "mtime": None, "name": None}
+_serving_lock = threading.Lock()
+
+
+def current_iteration() -> str:
+    """
+    지금 서비스 중인 반복 이름.
+    serving_iteration.json이 있으면 그 값, 없으면 PREDICTION_URL에 들어 있는 이름.
+    파일 확인은 ITERATION_CHECK_INTERVAL초에 한 번만 (mtime이 바뀌었을 때만 다시 읽음)
+    """
+    now = time.monotonic()
+    if now - _serving["checked"] < ITERATION_CHECK_INTERVAL:
+        return _serving["name"] or _url_iteration()
+    with _serving_lock:
+        _serving["checked"] = now
+        try:
+            mtime = os.stat(SERVING_ITERATION_PATH).st_mtime_ns
+        except OSError:
+            _serving["mtime"] = _serving["name"] = None
+            return _url_iteration()
+        if mtime != _serving["mtime"]:
+            try:
+                with open(SERVING_ITERATION_PATH, encoding="utf-8") as f:
+                    name = json.load(f).get("iteration")
+            except (OSError, ValueError) as e:
+                print("serving_iteration.json 읽기 에러:", e)
+                name = _serving["name"]
+            if name and name != _serving["name"]:
+                print(f"🔥 서비스 반복 전환: {_serving['name'] or _url_iteration()} → {name}")
+            _serving["mtime"], _serving["name"] = mtime, name
+    return _serving["name"] or _url_iteration()
+
+
+def _url_iteration(url: str = None) -> str:
+    m = _ITERATION_RE.search(url or config.current().prediction_url or "")
+    return m.group(1) if m else ""
+
+
+def prediction_url(iteration: str = None, cfg=None) -> str:
+    """PREDICTION_URL의 /iterations/<이름>/ 부분을 서비스 중인 반복으로 바꾼 주소"""
+    url = (cfg or config.current()).prediction_url
+    iteration = iteration or current_iteration()
+    if not url or not iteration:
+        return url
+    return _ITERATION_RE.sub(f"/iterations/{quote(iteration)}/", url, count=1)
+
+
+# 약 이름별 GPT 설명 캐시 (같은 약은 다시 생성하지 않음)
+explain_cache = pill_cache.make_cache(
+    "explain",
+    max_items=int(os.getenv("EXPLAIN_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("EXPLAIN_CACHE_TTL", "86400")),
+)
+
+# 이미지 내용(JPEG 해시)별 분류 결과 캐시 — 같은 사진은 Custom Vision/OCR 재호출 안 함
+# 키는 "반복 이름:해시"라서 반복이 바뀌면 이전 모델의 결과는 자연히 쓰이지 않는다.
+result_cache = pill_cache.make_cache(
+    "result",
+    max_items=int(os.getenv("RESULT_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "3600")),
 )
 
-# 공통: 문자열 정규화 + 유사도 점수 함수
-def _normalize(text: str) -> str:
-    """알파벳/숫자만 남기고 대문자로 통일"""
-    if not text:
-        return ""
-    return "".join(ch for ch in text.upper() if ch.isalnum())
+# Azure 원본 응답 캐시 — 최종 결과가 캐시되지 않는 경우(재촬영 안내, 게이트 기준 변경 등)에도
+# 같은 사진이면 Custom Vision / OCR을 다시 부르지 않는다.
+# predictions는 "반복 이름:해시"(detect 프로필 JPEG), OCR readResult는 OCR로 보낸 JPEG 해시가 키.
+# 위 캐시들은 DISK_CACHE_PATH가 설정돼 있으면 디스크에도 남아서 재시작 뒤에도 그대로 쓴다 (pill_cache.py)
+prediction_cache = pill_cache.make_cache(
+    "prediction",
+    max_items=int(os.getenv("RESULT_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "3600")),
+)
+ocr_cache = pill_cache.make_cache(
+    "ocr",
+    max_items=int(os.getenv("RESULT_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "3600")),
+)
+
+
+# 복약 질문 의미 캐시 (semantic_cache.py, numpy를 쓰므로 처음 질문할 때 생성)
+# EMBEDDING_DEPLOYMENT가 없으면 정확 일치(띄어쓰기·문장부호만 무시)로만 적중.
+# 어느 쪽이든 질문 속 숫자+단위(용량, 나이, 횟수)가 다르면 적중하지 않는다.
+EMBEDDING_DEPLOYMENT = os.getenv("EMBEDDING_DEPLOYMENT")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1536"))
+QA_CACHE_SIZE = int(os.getenv("QA_CACHE_SIZE", "2000"))
+QA_CACHE_THRESHOLD = float(os.getenv("QA_CACHE_THRESHOLD", "0.90"))
+
+_qa_cache = None
+_qa_cache_lock = threading.Lock()
+
+
+def get_qa_cache():
+    global _qa_cache
+    if _qa_cache is None:
+        with _qa_cache_lock:
+            if _qa_cache is None:
+                import semantic_cache
+
+                embed_fn = None
+                if EMBEDDING_DEPLOYMENT:
+                    embed_fn = semantic_cache.azure_embed_fn(get_client, EMBEDDING_DEPLOYMENT)
+                _qa_cache = semantic_cache.SemanticCache(
+                    max_entries=QA_CACHE_SIZE,
+                    threshold=QA_CACHE_THRESHOLD,
+                    dim=EMBEDDING_DIM,
+                    embed_fn=embed_fn,
+                )
+    return _qa_cache
+
+
+@config.on_change
+def _on_config_change(old, new):
+    """설정이 바뀌면 모듈 상수를 갱신하고, 바뀐 설정에 묶인 캐시만 비움"""
+    global PREDICTION_URL, PREDICTION_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY
+    global DEPLOYMENT_NAME, AZURE_VISION_ENDPOINT, AZURE_VISION_KEY
+    PREDICTION_URL, PREDICTION_KEY = new.prediction_url, new.prediction_key
+    AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY = new.openai_endpoint, new.openai_key
+    DEPLOYMENT_NAME = new.deployment_name
+    AZURE_VISION_ENDPOINT, AZURE_VISION_KEY = new.vision_endpoint, new.vision_key
+
+    # 분류 결과는 "반복 이름:해시" 키 → 예측 엔드포인트나 OCR 리소스가 바뀌면 이전 반복 결과만 삭제
+    if new.changed(old, "prediction_url", "vision_endpoint"):
+        served = _serving["name"] or _url_iteration(old.prediction_url)
+        n = result_cache.delete_prefix(f"{served}:")
+        if new.changed(old, "prediction_url"):
+            prediction_cache.delete_prefix(f"{served}:")
+        if new.changed(old, "vision_endpoint"):
+            ocr_cache.clear()
+        print(f"분류 결과 캐시 {n}개 삭제 ({served})")
+    # 설명 / 질문 답변은 GPT 배포에 묶여 있음 (키만 바뀐 경우는 그대로 둠)
+    if new.changed(old, "openai_endpoint", "deployment_name"):
+        explain_cache.clear()
+        if _qa_cache is not None:
+            _qa_cache.clear()
+        print("설명 / 질문 답변 캐시 비움")
+
+
+def invalidate_pill(pill_name: str):
+    """약 하나의 설명 / 질문 답변 캐시를 비움 (약 정보가 바뀌었을 때)"""
+    explain_cache.delete(pill_name)
+    if _qa_cache is not None:
+        _qa_cache.invalidate(pill_name)
+
+
+# 공통: 문자열 정규화(textnorm.py, scoring / imprint_alias / drug_db와 같은 함수) + 유사도 점수 함수
+_normalize = textnorm.normalize
+
 
 def _similarity(a: str, b: str) -> float:
     """0~1 사이 유사도 (SequenceMatcher 사용)"""
@@ -44,56 +215,76 @@ def _similarity(a: str, b: str) -> float:
 
 # Azure Vision OCR로 알약 표면 글자 읽기
 
-def ocr_pill_text(image) -> str:
+def ocr_read(img_bytes: bytes, cfg=None) -> dict:
+    """Azure Vision read 호출 → 응답 JSON (캐시 없음, 실패하면 예외 그대로)"""
+    cfg = cfg or config.current()
+    url = (
+        cfg.vision_endpoint.rstrip("/")
+        + "/computervision/imageanalysis:analyze"
+        + "?api-version=2023-10-01&features=read"
+    )
+
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "Ocp-Apim-Subscription-Key": cfg.vision_key,
+    }
+
+    resp = cfg.session().post(url, headers=headers, data=img_bytes, timeout=15)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def ocr_pill_text(image, cfg=None, box=None, profile="ocr") -> str:
     """
     알약 표면의 알파벳/숫자를 OCR로 읽어서 한 줄 문자열로 반환.
     실패하면 "" 반환.
+    box: Custom Vision top-1 boundingBox (OCR 프로필이 crop=detection이면 그 부분만 보냄)
     """
     if image is None:
         return ""
 
-    if not AZURE_VISION_ENDPOINT or not AZURE_VISION_KEY:
+    cfg = cfg or config.current()
+    if not cfg.vision_endpoint or not cfg.vision_key:
         # Vision 리소스 설정 안 돼 있으면 OCR 패스
         return ""
 
-    buf = io.BytesIO()
-    image.save(buf, format="JPEG")
-    img_bytes = buf.getvalue()
-
-    url = (
-        AZURE_VISION_ENDPOINT.rstrip("/")
-        + "/computervision/imageanalysis:analyze"
-        + "?api-version=2023-10-01&features=read"
-    )
-
-    headers = {
-        "Content-Type": "application/octet-stream",
-        "Ocp-Apim-Subscription-Key": AZURE_VISION_KEY,
-    }
+    img_bytes = image_profile.encode(image, profile, box)
+    cache_key = hashlib.sha256(img_bytes).hexdigest()
+    read_result = ocr_cache.get(cache_key)
+    if read_result is not None:
+        return _flatten_read_result({"readResult": read_result})
 
     try:
-        resp = requests.post(url, headers=headers, data=img_bytes, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
+        data = ocr_read(img_bytes, cfg)
     except Exception as e:
         print("OCR 호출 에러:", e)
         return ""
 
-    texts = []
     try:
-        read_result = data.get("readResult") or {}
-        blocks = read_result.get("blocks") or []
-        for b in blocks:
-            for line in b.get("lines", []):
-                txt = line.get("text", "").strip()
-                if txt:
-                    texts.append(txt)
+        text = _flatten_read_result(data)
     except Exception as e:
         print("OCR 파싱 에러:", e)
         return ""
+    # 응답 전체 대신 readResult만 저장 (modelVersion / metadata는 안 씀)
+    ocr_cache.set(cache_key, data.get("readResult") or {})
+    return text
+
+
+def _flatten_read_result(data: dict) -> str:
+    """Image Analysis 응답의 readResult block/line을 한 줄 문자열로 합침"""
+    texts = []
+    read_result = data.get("readResult") or {}
+    blocks = read_result.get("blocks") or []
+    for b in blocks:
+        for line in b.get("lines", []):
+            txt = line.get("text", "").strip()
+            if txt:
+                texts.append(txt)
 
     joined = " ".join(texts)
     return joined[:120]  # 너무 길면 잘라줌
+
+
 def pick_best_with_gpt(preds, ocr_text: str) -> str:
     if not preds or not ocr_text:
         return preds[0]["tagName"]
@@ -103,29 +294,8 @@ def pick_best_with_gpt(preds, ocr_text: str) -> str:
         for p in preds
     )
 
-    system_msg = (
-        "당신은 약품 라벨을 매칭해 주는 도우미입니다. "
-        "OCR로 읽은 영문 글자와 Custom Vision이 예측한 후보 약 이름(대부분 한글)을 보고, "
-        "가장 가능성이 높은 한글 약 이름 하나만 골라 주세요. "
-        "반드시 후보 목록에 있는 이름만 그대로 출력하세요."
-    )
-
-    user_msg = (
-        f"OCR 텍스트: {ocr_text}\n\n"
-        f"후보 리스트:\n{candidates_txt}\n\n"
-        "가장 가능성 높은 약 이름 하나만 출력하세요."
-    )
-
-    resp = client.chat.completions.create(
-        model=DEPLOYMENT_NAME,
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ],
-        temperature=0.0,
-    )
-
-    chosen = resp.choices[0].message.content.strip()
+    # 프롬프트 문장 / max_tokens / 사용량 기록은 prompts.py
+    chosen = prompts.chat("pick", ocr_text=ocr_text, candidates=candidates_txt)
 
     tag_names = {p["tagName"] for p in preds}
     if chosen not in tag_names:
@@ -134,32 +304,62 @@ def pick_best_with_gpt(preds, ocr_text: str) -> str:
     return chosen
 # Custom Vision + OCR 같이 써서 최종 약 이름 선택
 
-def classify_pill(image):
+def classify_pill(image, on_detect=None):
     """
     1) Custom Vision 전체 predictions 가져옴
+       - 신뢰도 게이트(gating.py)에 걸리면 재촬영 안내 또는 OCR 없이 top1 바로 반환
     2) OCR로 알약 표면 글자 읽기
     3) OCR 성공 시: 알파벳 유사도가 가장 큰 tagName 선택
        - 유사도 너무 낮으면 그냥 원래 top1(tagName) 사용
     4) OCR 실패 시: 원래 top1만 사용
+    on_detect(tag, prob): OCR 전에 Custom Vision top1으로 호출 (설명 미리 만들기, speculative.py)
     """
     if image is None:
         return "이미지 없음", 0.0, ""
 
-    # Custom Vision 호출
-    buf = io.BytesIO()
-    image.save(buf, format="JPEG")
-    img_bytes = buf.getvalue()
+    # Custom Vision 호출 (전송 크기/품질은 image_profile.py의 detect 프로필)
+    img_bytes = image_profile.encode(image, "detect")
+
+    cfg = config.current()
+    iteration = current_iteration()
+    cache_key = f"{iteration}:{hashlib.sha256(img_bytes).hexdigest()}"
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return tuple(cached)
+
+    def run():
+        result = _classify_bytes(image, img_bytes, iteration, cfg, on_detect)
+        if result[0] not in ("분류 실패", gating.RETAKE_TAG):
+            result_cache.set(cache_key, list(result))
+        return result
+
+    # 캐시가 차기 전에 같은 사진이 동시에 들어오면 한 번만 호출하고 결과를 나눠 씀
+    return flights.do(f"classify:{cache_key}", run)
+
+
+def _predict(img_bytes, iteration, cfg):
+    """Custom Vision predictions (반복 이름 + 사진 해시로 캐시)"""
+    cache_key = f"{iteration}:{hashlib.sha256(img_bytes).hexdigest()}"
+    preds = prediction_cache.get(cache_key)
+    if preds is not None:
+        return preds
 
     headers = {
         "Content-Type": "application/octet-stream",
-        "Prediction-Key": PREDICTION_KEY,
+        "Prediction-Key": cfg.prediction_key,
     }
-
-    resp = requests.post(PREDICTION_URL, headers=headers, data=img_bytes)
+    resp = cfg.session().post(prediction_url(iteration, cfg), headers=headers, data=img_bytes)
     resp.raise_for_status()
-    data = resp.json()
+    preds = resp.json().get("predictions", [])
+    if preds:
+        prediction_cache.set(cache_key, preds)
+    return preds
 
-    preds = data.get("predictions", [])
+
+def _classify_bytes(image, img_bytes, iteration=None, cfg=None, on_detect=None):
+    """캐시에 없을 때 실제 Custom Vision + OCR 호출"""
+    cfg = cfg or config.current()
+    preds = _predict(img_bytes, iteration or current_iteration(), cfg)
     if not preds:
         return "분류 실패", 0.0, ""
 
@@ -168,15 +368,78 @@ def classify_pill(image):
     base_tag = base["tagName"]
     base_prob = base["probability"] * 100
 
+    # 신뢰도 게이트 (gating.py): 너무 낮으면 재촬영 안내, 아주 높고 2등과 차이가 크면 OCR 생략
+    gate = gating.decide(preds)
+    gating.stats.record(gate)
+    if gate == "retake":
+        return gating.RETAKE_TAG, base_prob, ""
+    if gate == "skip_ocr":
+        return base_tag, base_prob, ""
+
+    if on_detect is not None:
+        on_detect(base_tag, base_prob)
+
     # OCR 
-    ocr_text = ocr_pill_text(image)  # 이미 만들어둔 OCR 함수
+    t0 = time.perf_counter()
+    ocr_text = ocr_pill_text(image, cfg, base.get("boundingBox"))  # 이미 만들어둔 OCR 함수
+    gating.stats.observe("ocr", time.perf_counter() - t0)
     if not ocr_text:
         # OCR 실패 → Custom Vision 결과 그대로 사용
         return base_tag, base_prob, ""
 
+    # 각인 별칭 인덱스(imprint_alias.json)로 OCR 글자 → 한글 태그 바로 찾기
+    alias_tags = imprint_alias.lookup(ocr_text, get_scorer())
+    if alias_tags:
+        matched = [p for p in preds if p["tagName"] in alias_tags]
+        if matched:
+            best = max(matched, key=lambda x: x["probability"])
+            return best["tagName"], best["probability"] * 100, ocr_text
+
     ocr_norm = _normalize(ocr_text)  # 알파벳/숫자만 남기고 대문자로
 
     # 알파벳 유사도 먼저 보는 로직 
+    best_tag, best_prob, best_sim = _pick_by_ocr(preds, ocr_norm, base_tag, base_prob)
+
+    SIM_THRESHOLD = 0.25  # 필요하면 조절
+    if best_sim < SIM_THRESHOLD:
+        return base_tag, base_prob, ocr_text
+
+    return best_tag, best_prob, ocr_text
+
+
+# 진행 중인 같은 요청 합치기 (singleflight.py) — 분석은 사진 해시, 설명은 약 이름 기준
+flights = singleflight.SingleFlight()
+
+
+# 후보가 이 개수 이상이면 scoring.py의 NumPy 일괄 채점 사용 (적으면 루프가 더 빠름)
+SCORER_MIN_CANDIDATES = int(os.getenv("SCORER_MIN_CANDIDATES", "4"))
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_scorer():
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                import scoring
+
+                _scorer = scoring.CandidateScorer()
+    return _scorer
+
+
+def _pick_by_ocr(preds, ocr_norm, base_tag, base_prob):
+    """
+    OCR 글자와 가장 비슷한 후보 (tag, prob, sim).
+    유사도 최대 → 동점이면 확률 큰 것 → 그래도 같으면 앞쪽 후보
+    """
+    if len(preds) >= SCORER_MIN_CANDIDATES:
+        names = [p["tagName"] for p in preds]
+        probs = [p["probability"] * 100 for p in preds]
+        i, sim = get_scorer().best(ocr_norm, names, probs)
+        return names[i], probs[i], sim
+
     best_tag = base_tag
     best_prob = base_prob
     best_sim = -1.0
@@ -193,11 +456,7 @@ def classify_pill(image):
             best_tag = tag
             best_prob = prob
 
-    SIM_THRESHOLD = 0.25  # 필요하면 조절
-    if best_sim < SIM_THRESHOLD:
-        return base_tag, base_prob, ocr_text
-
-    return best_tag, best_prob, ocr_text
+    return best_tag, best_prob, best_sim
 
 
 # Azure OpenAI로 약 설명 생성
@@ -205,35 +464,72 @@ def classify_pill(image):
 def explain_pill_with_gpt(pill_name: str, ocr_text: str = "", prob: float = 0.0) -> str:
     if pill_name in ["이미지 없음", "분류 실패"]:
         return "이미지 인식이 제대로 되지 않아 약 정보를 생성할 수 없습니다. 다시 촬영해 주세요."
+    if pill_name == gating.RETAKE_TAG:
+        return gating.RETAKE_MESSAGE
 
-    system_msg = (
-        "당신은 복약 안내를 도와주는 친절한 약사입니다. "
-        "모델이 예측한 약 이름과 알약 표면의 글자(알파벳/숫자)를 참고해서 "
-        "해당 약에 대한 정보를 한국어로 설명해 주세요. "
-        "1) 어떤 약인지, 2) 일반적인 효능, 3) 기본 복용 방법, "
-        "4) 대표적인 주의사항/부작용을 bullet 형식으로 정리해 주세요. "
-        "AI 데모 서비스이므로 실제 제품명이나 성분이 100% 정확하지 않을 수 있습니다. "
-        "답변 마지막에는 반드시 '정확한 복약 안내는 약사·의사와 상의해 주세요.' 문장을 포함하세요."
-    )
+    # 설명은 약 이름 기준으로 캐시 (신뢰도/OCR 글자는 문구만 조금 달라지므로 키에서 제외)
+    cached = explain_cache.get(pill_name)
+    if cached is not None:
+        return cached
 
-    user_msg = (
-        f"모델이 예측한 약 이름: {pill_name}\n"
-        f"모델 신뢰도: {prob:.1f}%\n"
-        f"OCR로 읽힌 알약 표면 글자: '{ocr_text}'\n\n"
-        "위 정보를 바탕으로, 가장 가능성이 높은 약품을 기준으로 설명해 주세요. "
-        "약 이름이 애매하거나 여러 후보가 있을 수 있으면, "
-        "첫 번째 bullet에서 포장지/설명서를 반드시 확인하라고 언급해 주세요."
-    )
+    # 같은 약 설명을 동시에 여러 요청이 만들지 않도록 약 이름으로 합침
+    # (추측 실행도 같은 키를 씀. 그쪽이 취소돼서 None이 오면 다시 요청)
+    for _ in range(3):
+        detail = flights.do(f"explain:{pill_name}", lambda: _explain_timed(pill_name, ocr_text, prob))
+        if detail is not None:
+            return detail
+    return _explain_timed(pill_name, ocr_text, prob)
 
-    response = client.chat.completions.create(
-        model=DEPLOYMENT_NAME,
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ],
-        temperature=0.4,
-    )
-    return response.choices[0].message.content.strip()
+
+def _explain_timed(pill_name: str, ocr_text: str, prob: float) -> str:
+    t0 = time.perf_counter()
+    try:
+        return _explain_uncached(pill_name, ocr_text, prob)
+    finally:
+        gating.stats.observe("explain", time.perf_counter() - t0)
+
+
+def _explain_uncached(pill_name: str, ocr_text: str, prob: float, cancel=None, on_delta=None) -> str:
+    """
+    캐시에 없을 때 로컬 DB 조회 또는 GPT 생성.
+    cancel(threading.Event처럼 is_set()이 있는 객체)을 주면 스트리밍으로 만들고, 도중에 켜지면 캐시에 넣지 않고 None
+    """
+    # 로컬 의약품 DB에 있으면 생성 대신 DB 내용으로 채움 (GPT는 다듬기만)
+    # 태그 이름으로만 찾음 — 각인으로 찾으면 다른 제품 정보가 이 이름으로 캐시될 수 있음
+    mono = drug_db.lookup(pill_name)
+    if mono is not None:
+        detail = drug_db.format_monograph(mono)
+        if DRUG_DB_REPHRASE:
+            detail = _rephrase_monograph(detail)
+        explain_cache.set(pill_name, detail)
+        return detail
+
+    if cancel is None:
+        detail = prompts.chat("explain", pill_name=pill_name, prob=prob, ocr_text=ocr_text)
+    else:
+        parts = []
+        for delta in prompts.stream("explain", cancel, pill_name=pill_name, prob=prob, ocr_text=ocr_text):
+            parts.append(delta)
+            if on_delta is not None:
+                on_delta(delta)
+        if cancel.is_set():
+            return None
+        detail = "".join(parts).strip()
+    explain_cache.set(pill_name, detail)
+    return detail
+
+
+# DB 내용을 GPT로 짧게 다듬을지 여부 (끄면 GPT 호출 없이 DB 문장 그대로)
+DRUG_DB_REPHRASE = os.getenv("DRUG_DB_REPHRASE", "0") == "1"
+
+
+def _rephrase_monograph(detail: str) -> str:
+    """DB에서 채운 설명을 쉬운 말로만 다듬음. 새 정보는 추가하지 않고 출력 길이도 짧게 제한"""
+    try:
+        return prompts.chat("rephrase", detail=detail)
+    except Exception as e:
+        print("설명 다듬기 에러:", e)
+        return detail
 
 
 # Gradio에서 호출할 최종 함수
@@ -242,9 +538,123 @@ def analyze_pill(image):
     if image is None:
         return "이미지가 업로드되지 않았습니다.", ""
 
-    pill_name, prob, ocr_text = classify_pill(image)
-    detail = explain_pill_with_gpt(pill_name, ocr_text, prob)
+    # UI는 파일 경로를 넘김 → 디코딩 전에 크기/포맷/해상도 검사 (ingest.py)
+    if isinstance(image, (str, os.PathLike)):
+        try:
+            ingest.check_size(image)
+        except ingest.IngestError as e:
+            return str(e), ""
+        except OSError:
+            return "이미지가 업로드되지 않았습니다.", ""
+        # 같은 파일 내용의 분석이 진행 중이면 디코딩부터 합침 (더블 클릭 / 같은 사진 동시 업로드)
+        return flights.do(f"analyze:{_file_digest(image)}", lambda: _analyze_path(image))
+
+    return _analyze_image(image)
+
+
+def _file_digest(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _analyze_path(path):
+    try:
+        return _result_text(*_load_and_analyze(path))
+    except (ingest.IngestError, bufpool.MemoryBusy) as e:
+        return str(e), ""
+
+
+def _load_and_analyze(source, explain=True):
+    """
+    경로 / 바이트 → 분류 + 설명. 디코딩 전에 워커 메모리 예산을 예약하고(bufpool.budget),
+    분류가 끝나 이미지가 더 필요 없으면 GPT 설명을 기다리지 않고 이미지를 닫고 예약을 푼다.
+    브라우저에서 줄여 보낸 JPEG는 디코딩하지 않고 바이트 그대로 쓴다 (ingest.open_upload)
+    """
+    lease = bufpool.budget.reserve(ingest.estimate_memory(source))
+    image = None
+
+    def release():
+        bufpool.close_image(image)
+        lease.release()
+
+    try:
+        image = ingest.open_upload(source)
+        return _classify_and_explain(image, explain, release)
+    finally:
+        release()
 
+
+def analyze_bytes(data: bytes, explain: bool = True) -> dict:
+    """
+    REST API / 배치용: 이미지 바이트 → {"tag", "probability", "ocr_text", "explanation"}.
+    검사에 걸리면 ingest.IngestError. UI와 같은 캐시 / 요청 합치기를 쓴다.
+    """
+    ingest.check_size(data)
+    digest = hashlib.sha256(data).hexdigest()
+
+    def run():
+        pill_name, prob, ocr_text, detail = _load_and_analyze(data, explain)
+        result = {"tag": pill_name, "probability": round(prob, 2), "ocr_text": ocr_text}
+        if explain:
+            result["explanation"] = detail
+        return result
+
+    return flights.do(f"analyze_bytes:{digest}:{int(explain)}", run)
+
+
+class _SharedCancel:
+    """추측한 요청이 취소해도 같은 설명을 기다리는 다른 요청이 있으면 끝까지 만듦"""
+
+    def __init__(self, cancel, key):
+        self.cancel = cancel
+        self.key = key
+
+    def is_set(self):
+        return self.cancel.is_set() and not flights.waiting(self.key)
+
+
+def _speculate_explain(tag, prob, cancel, on_delta):
+    # explain_pill_with_gpt와 같은 키로 합쳐서, 같은 태그가 몰려도 GPT 스트림은 하나만
+    key = f"explain:{tag}"
+    shared = _SharedCancel(cancel, key)
+    return flights.do(key, lambda: _explain_uncached(tag, "", prob, cancel=shared, on_delta=on_delta))
+
+
+def _classify_and_explain(image, explain=True, release=None):
+    """
+    분류 + 설명 → (약 이름, 신뢰도, OCR 글자, 설명 or None).
+    release: 분류가 끝나 이미지가 더 필요 없을 때 부를 함수 (이미지 닫기 / 메모리 예약 해제)
+    SPECULATIVE=1이면 OCR 하는 동안 Custom Vision top1 설명을 미리 만들어 두고,
+    최종 태그가 같으면 그것을 쓰고 다르면 취소 후 다시 만든다 (speculative.py)
+    """
+    spec = None
+    if explain and speculative.SPECULATIVE:
+        spec = speculative.Speculation(_speculate_explain, explain_cache.get)
+    try:
+        pill_name, prob, ocr_text = classify_pill(image, on_detect=spec.start if spec else None)
+    except BaseException:
+        if spec is not None:
+            spec.cancel()
+        raise
+    if release is not None:
+        release()
+    if not explain:
+        return pill_name, prob, ocr_text, None
+
+    detail = spec.resolve(pill_name) if spec else None
+    if detail is None:
+        detail = explain_pill_with_gpt(pill_name, ocr_text, prob)
+    return pill_name, prob, ocr_text, detail
+
+
+def _analyze_image(image):
+    return _result_text(*_classify_and_explain(image))
+
+
+def _result_text(pill_name, prob, ocr_text, detail):
     if ocr_text:
         header_text = (
             f"예측된 약 이름: {pill_name} (신뢰도: {prob:.1f}%) | "
@@ -259,328 +669,77 @@ def answer_drug_question(pill_name: str, ocr_text: str, user_question: str) -> s
     if not user_question.strip():
         return "질문을 입력해 주세요."
 
-    system_msg = (
-        "당신은 복약 상담을 도와주는 전문 약사입니다. "
-        "사용자가 질문한 복약 관련 궁금증에 대해 안전을 최우선으로 답변하세요. "
-        "약물 병용(같이 복용 가능 여부), 복용 시간, 주의사항에 대해 설명할 수 있습니다. "
-        "정확하지 않거나 위험 가능성이 있으면 반드시 주의를 주고 "
-        "의사·약사 상담을 권장해야 합니다."
-    )
+    # 같은 약에 대해 거의 같은 질문이면 저장된 답 재사용
+    qa_cache = get_qa_cache()
+    cached, vec = qa_cache.lookup(pill_name, user_question)
+    if cached is not None:
+        return cached
 
-    user_msg = (
-        f"현재 인식된 약 이름: {pill_name}\n"
-        f"OCR로 읽힌 알약 표면 글자: '{ocr_text}'\n\n"
-        f"사용자 질문: {user_question}\n\n"
-        "위 정보를 바탕으로 한국어로 친절하게 답변해 주세요. "
-        "답변 마지막에는 반드시 "
-        "'정확한 복약 여부는 약사 또는 의사와 상담해 주세요.'를 포함하세요."
-    )
+    answer = prompts.chat("qa", pill_name=pill_name, ocr_text=ocr_text, question=user_question)
+    qa_cache.put(pill_name, user_question, answer, vec=vec)
+    return answer
 
-    response = client.chat.completions.create(
-        model=DEPLOYMENT_NAME,
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ],
-        temperature=0.3,
-    )
 
-    return response.choices[0].message.content.strip()
-
-
-# Gradio UI CSS 
-
-custom_css = """
-
-body, .gradio-container {
-    background-color: #ffffff !important;
-    font-family: -apple-system, BlinkMacSystemFont, "Apple SD Gothic Neo", system-ui, sans-serif;
-}
-
-.gradio-container .gr-block,
-.gradio-container .gr-panel,
-.gradio-container .gr-group,
-.gradio-container .gr-box,
-.gradio-container .gr-form,
-.gradio-container .styler,
-.gradio-container .wrap,
-.gradio-container .contain {
-    background-color: transparent !important;
-    background: transparent !important;
-    border: none !important;
-    box-shadow: none !important;
-    min-height: 0 !important;
-}
-
-.pill-phone-card {
-    max-width: 800px;
-    margin: 20px auto;
-    background: #ffffff;
-    border-radius: 32px;
-    box-shadow: 0 10px 40px rgba(0,0,0,0.06);
-    padding: 30px;
-    border: 1px solid #f0f0f0;
-}
-
-.mint-point {
-    color: #4FD1C5 !important; /* 민트색 */
-}
-
-.pill-landing-title, .pill-header-title {
-    font-size: 32px;
-    font-weight: 800;
-    text-align: center;
-    color: #38B2AC; /* 다크 민트 */
-    margin-bottom: 8px;
-}
-
-.pill-landing-sub, .pill-header-sub {
-    text-align: center;
-    font-size: 14px;
-    color: #718096;
-    margin-bottom: 24px;
-}
-
-.pill-landing-highlight {
-    color: #319795;
-    font-weight: 700;
-}
-
-.pill-landing-box {
-    margin-top: 10px;
-    padding: 20px;
-    border-radius: 20px;
-    background: #F0FFF4; 
-    border: 1px dashed #B2F5EA;
-    font-size: 13px;
-    color: #2D3748;
-}
-
-
-/* 랜딩 화면의 시작하기 버튼만 전체 폭 */
-.pill-landing-start-btn {
-    margin-top: 20px;
-    width: 100%;
-    background: linear-gradient(135deg, #4FD1C5, #38B2AC) !important;
-    color: #ffffff !important;
-    font-weight: 800 !important;
-    border-radius: 16px !important;
-    height: 50px;
-    border: none !important;
-}
-
-/* 도구 화면의 메인 버튼 (폭은 flex로 맞춤) */
-.pill-btn-main {
-    background: linear-gradient(135deg, #4FD1C5, #38B2AC) !important;
-    color: #ffffff !important;
-    font-weight: 800 !important;
-    border-radius: 16px !important;
-    border: none !important;
-}
-.pill-guide-list span.num {
-    display: inline-block;
-    width: 20px;
-    height: 20px;
-    border-radius: 50%;
-    background: #4FD1C5;
-    color: #fff;
-    text-align: center;
-    font-size: 12px;
-    line-height: 20px;
-    margin-right: 8px;
-}
-
-.pill-image-wrapper .gradio-image {
-    border-radius: 24px;
-    overflow: hidden;
-    border: 2px solid #E6FFFA;
-}
-.pill-result-box {
-    margin-top: 16px;
-    padding: 16px;
-    border-radius: 20px;
-    background: #ffffff;
-    border: 1px solid #E6FFFA;
-}
-
-.pill-result-title {
-    font-size: 14px;
-    font-weight: 700;
-    color: #2C7A7B;
-    margin-bottom: 8px;
-}
-
-.pill-btn-sub {
-    background: #E6FFFA !important;
-    color: #2C7A7B !important;
-    border-radius: 16px !important;
-    border: none !important;
-}
-
-.pill-footer-note, .pill-landing-footer {
-    margin-top: 24px;
-    font-size: 12px;
-    color: #A0AEC0;
-    text-align: center;
-}
-
-.btn-main, .btn-secondary, .pill-btn-main, .pill-btn-sub {
-    height: 54px !important; 
-    min-height: 54px !important; 
-    max-height: 54px !important;
-    line-height: 54px !important; 
-    padding: 0 20px !important;
-    display: flex !important;
-    align-items: center !important;
-    justify-content: center !important;
-}
-"""
-
-
-# 화면 전환용 함수
-
-def go_tool():
-    return gr.update(visible=False), gr.update(visible=True)
-
-
-# Gradio Blocks
-
-with gr.Blocks(css=custom_css, title="AI 복약 가이드") as demo:
-
-    with gr.Column(elem_classes=["pill-phone-card"]) as main_card:
-
-        # 랜딩 화면
-        with gr.Column(visible=True) as landing_group:
-            gr.Markdown("""
-<div class="pill-landing-title">무엇이든 물어보세요 약사님</div>
-<div class="pill-landing-sub">
-사진 한 장으로 <span class="pill-landing-highlight">어떤 약인지, 어떻게 먹어야 하는지</span><br>
-빠르게 확인할 수 있는 Azure 기반 데모 서비스입니다.
-</div>
-
-<div class="pill-landing-box">
-  <div class="pill-landing-step">① 알약 앞·뒷면을 또렷하게 촬영해 주세요.</div>
-  <div class="pill-landing-step">② 사진을 업로드하면 알약을 인식하고 이름을 예측합니다.</div>
-  <div class="pill-landing-step">③ Azure OpenAI가 효능, 복용법, 주의사항을 쉽게 설명해 줍니다.</div>
-</div>
-""")
-
-            start_btn = gr.Button("시작하기", elem_classes=["pill-landing-start-btn"])
-
-            gr.Markdown("""
-<div class="pill-landing-footer">
-※ 본 서비스는 교육용 데모이며, 실제 복약 전에는 반드시 의료진·약사와 상담해 주세요.<br>
-숙명여대 Azure Winter School Team 5
-</div>
-""")
-
-        # 실제 도구 화면 
-        with gr.Column(visible=False) as tool_group:
-
-            gr.Markdown("""
-<div class="pill-header-title">AI 복약 가이드</div>
-<div class="pill-header-sub">
-알약 사진을 업로드하면 어떤 약인지 분류하고,<br>
-복용 방법과 주의사항을 안내해 드립니다.
-</div>
-""")
-
-            gr.Markdown("""
-<div class="pill-guide-title" style="font-weight:700; font-size:15px; margin-bottom:10px;">📸 알약 촬영 가이드</div>
-<div class="pill-guide-list">
-<div style="margin-bottom:5px;"><span class="num">1</span> 알약이 <b>화면 중앙</b>에 오도록 촬영</div>
-<div style="margin-bottom:5px;"><span class="num">2</span> <b>밝은 조명</b> 아래에서 찍어 주세요</div>
-<div style="margin-bottom:15px;"><span class="num">3</span> <b>깔끔한 배경</b>일수록 인식률이 높아집니다</div>
-<div style="margin-bottom:15px;"> ※ 본 서비스는 최대 6MB 이하의 이미지만 업로드할 수 있습니다.<br>
-※ 업로드된 이미지는 분석 목적에만 일시적으로 사용되며, 어떠한 개인 정보도 저장되지 않고 즉시 폐기됩니다.</div>
-</div>
-""")
-
-            with gr.Column(elem_classes=["pill-image-wrapper"]):
-                image_in = gr.Image(
-                    type="pil",
-                    label="",
-                    height=280,
-                    width=280,
-                    show_label=False,
-                )
+# Gradio UI (ui.py) — 필요할 때만 생성
 
-            with gr.Row(elem_classes=["pill-btn-row"], equal_height=True):
-                clear_btn = gr.Button("다시 선택", elem_classes=["pill-btn-sub"])
-                submit_btn = gr.Button("결과 분석하기", elem_classes=["pill-btn-main"])
-
-            with gr.Column(elem_classes=["pill-result-box"]):
-                gr.Markdown('<div class="pill-result-title">🔍 인식된 약품 정보</div>')
-                pill_header = gr.Textbox(
-                    placeholder="이미지를 업로드한 뒤 [결과 분석하기] 버튼을 눌러 주세요.",
-                    interactive=False,
-                    lines=1,
-                    show_label=False,
-                )
+_demo = None
 
-            with gr.Column(elem_classes=["pill-result-box"]):
-                gr.Markdown('<div class="pill-result-title">💊 상세 복약 가이드</div>')
-                pill_detail = gr.Textbox(
-                    placeholder="약의 효능, 복용 방법, 주의사항이 이곳에 표시됩니다.",
-                    interactive=False,
-                    lines=10,
-                    show_label=False,
-                )
 
-            with gr.Column(elem_classes=["pill-result-box"]):
-                gr.Markdown('<div class="pill-result-title">🧠 복약 궁금증 질문하기</div>')
+def build_demo():
+    """Gradio Blocks 데모를 처음 호출될 때 만들어 재사용"""
+    global _demo
+    if _demo is None:
+        import ui
 
-                user_question = gr.Textbox(
-                    placeholder="예: 이 약이랑 타이레놀 같이 먹어도 되나요?",
-                    lines=2,
-                    show_label=False,
-                )
+        _demo = ui.build_demo(analyze_pill, answer_drug_question)
+    return _demo
 
-                ask_btn = gr.Button("질문하기", elem_classes=["pill-btn-main"])
 
-                answer_box = gr.Textbox(
-                    placeholder="질문에 대한 답변이 여기에 표시됩니다.",
-                    lines=6,
-                    interactive=False,
-                    show_label=False,
-                )
+def __getattr__(name):
+    # `gradio newmain.py` 리로드 모드나 기존 코드가 newmain.demo / newmain.client를 찾을 때 대비
+    if name == "demo":
+        return build_demo()
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-                
 
-            gr.Markdown("""
-<div class="pill-footer-note">
-※ 본 서비스는 교육용 데모이며, 실제 복약 전에는 반드시 의료진·약사와 상담해 주세요.<br>
- 숙명여대 Azure Winter School Team 5
-</div>
-""")
-
-    #버튼 동작 
-    start_btn.click(
-        fn=lambda: (gr.update(visible=False), gr.update(visible=True)),
-        inputs=None,
-        outputs=[landing_group, tool_group],
-    )
-
-    submit_btn.click(
-        fn=analyze_pill,
-        inputs=image_in,
-        outputs=[pill_header, pill_detail],
-    )
+def launch(**kwargs):
+    """
+    서버 실행. WARMUP=1이면 포트를 열기 전에 warmup.warm_up()을 먼저 돌려서
+    헬스 체크가 워밍업이 끝난 인스턴스에만 트래픽을 보내도록 한다.
+    READY_FILE이 지정돼 있으면 서버가 뜬 뒤 그 파일을 만들어 준비 완료를 알린다.
+    SIGHUP을 받으면 재시작 없이 .env를 다시 읽는다 (config.py).
+    """
+    config.install_signal_handler()
+    # 6MB 넘는 업로드는 Gradio가 받는 단계에서 거절 (analyze_pill까지 오지 않음)
+    kwargs.setdefault("max_file_size", ingest.MAX_UPLOAD_BYTES)
+    import ui
+
+    for key, value in ui.launch_kwargs().items():
+        kwargs.setdefault(key, value)
+    if os.getenv("WARMUP", "0") == "1":
+        import warmup
+
+        warmup.warm_up()
+
+    demo = build_demo()
+    ready_file = os.getenv("READY_FILE")
+    if not ready_file:
+        demo.launch(**kwargs)
+        return
+
+    demo.launch(prevent_thread_lock=True, **kwargs)
+    with open(ready_file, "w") as f:
+        f.write(str(os.getpid()))
+    try:
+        demo.block_thread()
+    finally:
+        if os.path.exists(ready_file):
+            os.remove(ready_file)
 
-    clear_btn.click(
-        fn=lambda: (None, "", ""),
-        inputs=None,
-        outputs=[image_in, pill_header, pill_detail],
-    )
-    ask_btn.click(
-        fn=lambda q, header: answer_drug_question(
-            pill_name=header.split(" (")[0].replace("예측된 약 이름: ", ""),
-            ocr_text="",
-            user_question=q
-            ),
-            inputs=[user_question, pill_header],
-            outputs=answer_box,
-    )
 
 if __name__ == "__main__":
-    demo.launch()
+    # warmup.py 등에서 `import newmain` 해도 같은 모듈(캐시/세션)을 쓰도록 등록
+    sys.modules.setdefault("newmain", sys.modules[__name__])
+    launch()
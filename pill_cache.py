@@ -0,0 +1,471 @@
+"""
+약 인식 결과 / GPT 설명 캐시.
+
+키는 문자열, 값은 JSON으로 직렬화 가능한 값만 넣는다.
+- MemoryCache: 프로세스 내부 LRU (기본)
+- SQLiteCache: 여러 워커 프로세스가 공유하는 WAL 파일 (serve.py)
+- DiskCache: 재시작해도 남는 2차 캐시 (DISK_CACHE_PATH를 지정했을 때만). MemoryCache 뒤에 TieredCache로
+  붙여서 메모리에 없으면 디스크에서 읽고 메모리도 채운다 → 배포 직후에도 Azure를 다시 부르지 않음.
+  디스크 TTL은 캐시 자체 TTL보다 길어지지 않고, 디스크에서 채운 메모리 항목도 남은 시간만큼만 산다
+
+DiskCache 값은 msgpack(없으면 JSON)으로 직렬화하고 DISK_COMPRESS_MIN 바이트 이상이면
+zstd(없으면 zlib)로 압축한다. 형식은 값 앞 1바이트에 적어 두므로 라이브러리가 바뀌어도 섞여 있어도 됨.
+전체 크기가 DISK_CACHE_MB를 넘으면 가장 오래 안 쓴 항목부터 지운다 (네임스페이스 구분 없이).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """스레드 안전 LRU + TTL 캐시 (프로세스 내부 전용)"""
+
+    def __init__(self, max_items: int = 1024, ttl: float = None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (만료 시각 or None, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """ttl을 주면 이 항목만 그 시간 뒤에 만료 (디스크에서 채울 때 남은 시간)"""
+        ttl = ttl or self.ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> int:
+        """prefix로 시작하는 키를 모두 삭제하고 삭제 개수 반환"""
+        with self._lock:
+            keys = [k for k in self._data if k.startswith(prefix)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    여러 프로세스가 같이 쓰는 SQLite(WAL) 캐시.
+    serve.py 워커들이 같은 파일을 열면 한 워커의 결과를 다른 워커도 바로 쓸 수 있다.
+    MemoryCache와 같은 메서드를 제공한다. 개수가 넘치면 오래 전에 저장된 것부터 지운다.
+    """
+
+    _EVICT_EVERY = 64  # set() 이 횟수마다 한 번씩 개수 확인
+
+    def __init__(self, path: str, namespace: str, max_items: int = 1024, ttl: float = None):
+        self.path = path
+        self.namespace = namespace
+        self.max_items = max_items
+        self.ttl = ttl
+        self._local = threading.local()
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " expires REAL, stored REAL NOT NULL,"
+            " PRIMARY KEY (ns, key)) WITHOUT ROWID"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS cache_stored ON cache (ns, stored)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        row = self._conn().execute(
+            "SELECT value, expires FROM cache WHERE ns = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        value, expires = row
+        if expires is not None and expires < time.time():
+            self.delete(key)
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value):
+        now = time.time()
+        expires = now + self.ttl if self.ttl else None
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (ns, key, value, expires, stored) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value, ensure_ascii=False), expires, now),
+        )
+        self._sets += 1
+        if self._sets % self._EVICT_EVERY == 0:
+            self._evict(conn)
+
+    def _evict(self, conn):
+        (count,) = conn.execute(
+            "SELECT COUNT(*) FROM cache WHERE ns = ?", (self.namespace,)
+        ).fetchone()
+        over = count - self.max_items
+        if over > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE ns = ? AND key IN ("
+                " SELECT key FROM cache WHERE ns = ? ORDER BY stored LIMIT ?)",
+                (self.namespace, self.namespace, over),
+            )
+        conn.execute(
+            "DELETE FROM cache WHERE ns = ? AND expires IS NOT NULL AND expires < ?",
+            (self.namespace, time.time()),
+        )
+
+    def delete(self, key):
+        self._conn().execute(
+            "DELETE FROM cache WHERE ns = ? AND key = ?", (self.namespace, key)
+        )
+
+    def delete_prefix(self, prefix: str) -> int:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        cur = self._conn().execute(
+            "DELETE FROM cache WHERE ns = ? AND key LIKE ? ESCAPE '\\'",
+            (self.namespace, escaped + "%"),
+        )
+        return cur.rowcount
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache WHERE ns = ?", (self.namespace,))
+
+    def __len__(self):
+        (count,) = self._conn().execute(
+            "SELECT COUNT(*) FROM cache WHERE ns = ?", (self.namespace,)
+        ).fetchone()
+        return count
+
+
+# 디스크 캐시 값 형식 (앞 1바이트 플래그)
+_MSGPACK = 0x01   # 없으면 JSON(utf-8)
+_ZLIB = 0x02
+_ZSTD = 0x04
+
+DISK_COMPRESS_MIN = int(os.getenv("DISK_COMPRESS_MIN", "256"))
+
+_codecs = None
+
+
+def _get_codecs():
+    """(msgpack 모듈 or None, zstandard 모듈 or None) — 처음 쓸 때 한 번만 import"""
+    global _codecs
+    if _codecs is None:
+        try:
+            import msgpack
+        except ImportError:
+            msgpack = None
+        try:
+            import zstandard
+        except ImportError:
+            zstandard = None
+        _codecs = (msgpack, zstandard)
+    return _codecs
+
+
+def encode_value(value) -> bytes:
+    msgpack, zstandard = _get_codecs()
+    flags = 0
+    if msgpack is not None:
+        payload = msgpack.packb(value, use_bin_type=True)
+        flags |= _MSGPACK
+    else:
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(payload) >= DISK_COMPRESS_MIN:
+        if zstandard is not None:
+            payload = zstandard.ZstdCompressor(level=3).compress(payload)
+            flags |= _ZSTD
+        else:
+            payload = zlib.compress(payload, 6)
+            flags |= _ZLIB
+    return bytes([flags]) + payload
+
+
+def decode_value(blob: bytes):
+    """encode_value의 반대. 이 프로세스에 없는 라이브러리로 쓴 값이면 ValueError"""
+    msgpack, zstandard = _get_codecs()
+    flags, payload = blob[0], blob[1:]
+    if flags & _ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard 없음")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif flags & _ZLIB:
+        payload = zlib.decompress(payload)
+    if flags & _MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack 없음")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload.decode("utf-8"))
+
+
+class DiskCache:
+    """
+    재시작해도 남는 SQLite 캐시 (WAL, 여러 워커가 같은 파일을 써도 됨).
+    MemoryCache와 같은 메서드를 제공한다. 파일은 처음 쓸 때 연다 (import 시간에 영향 없음).
+    """
+
+    _EVICT_EVERY = 64      # set() 이 횟수마다 한 번씩 전체 크기 확인
+    _TOUCH_EVERY = 60.0    # 읽을 때 마지막 사용 시각은 이 간격(초)보다 오래됐을 때만 갱신
+
+    def __init__(self, path: str, namespace: str, max_bytes: int, ttl: float = None):
+        self.path = path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS disk_cache ("
+                " ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+                " size INTEGER NOT NULL, expires REAL, used REAL NOT NULL,"
+                " PRIMARY KEY (ns, key)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS disk_cache_used ON disk_cache (used)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key):
+        """(값, 남은 시간(초) or None) — 없거나 만료됐으면 None"""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires, used FROM disk_cache WHERE ns = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        blob, expires, used = row
+        now = time.time()
+        if expires is not None and expires < now:
+            self.delete(key)
+            self.misses += 1
+            return None
+        try:
+            value = decode_value(blob)
+        except Exception as e:
+            print("디스크 캐시 값 읽기 에러:", e)
+            self.delete(key)
+            self.misses += 1
+            return None
+        if now - used > self._TOUCH_EVERY:
+            conn.execute(
+                "UPDATE disk_cache SET used = ? WHERE ns = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+        self.hits += 1
+        return value, (None if expires is None else expires - now)
+
+    def set(self, key, value):
+        blob = encode_value(value)
+        now = time.time()
+        expires = now + self.ttl if self.ttl else None
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO disk_cache (ns, key, value, size, expires, used)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (self.namespace, key, blob, len(blob) + len(key), expires, now),
+        )
+        self._sets += 1
+        if self._sets % self._EVICT_EVERY == 0:
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """만료된 항목을 지우고, 전체 크기가 max_bytes를 넘으면 90%가 될 때까지 오래 안 쓴 것부터 지움"""
+        conn.execute(
+            "DELETE FROM disk_cache WHERE expires IS NOT NULL AND expires < ?", (time.time(),)
+        )
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM disk_cache").fetchone()
+        if total <= self.max_bytes:
+            return
+        need = total - int(self.max_bytes * 0.9)
+        victims = []
+        for ns, key, size in conn.execute("SELECT ns, key, size FROM disk_cache ORDER BY used"):
+            victims.append((ns, key))
+            need -= size
+            if need <= 0:
+                break
+        conn.executemany("DELETE FROM disk_cache WHERE ns = ? AND key = ?", victims)
+        self.evicted += len(victims)
+
+    def delete(self, key):
+        self._conn().execute(
+            "DELETE FROM disk_cache WHERE ns = ? AND key = ?", (self.namespace, key)
+        )
+
+    def delete_prefix(self, prefix: str) -> int:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        cur = self._conn().execute(
+            "DELETE FROM disk_cache WHERE ns = ? AND key LIKE ? ESCAPE '\\'",
+            (self.namespace, escaped + "%"),
+        )
+        return cur.rowcount
+
+    def clear(self):
+        self._conn().execute("DELETE FROM disk_cache WHERE ns = ?", (self.namespace,))
+
+    def size_bytes(self) -> int:
+        (total,) = self._conn().execute(
+            "SELECT COALESCE(SUM(size), 0) FROM disk_cache WHERE ns = ?", (self.namespace,)
+        ).fetchone()
+        return total
+
+    def __len__(self):
+        (count,) = self._conn().execute(
+            "SELECT COUNT(*) FROM disk_cache WHERE ns = ?", (self.namespace,)
+        ).fetchone()
+        return count
+
+
+class TieredCache:
+    """
+    메모리 → 디스크 2단 캐시. get은 메모리에 없으면 디스크에서 읽어 메모리를 채우고,
+    set / delete / clear는 두 곳 모두에 적용한다.
+    """
+
+    def __init__(self, memory, disk):
+        self.memory = memory
+        self.disk = disk
+
+    @property
+    def hits(self):
+        return self.memory.hits + self.disk.hits
+
+    @property
+    def misses(self):
+        return self.disk.misses
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        try:
+            entry = self.disk.get_entry(key)
+        except sqlite3.Error as e:
+            print("디스크 캐시 읽기 에러:", e)
+            return default
+        if entry is None:
+            return default
+        value, remaining = entry
+        # 디스크에 남은 시간만큼만 메모리에 둠 (다시 채울 때마다 TTL이 늘어나지 않게)
+        self.memory.set(key, value, remaining)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        try:
+            self.disk.set(key, value)
+        except sqlite3.Error as e:
+            # 디스크가 꽉 찼거나 잠겨 있어도 요청은 계속 (메모리 캐시만 씀)
+            print("디스크 캐시 쓰기 에러:", e)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        try:
+            self.disk.delete(key)
+        except sqlite3.Error as e:
+            print("디스크 캐시 삭제 에러:", e)
+
+    def delete_prefix(self, prefix: str) -> int:
+        count = self.memory.delete_prefix(prefix)
+        try:
+            return self.disk.delete_prefix(prefix)
+        except sqlite3.Error as e:
+            print("디스크 캐시 삭제 에러:", e)
+            return count
+
+    def clear(self):
+        self.memory.clear()
+        try:
+            self.disk.clear()
+        except sqlite3.Error as e:
+            print("디스크 캐시 삭제 에러:", e)
+
+    def __len__(self):
+        try:
+            return len(self.disk)
+        except sqlite3.Error:
+            return len(self.memory)
+
+
+# 캐시 생성 — CACHE_BACKEND=sqlite 이면 CACHE_PATH 파일을 프로세스끼리 공유
+# CACHE_BACKEND=memory 이고 DISK_CACHE_PATH를 지정하면 메모리 뒤에 디스크 캐시를 붙임 (기본은 끔)
+# 디스크 TTL은 DISK_CACHE_TTL과 캐시 자체 ttl 중 짧은 쪽
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", "pill_cache.sqlite3")
+DISK_CACHE_PATH = os.getenv("DISK_CACHE_PATH", "")
+DISK_CACHE_MB = float(os.getenv("DISK_CACHE_MB", "256"))
+DISK_CACHE_TTL = float(os.getenv("DISK_CACHE_TTL", str(7 * 86400)))
+
+
+def make_cache(namespace: str, max_items: int = 1024, ttl: float = None):
+    backend = os.getenv("CACHE_BACKEND", CACHE_BACKEND)
+    if backend == "sqlite":
+        return SQLiteCache(os.getenv("CACHE_PATH", CACHE_PATH), namespace, max_items, ttl)
+    if backend == "memory":
+        memory = MemoryCache(max_items, ttl)
+        disk_path = os.getenv("DISK_CACHE_PATH", DISK_CACHE_PATH)
+        if not disk_path:
+            return memory
+        max_bytes = int(float(os.getenv("DISK_CACHE_MB", DISK_CACHE_MB)) * 1024 * 1024)
+        disk_ttl = float(os.getenv("DISK_CACHE_TTL", DISK_CACHE_TTL)) or None
+        if ttl:
+            disk_ttl = min(ttl, disk_ttl) if disk_ttl else ttl
+        return TieredCache(memory, DiskCache(disk_path, namespace, max_bytes, disk_ttl))
+    raise ValueError(f"알 수 없는 CACHE_BACKEND: {backend}")
@@ -0,0 +1,367 @@
+"""
+GPT 프롬프트 관리 (템플릿 버전 / 공통 system 앞부분 / 호출별 max_tokens / 토큰 수 기록).
+
+newmain.py의 chat completion은 모두 chat(name, ...) 또는 stream(name, ...)을 거친다.
+- TEMPLATES[name][버전]: system / user 문장과 temperature. 기본 버전은 DEFAULT_VERSION,
+  PROMPT_VERSION_<NAME>=v1 처럼 호출 종류별로 바꿀 수 있다 (v1 = 예전 긴 문장 그대로, 롤백용)
+- v2는 모든 호출이 같은 SYSTEM_PREFIX로 시작한다 (말투 / 안전 문구를 한 곳에서 관리).
+  지금 프롬프트는 200토큰 안팎이라 Azure OpenAI 프롬프트 캐시(1024토큰 이상부터)에는 걸리지 않는다.
+  실제로 캐시됐는지는 사용량 기록의 cached_tokens로 확인
+- MAX_TOKENS[name]: 출력 길이 상한 (PROMPT_MAX_TOKENS_<NAME>으로 변경) → 응답 시간이 일정해짐
+  상한에 걸려 잘리면(finish_reason == "length") chat()은 상한을 LENGTH_RETRY_FACTOR배로 올려 한 번 더 부르고,
+  그래도 잘리면 ON_LENGTH 규칙대로 안내 문구를 붙이거나(설명 / 질문) Truncated를 던진다(다듬기).
+  stream()은 이미 보낸 조각을 되돌릴 수 없어서 안내 문구를 마지막 조각으로 보냄
+- FIELD_LIMITS: 사용자 입력 등 길이가 제각각인 값은 글자 수를 잘라서 넣음
+- 보내기 전에 입력 토큰 수를 로컬에서 계산 (tiktoken이 있으면 o200k_base, 없으면 글자 수 추정)
+  PROMPT_MAX_INPUT_TOKENS를 넘으면 경고
+- 호출마다 실제 사용량(usage)을 한 줄씩 기록: PROMPT_USAGE_LOG 경로가 있으면 JSONL, 없으면 화면 출력
+  누적값은 usage.snapshot()
+"""
+import json
+import os
+import threading
+import time
+
+import config
+
+DEFAULT_VERSION = os.getenv("PROMPT_VERSION", "v2")
+PROMPT_MAX_INPUT_TOKENS = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "1500"))
+PROMPT_USAGE_LOG = os.getenv("PROMPT_USAGE_LOG", "")
+
+# 모든 v2 프롬프트가 공유하는 system 앞부분 (변수 넣지 말 것)
+SYSTEM_PREFIX = (
+    "당신은 AI 복약 가이드 데모 서비스의 친절한 약사입니다. "
+    "항상 한국어로, 쉬운 말로 짧게 답합니다. "
+    "안전을 최우선으로 하고, 확실하지 않은 내용은 추측하지 말고 주의를 줍니다. "
+    "AI 데모 서비스이므로 제품명이나 성분이 100% 정확하지 않을 수 있습니다."
+)
+
+TEMPLATES = {
+    "pick": {
+        "v1": {
+            "system": (
+                "당신은 약품 라벨을 매칭해 주는 도우미입니다. "
+                "OCR로 읽은 영문 글자와 Custom Vision이 예측한 후보 약 이름(대부분 한글)을 보고, "
+                "가장 가능성이 높은 한글 약 이름 하나만 골라 주세요. "
+                "반드시 후보 목록에 있는 이름만 그대로 출력하세요."
+            ),
+            "user": (
+                "OCR 텍스트: {ocr_text}\n\n"
+                "후보 리스트:\n{candidates}\n\n"
+                "가장 가능성 높은 약 이름 하나만 출력하세요."
+            ),
+            "temperature": 0.0,
+        },
+        "v2": {
+            "system": SYSTEM_PREFIX + "\n\n[작업] 알약 OCR 글자와 후보 약 이름 중 맞는 것 하나를 "
+                      "후보 목록에 있는 그대로 출력합니다. 다른 말은 붙이지 않습니다.",
+            "user": "OCR: {ocr_text}\n후보:\n{candidates}",
+            "temperature": 0.0,
+        },
+    },
+    "explain": {
+        "v1": {
+            "system": (
+                "당신은 복약 안내를 도와주는 친절한 약사입니다. "
+                "모델이 예측한 약 이름과 알약 표면의 글자(알파벳/숫자)를 참고해서 "
+                "해당 약에 대한 정보를 한국어로 설명해 주세요. "
+                "1) 어떤 약인지, 2) 일반적인 효능, 3) 기본 복용 방법, "
+                "4) 대표적인 주의사항/부작용을 bullet 형식으로 정리해 주세요. "
+                "AI 데모 서비스이므로 실제 제품명이나 성분이 100% 정확하지 않을 수 있습니다. "
+                "답변 마지막에는 반드시 '정확한 복약 안내는 약사·의사와 상의해 주세요.' 문장을 포함하세요."
+            ),
+            "user": (
+                "모델이 예측한 약 이름: {pill_name}\n"
+                "모델 신뢰도: {prob:.1f}%\n"
+                "OCR로 읽힌 알약 표면 글자: '{ocr_text}'\n\n"
+                "위 정보를 바탕으로, 가장 가능성이 높은 약품을 기준으로 설명해 주세요. "
+                "약 이름이 애매하거나 여러 후보가 있을 수 있으면, "
+                "첫 번째 bullet에서 포장지/설명서를 반드시 확인하라고 언급해 주세요."
+            ),
+            "temperature": 0.4,
+        },
+        "v2": {
+            "system": SYSTEM_PREFIX + "\n\n[작업] 약 설명: 1) 어떤 약인지 2) 효능 3) 복용 방법 "
+                      "4) 주의사항/부작용을 bullet 4~8줄로. 약 이름이 애매하면 첫 bullet에서 "
+                      "포장지/설명서 확인을 권합니다. 마지막 줄은 "
+                      "'정확한 복약 안내는 약사·의사와 상의해 주세요.'",
+            "user": "약 이름: {pill_name} (신뢰도 {prob:.1f}%)\n표면 글자: '{ocr_text}'",
+            "temperature": 0.4,
+        },
+    },
+    "qa": {
+        "v1": {
+            "system": (
+                "당신은 복약 상담을 도와주는 전문 약사입니다. "
+                "사용자가 질문한 복약 관련 궁금증에 대해 안전을 최우선으로 답변하세요. "
+                "약물 병용(같이 복용 가능 여부), 복용 시간, 주의사항에 대해 설명할 수 있습니다. "
+                "정확하지 않거나 위험 가능성이 있으면 반드시 주의를 주고 "
+                "의사·약사 상담을 권장해야 합니다."
+            ),
+            "user": (
+                "현재 인식된 약 이름: {pill_name}\n"
+                "OCR로 읽힌 알약 표면 글자: '{ocr_text}'\n\n"
+                "사용자 질문: {question}\n\n"
+                "위 정보를 바탕으로 한국어로 친절하게 답변해 주세요. "
+                "답변 마지막에는 반드시 "
+                "'정확한 복약 여부는 약사 또는 의사와 상담해 주세요.'를 포함하세요."
+            ),
+            "temperature": 0.3,
+        },
+        "v2": {
+            "system": SYSTEM_PREFIX + "\n\n[작업] 복약 질문 답변: 병용 가능 여부, 복용 시간, 주의사항 위주로. "
+                      "위험 가능성이 있으면 반드시 경고합니다. 마지막 줄은 "
+                      "'정확한 복약 여부는 약사 또는 의사와 상담해 주세요.'",
+            "user": "약 이름: {pill_name}\n표면 글자: '{ocr_text}'\n질문: {question}",
+            "temperature": 0.3,
+        },
+    },
+    "rephrase": {
+        "v1": {
+            "system": (
+                "당신은 복약 안내를 도와주는 친절한 약사입니다. "
+                "주어진 의약품 정보를 일반인이 이해하기 쉬운 한국어로 짧게 다듬어 주세요. "
+                "bullet 형식과 마지막 문장은 그대로 유지하고, 새로운 정보는 추가하지 마세요."
+            ),
+            "user": "{detail}",
+            "temperature": 0.2,
+        },
+        "v2": {
+            "system": SYSTEM_PREFIX + "\n\n[작업] 주어진 의약품 정보를 쉬운 말로 짧게 다듬습니다. "
+                      "bullet 형식과 마지막 문장은 그대로 두고, 새 정보는 추가하지 않습니다.",
+            "user": "{detail}",
+            "temperature": 0.2,
+        },
+    },
+    # 워밍업: 공통 앞부분을 한 번 보내 연결을 데워 둠
+    "warmup": {
+        "v1": {"system": "", "user": "ping", "temperature": 0.0},
+        "v2": {"system": SYSTEM_PREFIX, "user": "ping", "temperature": 0.0},
+    },
+}
+
+# 호출 종류별 출력 토큰 상한
+MAX_TOKENS = {
+    name: int(os.getenv(f"PROMPT_MAX_TOKENS_{name.upper()}", default))
+    for name, default in (("pick", "60"), ("explain", "700"), ("qa", "500"),
+                          ("rephrase", "350"), ("warmup", "1"))
+}
+
+# 출력이 상한에 걸렸을 때: 상한을 몇 배로 올려 다시 부를지 / 그래도 잘리면 어떻게 할지
+# "notice" = 답 끝에 LENGTH_NOTICE를 붙임, "raise" = Truncated (호출한 쪽이 원문을 쓰게)
+# 목록에 없는 호출(pick / warmup)은 잘린 그대로 돌려줌
+LENGTH_RETRY_FACTOR = float(os.getenv("PROMPT_LENGTH_RETRY_FACTOR", "2"))
+ON_LENGTH = {"explain": "notice", "qa": "notice", "rephrase": "raise"}
+LENGTH_NOTICE = "\n\n(답변이 길어 중간에 잘렸습니다. 나머지 내용은 약사·의사에게 확인해 주세요.)"
+
+# 템플릿에 넣기 전에 자르는 값 (글자 수)
+FIELD_LIMITS = {"ocr_text": 120, "question": 500, "candidates": 1200, "detail": 2000}
+
+
+def version(name: str) -> str:
+    return os.getenv(f"PROMPT_VERSION_{name.upper()}", DEFAULT_VERSION)
+
+
+# 로컬 토큰 수 계산
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken 인코더, 설치 안 돼 있으면 False"""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoding()
+    if enc:
+        return len(enc.encode(text))
+    # 추정: 영문/숫자는 4글자에 1토큰, 한글 등은 1글자에 1토큰 정도
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def count_messages(messages) -> int:
+    # 메시지마다 역할 / 구분자 토큰 몇 개씩 붙음
+    return sum(count_tokens(m["content"]) + 4 for m in messages) + 2
+
+
+def build(name: str, ver: str = None, **fields):
+    """템플릿 → (messages, 버전)"""
+    ver = ver or version(name)
+    if ver not in TEMPLATES[name]:
+        ver = DEFAULT_VERSION
+    tmpl = TEMPLATES[name][ver]
+    for key, limit in FIELD_LIMITS.items():
+        value = fields.get(key)
+        if isinstance(value, str) and len(value) > limit:
+            fields[key] = value[:limit]
+    messages = []
+    if tmpl["system"]:
+        messages.append({"role": "system", "content": tmpl["system"]})
+    messages.append({"role": "user", "content": tmpl["user"].format(**fields)})
+    return messages, ver
+
+
+# 사용량 기록
+
+class UsageStats:
+    """호출 종류별 누적 토큰 수 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def add(self, name, **counts):
+        with self._lock:
+            entry = self._data.setdefault(name, {"calls": 0})
+            entry["calls"] += 1
+            for key, value in counts.items():
+                entry[key] = entry.get(key, 0) + (value or 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._data.items()}
+
+
+usage = UsageStats()
+_log_lock = threading.Lock()
+
+
+def _log(record: dict):
+    if not PROMPT_USAGE_LOG:
+        cached = f", 캐시 {record['cached_tokens']}" if record["cached_tokens"] else ""
+        note = " (스트림, 출력은 추정)" if record.get("stream") else ""
+        note += " 취소됨" if record.get("cancelled") else ""
+        print(f"🧾 {record['name']} {record['version']}: 입력 {record['prompt_tokens']}"
+              f"(추정 {record['estimated_prompt_tokens']}{cached}) + 출력 {record['completion_tokens']}토큰, "
+              f"{record['latency_ms']:.0f} ms{note}")
+        return
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _log_lock, open(PROMPT_USAGE_LOG, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def _prepare(name, cfg, fields):
+    cfg = cfg or config.current()
+    messages, ver = build(name, **fields)
+    estimated = count_messages(messages)
+    if estimated > PROMPT_MAX_INPUT_TOKENS:
+        print(f"⚠️ {name} 프롬프트가 입력 예산을 넘습니다: 약 {estimated}토큰 > {PROMPT_MAX_INPUT_TOKENS}")
+    return cfg, messages, ver, estimated
+
+
+def _record(name, ver, estimated, t0, prompt_tokens=0, cached_tokens=0, completion_tokens=0,
+            finish_reason=None, **extra):
+    record = {
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "name": name,
+        "version": ver,
+        "estimated_prompt_tokens": estimated,
+        "prompt_tokens": prompt_tokens or 0,
+        "cached_tokens": cached_tokens or 0,
+        "completion_tokens": completion_tokens or 0,
+        "max_tokens": MAX_TOKENS[name],
+        "finish_reason": finish_reason,
+        "latency_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+        **extra,
+    }
+    usage.add(name, **{k: record[k] for k in ("estimated_prompt_tokens", "prompt_tokens",
+                                               "cached_tokens", "completion_tokens")})
+    try:
+        _log(record)
+    except Exception as e:
+        print("사용량 기록 에러:", e)
+
+
+class Truncated(RuntimeError):
+    """출력 상한을 올려도 응답이 잘림 (text = 잘린 응답)"""
+
+    def __init__(self, name, text):
+        super().__init__(f"{name} 응답이 출력 상한에서 잘림")
+        self.text = text
+
+
+def chat(name: str, cfg=None, **fields) -> str:
+    """템플릿 name으로 chat completion 1회 → 응답 문자열 (앞뒤 공백 제거). 잘리면 위 ON_LENGTH 규칙"""
+    cfg, messages, ver, estimated = _prepare(name, cfg, fields)
+    max_tokens = MAX_TOKENS[name]
+    retry = name in ON_LENGTH
+    while True:
+        t0 = time.perf_counter()
+        response = cfg.client().chat.completions.create(
+            model=cfg.deployment_name,
+            messages=messages,
+            temperature=TEMPLATES[name][ver]["temperature"],
+            max_tokens=max_tokens,
+        )
+
+        u = getattr(response, "usage", None)
+        details = getattr(u, "prompt_tokens_details", None)
+        finish_reason = response.choices[0].finish_reason
+        _record(name, ver, estimated, t0,
+                prompt_tokens=getattr(u, "prompt_tokens", None),
+                cached_tokens=getattr(details, "cached_tokens", None),
+                completion_tokens=getattr(u, "completion_tokens", None),
+                finish_reason=finish_reason, max_tokens=max_tokens)
+        text = (response.choices[0].message.content or "").strip()
+        if finish_reason != "length" or name not in ON_LENGTH:
+            return text
+        if retry:
+            retry = False
+            max_tokens = int(max_tokens * LENGTH_RETRY_FACTOR)
+            print(f"⚠️ {name} 응답이 잘려서 출력 상한 {max_tokens}토큰으로 다시 요청")
+            continue
+        if ON_LENGTH[name] == "raise":
+            raise Truncated(name, text)
+        return text + LENGTH_NOTICE
+
+
+def stream(name: str, cancel=None, cfg=None, **fields):
+    """
+    chat()의 스트리밍 버전: 응답 조각(str)을 오는 대로 yield.
+    cancel(threading.Event)이 켜지면 다음 조각에서 연결을 끊고 멈춘다 (남은 출력 토큰을 안 씀).
+    스트림 응답에는 usage가 없어서 토큰 수는 로컬 계산값으로 기록한다.
+    """
+    cfg, messages, ver, estimated = _prepare(name, cfg, fields)
+    t0 = time.perf_counter()
+    response = cfg.client().chat.completions.create(
+        model=cfg.deployment_name,
+        messages=messages,
+        temperature=TEMPLATES[name][ver]["temperature"],
+        max_tokens=MAX_TOKENS[name],
+        stream=True,
+    )
+    parts = []
+    finish_reason = None
+    cancelled = False
+    try:
+        for chunk in response:
+            if cancel is not None and cancel.is_set():
+                cancelled = True
+                break
+            if not chunk.choices:
+                continue  # Azure 콘텐츠 필터 결과만 담긴 조각
+            choice = chunk.choices[0]
+            finish_reason = choice.finish_reason or finish_reason
+            if choice.delta and choice.delta.content:
+                parts.append(choice.delta.content)
+                yield choice.delta.content
+        if finish_reason == "length" and not cancelled and ON_LENGTH.get(name) == "notice":
+            yield LENGTH_NOTICE
+    finally:
+        response.close()
+        _record(name, ver, estimated, t0, prompt_tokens=estimated,
+                completion_tokens=count_tokens("".join(parts)) if parts else 0,
+                finish_reason=finish_reason, stream=True, cancelled=cancelled)
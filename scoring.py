@@ -0,0 +1,110 @@
+"""
+OCR 글자 ↔ 후보 태그 이름 일괄 채점 (classify_pill 재조정 단계용).
+
+후보(태그 카탈로그 + 각인 별칭)가 많아지면 후보마다 _normalize + SequenceMatcher를 도는
+순수 Python 루프가 CPU를 많이 쓴다. 여기서는
+1) 정규화된 후보 이름을 한 번만 문자 빈도 히스토그램(문자 → 1..255 코드)으로 만들어 두고
+2) 문자 빈도 겹침으로 SequenceMatcher.ratio()의 상한(quick_ratio와 같은 값)을
+   모든 후보에 대해 NumPy 한 번에 계산한 뒤
+3) 상한이 높은 순서로 실제 ratio()를 계산하다가, 상한이 현재 최고점보다 낮아지면 멈춘다.
+상한은 실제 값보다 작을 수 없으므로 결과(최고 유사도, 동점이면 확률 높은 것, 그다음 앞 순서)는
+기존 루프와 완전히 같다. (bench/golden_scoring.py로 확인)
+"""
+import difflib
+import threading
+
+import numpy as np
+
+from textnorm import normalize as _normalize
+
+_MAX_CODE = 255
+
+
+class CandidateScorer:
+    """태그 이름을 처음 볼 때 인코딩해서 계속 재사용하는 채점기 (스레드 안전)"""
+
+    def __init__(self, names=()):
+        self._lock = threading.Lock()
+        self._vocab = {}            # 문자 -> 1..255 코드
+        self._index = {}            # 원래 이름 -> 행 번호
+        self._norms = []            # 행 번호 -> 정규화 이름
+        self._lengths = np.zeros(0, dtype=np.int64)
+        self._hist = np.zeros((0, _MAX_CODE + 1), dtype=np.uint16)
+        if names:
+            self.rows(names)
+
+    def _code(self, ch: str) -> int:
+        code = self._vocab.get(ch)
+        if code is None:
+            if len(self._vocab) < _MAX_CODE:
+                code = len(self._vocab) + 1
+            else:
+                # 코드가 모자라면 겹쳐 씀 — 빈도가 합쳐질 뿐이라 상한은 여전히 유효
+                code = ord(ch) % _MAX_CODE + 1
+            self._vocab[ch] = code
+        return code
+
+    def rows(self, names) -> np.ndarray:
+        """이름 목록 → 행 번호 배열. 처음 보는 이름은 인코딩해서 추가"""
+        with self._lock:
+            new = [n for n in dict.fromkeys(names) if n not in self._index]
+            if new:
+                self._add(new)
+            return np.fromiter((self._index[n] for n in names), dtype=np.int64, count=len(names))
+
+    def _add(self, names):
+        norms = [_normalize(n) for n in names]
+        codes = [[self._code(ch) for ch in n] for n in norms]
+        hist = np.zeros((len(norms), _MAX_CODE + 1), dtype=np.uint16)
+        np.add.at(hist, (np.repeat(np.arange(len(norms)), [len(c) for c in codes]),
+                         np.fromiter((c for row in codes for c in row), dtype=np.int64)), 1)
+
+        for n in names:
+            self._index[n] = len(self._index)
+        self._norms.extend(norms)
+        self._lengths = np.concatenate([self._lengths, [len(n) for n in norms]])
+        self._hist = np.vstack([self._hist, hist])
+
+    def upper_bounds(self, query_norm: str, rows: np.ndarray) -> np.ndarray:
+        """SequenceMatcher(None, query, 후보).ratio()의 상한 (= quick_ratio)"""
+        with self._lock:
+            q_hist = np.zeros(_MAX_CODE + 1, dtype=np.uint16)
+            for ch in query_norm:
+                code = self._vocab.get(ch)
+                if code is not None:
+                    q_hist[code] += 1
+            hist = self._hist[rows]
+            lengths = self._lengths[rows]
+
+        overlap = np.minimum(hist, q_hist).sum(axis=1, dtype=np.int64)
+        total = lengths + len(query_norm)
+        bounds = np.zeros(len(rows), dtype=np.float64)
+        np.divide(2.0 * overlap, total, out=bounds, where=total > 0)
+        return bounds
+
+    def best(self, query_norm: str, names, probs):
+        """
+        (최고 후보 위치, 유사도) 반환.
+        유사도 최대 → 동점이면 확률 큰 것 → 그래도 같으면 앞쪽 후보 (기존 classify_pill 루프와 동일)
+        """
+        if not names:
+            return None, -1.0
+        rows = self.rows(names)
+        bounds = self.upper_bounds(query_norm, rows)
+        probs = np.asarray(probs, dtype=np.float64)
+
+        best_i, best_sim, best_prob = None, -1.0, -np.inf
+        # 상한 높은 순 (같으면 확률 높은 순, 그다음 앞 순서)으로 실제 ratio 계산
+        order = np.lexsort((np.arange(len(names)), -probs, -bounds))
+        for i in order:
+            if bounds[i] < best_sim:
+                break
+            norm = self._norms[rows[i]]
+            sim = difflib.SequenceMatcher(None, query_norm, norm).ratio() if query_norm and norm else 0.0
+            if (sim > best_sim or (sim == best_sim and probs[i] > best_prob)
+                    or (sim == best_sim and probs[i] == best_prob and i < best_i)):
+                best_i, best_sim, best_prob = int(i), sim, probs[i]
+        return best_i, best_sim
+
+    def __len__(self):
+        return len(self._norms)
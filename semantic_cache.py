@@ -0,0 +1,233 @@
+"""
+복약 질문 의미 캐시 (answer_drug_question 용).
+
+"타이레놀이랑 같이 먹어도 되나요?" / "타이레놀과 같이 먹어도 돼요?" 처럼
+같은 약에 대해 거의 같은 질문이 오면 GPT를 다시 부르지 않고 저장된 답을 돌려준다.
+
+- 약 이름별로 질문 벡터를 따로 보관 (다른 약의 답이 섞이지 않게)
+- 숫자 + 단위("2알", "65세", "500mg", "두 알")는 꼭 같아야 하는 키(hard_keys)로 따로 비교한다.
+  용량·나이만 다른 질문은 글자로는 거의 같지만 답이 달라야 하므로 유사도와 상관없이 적중시키지 않음
+- embed_fn이 없으면 정확 일치 모드: 띄어쓰기·문장부호·대소문자만 무시하고 같은 질문만 적중.
+  azure_embed_fn()으로 Azure OpenAI 임베딩을 주면 threshold 이상 비슷한 다른 표현까지 잡는다.
+  임베딩은 질문당 한 번만 (lookup()이 돌려준 벡터를 put()에 넘김), 비교할 질문이 없으면 부르지 않고,
+  임베딩 호출이 실패하면 그 질문은 정확 일치로만 비교한다 (답변 자체는 막지 않음)
+- 코사인 유사도 NumPy 전수 비교 (항목 수가 커지면 ANN 인덱스로 교체 예정)
+- 전체 개수 상한 + LRU 제거, 약 이름별 무효화
+"""
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_PUNCT = re.compile(r"[^\w\s]")
+
+# 숫자 + 단위 ("2알", "65세", "1,000mg", "0.5 ml"). 단위 뒤에 붙은 조사("65세인데")는 떼어 냄
+_NUMBER = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*([a-z%㎎㎖µμ가-힣]*)")
+_UNITS = (
+    "mg", "mcg", "µg", "μg", "ml", "kg", "g", "l", "iu", "%", "㎎", "㎖",
+    "밀리그램", "밀리그람", "밀리리터", "그램", "알", "정", "캡슐", "포", "봉", "스푼", "잔", "방울",
+    "개월", "시간", "세", "살", "번", "회", "일", "주", "분", "시", "개",
+)
+_UNITS_BY_LENGTH = sorted(set(_UNITS), key=len, reverse=True)
+# 한글 수사 + 단위 ("두 알", "세 번", "열 살")
+_KOREAN_NUMBERS = {
+    "한": 1, "하나": 1, "두": 2, "둘": 2, "세": 3, "셋": 3, "네": 4, "넷": 4, "다섯": 5,
+    "여섯": 6, "일곱": 7, "여덟": 8, "아홉": 9, "열": 10, "반": 0.5,
+}
+_KOREAN_NUMBER = re.compile(
+    r"(?<![가-힣])(" + "|".join(sorted(_KOREAN_NUMBERS, key=len, reverse=True)) + r")\s*("
+    + "|".join(("알", "정", "캡슐", "포", "봉", "스푼", "잔", "방울", "번", "회", "살", "개", "시간")) + r")"
+)
+
+# put()의 vec 기본값: lookup()에서 벡터를 만들지 않았으니 put()이 직접 임베딩
+_EMBED = object()
+
+
+def _clean(question: str) -> str:
+    return " ".join(_PUNCT.sub(" ", question.lower()).split())
+
+
+def _unit(word: str) -> str:
+    for unit in _UNITS_BY_LENGTH:
+        if word.startswith(unit):
+            return unit
+    return ""
+
+
+def hard_keys(question: str) -> tuple:
+    """질문 속 숫자+단위 목록 (정렬). 하나라도 다르면 다른 질문으로 봄"""
+    text = question.lower()
+    keys = [f"{float(number.replace(',', '')):g}{_unit(word)}" for number, word in _NUMBER.findall(text)]
+    keys += [f"{_KOREAN_NUMBERS[word]:g}{unit}" for word, unit in _KOREAN_NUMBER.findall(text)]
+    return tuple(sorted(keys))
+
+
+def exact_key(question: str) -> str:
+    """정확 일치 모드의 비교 키 (띄어쓰기 / 문장부호 / 대소문자 무시)"""
+    return _clean(question).replace(" ", "")
+
+
+def azure_embed_fn(get_client, deployment: str):
+    """Azure OpenAI 임베딩 배포를 쓰는 embed_fn (의미가 같은 다른 표현까지 잡을 때)"""
+
+    def embed(question: str) -> np.ndarray:
+        resp = get_client().embeddings.create(model=deployment, input=_clean(question))
+        vec = np.asarray(resp.data[0].embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    return embed
+
+
+class _PillIndex:
+    """약 하나에 대한 질문 벡터 행렬 + 답변 목록 (정확 일치 모드면 벡터 없이 키만)"""
+
+    def __init__(self, dim):
+        self.ids = []
+        self.answers = []
+        self.texts = []      # exact_key
+        self.keys = []       # hard_keys
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+
+    def add(self, entry_id, text, keys, vec, answer):
+        self.ids.append(entry_id)
+        self.answers.append(answer)
+        self.texts.append(text)
+        self.keys.append(keys)
+        if vec is not None:
+            self.matrix = np.vstack([self.matrix, vec[None, :]])
+
+    def remove(self, entry_id):
+        i = self.ids.index(entry_id)
+        del self.ids[i]
+        del self.answers[i]
+        del self.texts[i]
+        del self.keys[i]
+        if len(self.matrix):
+            self.matrix = np.delete(self.matrix, i, axis=0)
+
+    def has_keys(self, keys):
+        return keys in self.keys
+
+    def best(self, text, keys, vec):
+        """숫자+단위가 같은 항목 중 정확히 같은 질문(점수 1.0) 또는 가장 비슷한 질문"""
+        same = [i for i, k in enumerate(self.keys) if k == keys]
+        if not same:
+            return None, -1.0
+        for i in same:
+            if self.texts[i] == text:
+                return i, 1.0
+        if vec is None:
+            return None, -1.0
+        scores = self.matrix[same] @ vec
+        j = int(np.argmax(scores))
+        return same[j], float(scores[j])
+
+
+class SemanticCache:
+    def __init__(self, max_entries: int = 2000, threshold: float = 0.92,
+                 dim: int = 1024, embed_fn=None):
+        # Azure 임베딩을 쓰면 dim은 배포 모델 차원과 맞춰야 함 (text-embedding-3-small: 1536)
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.dim = dim
+        self.embed_fn = embed_fn     # None이면 정확 일치 모드
+        self._pills = {}             # pill_name -> _PillIndex
+        self._lru = OrderedDict()    # entry_id -> pill_name (오래 안 쓴 순)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.embed_errors = 0
+
+    def _embed(self, question: str):
+        """embed_fn 벡터. 정확 일치 모드거나 임베딩 호출이 실패하면 None"""
+        if self.embed_fn is None:
+            return None
+        try:
+            return self.embed_fn(question)
+        except Exception as e:
+            self.embed_errors += 1
+            print(f"⚠️ 질문 임베딩 실패, 정확 일치로만 비교: {e}")
+            return None
+
+    def lookup(self, pill_name: str, question: str):
+        """
+        (저장된 답 또는 None, 질문 벡터). 빗나갔으면 벡터를 put(..., vec=)에 넘겨 임베딩을 다시 하지 않음.
+        정확히 같은 질문이 있거나 숫자+단위가 같은 저장 질문이 없으면 임베딩하지 않는다
+        """
+        text, keys = exact_key(question), hard_keys(question)
+        with self._lock:
+            index = self._pills.get(pill_name)
+            if index is None or not index.has_keys(keys):
+                self.misses += 1
+                return None, _EMBED
+            i, _ = index.best(text, keys, None)
+            if i is not None:
+                return self._hit(index, i), _EMBED
+        if self.embed_fn is None:
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        vec = self._embed(question)
+        with self._lock:
+            index = self._pills.get(pill_name)
+            if index is None:
+                self.misses += 1
+                return None, vec
+            i, score = index.best(text, keys, vec)
+            if i is None or score < self.threshold:
+                self.misses += 1
+                return None, vec
+            return self._hit(index, i), vec
+
+    def _hit(self, index, i):
+        self._lru.move_to_end(index.ids[i])
+        self.hits += 1
+        return index.answers[i]
+
+    def get(self, pill_name: str, question: str):
+        """숫자+단위가 같고 같은(또는 유사도 threshold 이상) 질문의 저장된 답, 없으면 None"""
+        return self.lookup(pill_name, question)[0]
+
+    def put(self, pill_name: str, question: str, answer: str, vec=_EMBED):
+        if vec is _EMBED:
+            vec = self._embed(question)
+        if self.embed_fn is not None and vec is None:
+            # 임베딩 실패: 행렬 줄 수를 맞추려고 0 벡터 (유사도로는 적중하지 않고 정확 일치로만)
+            vec = np.zeros(self.dim, dtype=np.float32)
+        with self._lock:
+            index = self._pills.get(pill_name)
+            if index is None:
+                index = self._pills[pill_name] = _PillIndex(self.dim)
+            entry_id = self._next_id
+            self._next_id += 1
+            index.add(entry_id, exact_key(question), hard_keys(question), vec, answer)
+            self._lru[entry_id] = pill_name
+
+            while len(self._lru) > self.max_entries:
+                old_id, old_pill = self._lru.popitem(last=False)
+                old_index = self._pills[old_pill]
+                old_index.remove(old_id)
+                if not old_index.ids:
+                    del self._pills[old_pill]
+
+    def invalidate(self, pill_name: str) -> int:
+        """약 하나의 저장된 답을 모두 삭제 (약 정보가 바뀌었을 때)"""
+        with self._lock:
+            index = self._pills.pop(pill_name, None)
+            if index is None:
+                return 0
+            for entry_id in index.ids:
+                self._lru.pop(entry_id, None)
+            return len(index.ids)
+
+    def clear(self):
+        with self._lock:
+            self._pills.clear()
+            self._lru.clear()
+
+    def __len__(self):
+        return len(self._lru)
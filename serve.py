@@ -0,0 +1,282 @@
+"""
+운영용 멀티 프로세스 실행기.
+
+Gradio 큐/세션은 한 프로세스 안에 있어야 하므로 포트는 프론트 프로세스 하나가 열고,
+CPU를 쓰는 분석 파이프라인(JPEG 인코딩, PIL 변환, difflib)은 N개의 워커 프로세스가 나눠 처리한다.
+워커마다 스레드 여러 개가 요청을 받아서 Azure 응답을 기다리는 동안에도 다른 요청을 처리한다.
+워커는 빈 스레드가 있을 때만 공유 큐에서 요청을 가져간다 (바쁜 워커가 요청을 쌓아 두지 않음).
+워커 수에 따른 처리량은 bench/serve_scaling.py로 확인.
+결과 캐시 / 설명 캐시는 SQLite(WAL) 파일 하나를 모든 프로세스가 공유해서
+한 워커가 만든 결과를 다른 워커도 그대로 쓴다.
+.env가 바뀌면 각 프로세스가 알아서 다시 읽고, 프론트 프로세스에 SIGHUP을 보내면 워커까지 즉시 다시 읽는다.
+
+예시:
+    python serve.py --workers 4 --port 7860
+    WORKERS=8 CACHE_PATH=/var/cache/pill.sqlite3 python serve.py
+"""
+import argparse
+import collections
+import itertools
+import multiprocessing as mp
+import os
+import signal
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+# 워커 프로세스 하나가 동시에 처리할 요청 수.
+# 파이프라인 대부분이 Azure 응답 대기라서 프로세스당 여러 요청을 겹쳐야 코어를 다 쓴다.
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "8"))
+# 워커 import / 워밍업을 기다리는 최대 시간, 요청 하나를 기다리는 최대 시간 (초)
+WORKER_START_TIMEOUT = float(os.getenv("WORKER_START_TIMEOUT", "180"))
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "90"))
+
+TIMEOUT_MESSAGE = "분석이 너무 오래 걸려 중단했습니다. 잠시 후 다시 시도해 주세요."
+WORKER_DIED_MESSAGE = "분석 중 서버 오류가 발생했습니다. 잠시 후 다시 시도해 주세요."
+
+
+class WorkerDied(RuntimeError):
+    """요청을 처리하던 워커 프로세스가 죽음"""
+
+
+def _init_worker():
+    # 워커는 newmain을 한 번만 import 하고 세션/클라이언트를 계속 재사용
+    import newmain  # noqa: F401
+
+    if os.getenv("WARMUP", "0") == "1":
+        import warmup
+
+        warmup.warm_up()
+
+
+def _worker_main(tasks, results, threads):
+    """워커 프로세스: tasks 큐에서 (id, 함수 이름, 인자)를 꺼내 newmain 함수를 실행"""
+    _init_worker()
+    import config
+    import newmain
+
+    config.install_signal_handler()
+    # 인코딩 버퍼를 스레드 수만큼 미리 잡아 둠 (요청 중에 새로 할당하지 않도록)
+    newmain.bufpool.pool.preallocate(threads)
+
+    pid = os.getpid()
+    results.put(("ready", pid, None))
+
+    # 빈 스레드가 있을 때만 큐에서 가져옴 → 바쁜 워커가 공유 큐를 자기 대기열로 빼 가지 않고
+    # 남은 요청은 한가한 워커가 가져감
+    free = threading.Semaphore(threads)
+
+    def run(task_id, fn_name, args, deadline):
+        try:
+            if deadline is not None and time.time() > deadline:
+                # 앞단이 이미 시간 초과로 포기한 요청은 실행하지 않음
+                results.put((task_id, False, "TimeoutError: 대기 중 시간 초과"))
+                return
+            results.put((task_id, True, getattr(newmain, fn_name)(*args)))
+        except Exception as e:
+            # 예외 객체가 pickle 안 될 수 있으므로 문자열로 전달
+            results.put((task_id, False, f"{type(e).__name__}: {e}"))
+        finally:
+            free.release()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while True:
+            free.acquire()
+            item = tasks.get()
+            if item is None:
+                break
+            # 어느 워커가 가져갔는지 알려 둠 (워커가 죽으면 그 요청만 실패 처리)
+            results.put(("started", item[0], pid))
+            pool.submit(run, *item)
+
+
+class ProcessPipeline:
+    """newmain 파이프라인 함수를 워커 프로세스 N개(프로세스당 스레드 WORKER_THREADS개)에서 실행"""
+
+    def __init__(self, workers: int, threads: int = WORKER_THREADS):
+        self.workers = workers
+        ctx = mp.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._futures = {}
+        self._owners = {}            # task_id -> 가져간 워커 pid
+        self._dead = set()           # 이미 정리한 죽은 워커 pid
+        self.started = collections.Counter()   # 워커 pid -> 가져간 요청 수 (bench/serve_scaling.py)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ready = threading.Semaphore(0)
+        self._procs = [
+            ctx.Process(target=_worker_main, args=(self._tasks, self._results, threads), daemon=True)
+            for _ in range(workers)
+        ]
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+
+    def start(self, timeout: float = WORKER_START_TIMEOUT):
+        """
+        워커를 모두 띄우고 import/워밍업이 끝날 때까지 기다림 (포트 열기 전에 호출).
+        timeout 안에 준비되지 않거나 도중에 죽은 워커가 있으면 모두 종료하고 RuntimeError
+        """
+        for p in self._procs:
+            p.start()
+        self._dispatcher.start()
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < len(self._procs):
+            if self._ready.acquire(timeout=0.5):
+                ready += 1
+                continue
+            dead = [p for p in self._procs if p.exitcode is not None]
+            if dead or time.monotonic() > deadline:
+                self._terminate()
+                if dead:
+                    raise RuntimeError(f"워커 시작 실패: pid {dead[0].pid} 종료 (exitcode {dead[0].exitcode})")
+                raise RuntimeError(f"워커 시작 시간 초과: {timeout:.0f}초 안에 {ready}/{len(self._procs)}개 준비")
+        return len(self._procs)
+
+    def _dispatch(self):
+        while True:
+            try:
+                task_id, ok, value = self._results.get(timeout=1.0)
+            except queue.Empty:
+                self._reap()
+                continue
+            if task_id == "ready":
+                self._ready.release()
+                continue
+            if task_id == "started":
+                with self._lock:
+                    self.started[value] += 1
+                    if ok in self._futures:
+                        self._owners[ok] = value
+                continue
+            if task_id is None:
+                break
+            with self._lock:
+                fut = self._futures.pop(task_id, None)
+                self._owners.pop(task_id, None)
+            if fut is None:
+                continue
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(RuntimeError(value))
+
+    def _reap(self):
+        """죽은 워커가 가져간 요청을 실패 처리 (남은 워커는 계속 큐에서 가져감)"""
+        dead = {p.pid for p in self._procs if p.pid is not None and p.exitcode is not None} - self._dead
+        if not dead:
+            return
+        self._dead |= dead
+        with self._lock:
+            if self.alive():
+                lost = [task_id for task_id, pid in self._owners.items() if pid in dead]
+            else:
+                # 남은 워커가 없으면 큐에서 기다리던 요청도 처리될 수 없음
+                lost = list(self._futures)
+            futures = [self._futures.pop(task_id, None) for task_id in lost]
+            for task_id in lost:
+                self._owners.pop(task_id, None)
+        for pid in dead:
+            print(f"❌ 분석 워커 종료: pid {pid}, 처리 중이던 요청 {len(lost)}건 실패 처리")
+        for fut in futures:
+            if fut is not None:
+                fut.set_exception(WorkerDied("분석 워커가 종료됨"))
+
+    def alive(self) -> int:
+        return sum(p.is_alive() for p in self._procs)
+
+    def submit(self, fn_name: str, *args, timeout: float = None) -> Future:
+        """timeout(초)을 주면 그 안에 워커가 가져가지 못한 요청은 워커에서 실행하지 않고 버림"""
+        fut = Future()
+        if not self.alive():
+            fut.set_exception(WorkerDied("살아 있는 분석 워커가 없음"))
+            return fut
+        task_id = next(self._ids)
+        with self._lock:
+            self._futures[task_id] = fut
+        deadline = time.time() + timeout if timeout else None
+        self._tasks.put((task_id, fn_name, args, deadline))
+        return fut
+
+    def _forget(self, fut):
+        with self._lock:
+            for task_id, f in list(self._futures.items()):
+                if f is fut:
+                    del self._futures[task_id]
+                    self._owners.pop(task_id, None)
+
+    def analyze(self, image, timeout: float = REQUEST_TIMEOUT):
+        # UI가 넘기는 건 파일 경로라서 워커에 경로 문자열만 보내고 디코딩은 워커가 함
+        if image is None:
+            return "이미지가 업로드되지 않았습니다.", ""
+        fut = self.submit("analyze_pill", image, timeout=timeout)
+        try:
+            return fut.result(timeout=timeout)
+        except FutureTimeout:
+            # 워커가 나중에 끝내도 결과는 버림 (_dispatch에서 fut를 못 찾음)
+            self._forget(fut)
+            print(f"⚠️ 분석 시간 초과 ({timeout:.0f}초)")
+            return TIMEOUT_MESSAGE, ""
+        except WorkerDied:
+            return WORKER_DIED_MESSAGE, ""
+
+    def reload_workers(self):
+        """워커 프로세스에 SIGHUP 전달 (설정 즉시 다시 읽기)"""
+        for p in self._procs:
+            if p.pid is not None and p.is_alive():
+                os.kill(p.pid, signal.SIGHUP)
+
+    def shutdown(self):
+        for _ in self._procs:
+            self._tasks.put(None)
+        for p in self._procs:
+            p.join(timeout=10)
+        self._results.put((None, None, None))
+
+    def _terminate(self):
+        for p in self._procs:
+            if p.is_alive():
+                p.terminate()
+        for p in self._procs:
+            p.join(timeout=5)
+        self._results.put((None, None, None))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="무물약 멀티 프로세스 서버")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "7860")))
+    args = parser.parse_args()
+
+    # 워커끼리 캐시를 공유하려면 프로세스 간 백엔드가 필요 (spawn된 워커도 이 값을 물려받음)
+    os.environ.setdefault("CACHE_BACKEND", "sqlite")
+
+    import config
+    import ingest
+    import newmain
+
+    pipeline = ProcessPipeline(args.workers)
+    started = pipeline.start()
+    config.install_signal_handler(pipeline.reload_workers)
+    print(f"워커 {started}개 준비 완료 (캐시: {os.environ['CACHE_BACKEND']})")
+
+    import ui
+
+    # 질문 답변은 네트워크 대기뿐이라 프론트 프로세스 스레드에서 처리
+    demo = ui.build_demo(pipeline.analyze, newmain.answer_drug_question)
+    # Gradio 기본 동시 실행 수(이벤트당 1)로는 워커를 다 못 쓰므로 워커 스레드 수만큼 열어 둠
+    # (동기 함수는 launch(max_threads) 스레드 풀에서 돌기 때문에 그쪽도 같이 늘림)
+    concurrency = args.workers * WORKER_THREADS
+    demo.queue(default_concurrency_limit=concurrency)
+    try:
+        demo.launch(server_name=args.host, server_port=args.port, max_threads=max(40, concurrency + 8),
+                    max_file_size=ingest.MAX_UPLOAD_BYTES, **ui.launch_kwargs())
+    finally:
+        pipeline.shutdown()
+
+
+if __name__ == "__main__":
+    main()
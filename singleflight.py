@@ -0,0 +1,67 @@
+"""
+같은 키의 동시 요청 합치기 (single-flight).
+
+같은 알약 사진을 여러 명이 동시에 올리거나 "결과 분석하기"를 두 번 누르면
+캐시가 채워지기 전이라 Custom Vision → OCR → GPT 호출이 요청 수만큼 나간다.
+SingleFlight.do(key, fn)은 같은 key로 이미 실행 중인 fn이 있으면 새로 실행하지 않고
+그 결과(예외면 같은 예외)를 기다렸다가 함께 돌려준다. 끝나면 키를 지우므로 캐시가 아니다.
+
+프로세스 안에서만 합친다 (serve.py 워커끼리는 SQLite 캐시가 채워진 뒤부터 공유).
+"""
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0   # 실제로 fn을 실행한 횟수
+        self.shared = 0     # 다른 요청의 결과를 받아 간 횟수
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def waiting(self, key) -> int:
+        """key로 실행 중인 fn의 결과를 기다리는 다른 요청 수 (실행 중이 아니면 0)"""
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call is not None else 0
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,129 @@
+"""
+설명 미리 만들기 (추측 실행).
+
+원래는 Custom Vision → OCR → 유사도 비교가 다 끝나야 GPT 설명을 시작한다.
+SPECULATIVE=1이면 Custom Vision top-1 확률이 SPECULATE_ABOVE 이상일 때
+OCR을 기다리지 않고 그 태그의 설명을 스트리밍으로 바로 만들기 시작한다.
+
+- OCR 보정 결과가 같은 태그면(hit) 미리 만든 설명을 그대로 씀 → OCR 시간만큼 빨라짐
+- 다른 태그로 바뀌면(miss) 스트림을 끊고(남은 출력 토큰은 안 씀) 바뀐 태그로 다시 만든다
+- 이미 설명 캐시에 있는 태그는 추측하지 않음
+- 분류가 실패(예외)하면 cancel()로 스트림을 끊음
+
+미리 만드는 설명은 OCR 글자 없이 만든다. 설명 캐시가 원래 약 이름만 키로 쓰는 것과 같은 기준.
+통계는 stats (started / hit / miss / 겹친 시간).
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SPECULATIVE = os.getenv("SPECULATIVE", "0") == "1"
+SPECULATE_ABOVE = float(os.getenv("SPECULATE_ABOVE", "80"))
+SPECULATIVE_WORKERS = int(os.getenv("SPECULATIVE_WORKERS", "8"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS,
+                                           thread_name_prefix="speculative")
+    return _pool
+
+
+class SpecStats:
+    """추측 실행 적중 / 실패 횟수 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.failed = 0          # 추측 쪽 GPT 호출 에러 → 원래 경로로 다시 만듦
+        self.overlap_s = 0.0     # hit일 때 분류(OCR)와 실제로 겹친 시간 합 (추측 시작 ~ 분류 끝 / 설명 끝 중 빠른 쪽)
+
+    def add(self, **counts):
+        with self._lock:
+            for key, value in counts.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            decided = self.hits + self.misses
+            return {
+                "started": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "failed": self.failed,
+                "hit_rate": round(self.hits / decided, 3) if decided else 0.0,
+                "overlap_s": round(self.overlap_s, 2),
+            }
+
+
+stats = SpecStats()
+
+
+class Speculation:
+    """
+    요청 하나의 추측 실행.
+    explain_fn(tag, prob, cancel, on_delta) -> 설명 문자열 (cancel이 켜져서 멈췄으면 None)
+    """
+
+    def __init__(self, explain_fn, cached_fn=None):
+        self.explain_fn = explain_fn
+        self.cached_fn = cached_fn   # tag -> 캐시된 설명 or None
+        self.tag = None
+        self.parts = []              # 지금까지 받은 조각 (UI에서 미리 보여 줄 때)
+        self._cancel = threading.Event()
+        self._future = None
+        self._started_at = 0.0
+        self._finished_at = None
+
+    def start(self, tag: str, prob: float):
+        """Custom Vision top-1이 나왔을 때 호출 (OCR 전에)"""
+        if self._future is not None or prob < SPECULATE_ABOVE:
+            return
+        if self.cached_fn is not None and self.cached_fn(tag) is not None:
+            return
+        self.tag = tag
+        self._started_at = time.perf_counter()
+        self._future = _get_pool().submit(self._run, tag, prob)
+        stats.add(started=1)
+
+    def _run(self, tag, prob):
+        try:
+            return self.explain_fn(tag, prob, self._cancel, self.parts.append)
+        finally:
+            self._finished_at = time.perf_counter()
+
+    def cancel(self):
+        """최종 태그를 정하지 못하고 끝날 때 (분류 에러 등) 스트림을 끊음"""
+        if self._future is not None:
+            self._cancel.set()
+
+    def resolve(self, final_tag: str):
+        """최종 태그가 정해진 뒤 호출. 같으면 미리 만든 설명, 아니면 취소하고 None"""
+        if self._future is None:
+            return None
+        if final_tag != self.tag:
+            self._cancel.set()
+            stats.add(misses=1)
+            return None
+
+        now = time.perf_counter()
+        overlap = min(now, self._finished_at or now) - self._started_at
+        try:
+            detail = self._future.result()
+        except Exception as e:
+            print("설명 미리 만들기 에러:", e)
+            stats.add(failed=1)
+            return None
+        if detail is None:
+            return None
+        stats.add(hits=1, overlap_s=overlap)
+        return detail
@@ -0,0 +1,14 @@
+"""
+OCR 글자 / 태그 이름 / 각인 / 의약품 DB 검색 키를 비교하기 전에 쓰는 문자열 정규화.
+
+newmain(유사도 비교), scoring(일괄 채점), imprint_alias(각인 인덱스), drug_db(검색 키)가
+모두 이 함수 하나를 쓴다. 모듈마다 복사해 두면 규칙이 조금만 달라져도 매칭이 조용히 깨지므로
+규칙을 바꿀 때는 여기만 고치고 인덱스(imprint_alias.json / drug_db.sqlite3)를 다시 만든다.
+"""
+
+
+def normalize(text: str) -> str:
+    """알파벳/숫자(한글 포함)만 남기고 대문자로 통일"""
+    if not text:
+        return ""
+    return "".join(ch for ch in text.upper() if ch.isalnum())
@@ -0,0 +1,180 @@
+"""
+Custom Vision 재학습 → 평가 → 게시 → 서비스 반복 교체 자동화.
+
+1) 라벨 폴더를 읽어 새로 생겼거나 바뀐 이미지만 업로드 (upload.py 증분 업로드, upload_state.json)
+   - 이미지 이름 해시로 정한 홀드아웃(기본 10%)은 업로드하지 않고 평가용으로 남겨 둠
+     (labelrules.is_holdout, python upload.py도 같은 분할 / 같은 upload_state.json을 씀)
+   - 이미 학습용으로 올라가 있던 이미지가 홀드아웃 쪽이면(비율 변경 등) 프로젝트에서 삭제
+2) train_project로 학습 시작, Completed / Failed가 될 때까지 상태 폴링
+3) 새 반복을 후보 이름으로 게시하고 홀드아웃 top-1 정확도를 현재 서비스 반복과 비교
+4) 현재보다 TOLERANCE 이상 나빠지지 않았으면 serving_iteration.json을 원자적으로 교체
+   → 실행 중인 newmain 서버가 재시작 없이 다음 요청부터 새 반복으로 예측 (newmain.current_iteration)
+   나빠졌으면 후보 게시를 취소하고 기존 반복 유지
+
+환경 변수:
+    PREDICTION_URL, PREDICTION_KEY   평가용 예측 엔드포인트 (newmain과 같은 값)
+    PREDICTION_RESOURCE_ID           게시할 Prediction 리소스 id (/subscriptions/.../accounts/...)
+    SERVING_ITERATION_PATH           서비스 반복 포인터 파일 (기본 serving_iteration.json)
+
+예시:
+    python train.py                         (업로드 + 학습 + 평가 + 교체)
+    python train.py --holdout 0.2 --tolerance 0.01
+    python train.py --promote Iteration3    (평가 없이 포인터만 바꿈, 롤백용)
+"""
+import argparse
+import functools
+import json
+import os
+import time
+
+import bufpool
+import image_profile
+import ingest
+import newmain
+import upload
+from export_labels import iter_labels
+from labelrules import HOLDOUT_RATIO, is_holdout, label_image_name, scan_images
+
+PREDICTION_RESOURCE_ID = os.getenv("PREDICTION_RESOURCE_ID")
+POLL_INTERVAL = float(os.getenv("TRAIN_POLL_INTERVAL", "30"))
+
+
+def holdout_set(json_root, image_map, ratio=HOLDOUT_RATIO):
+    """[(이미지 경로, 정답 태그)] 홀드아웃 목록"""
+    cases = []
+    for _, data in iter_labels(json_root):
+        if not data.get('images') or not data.get('annotations'):
+            continue
+        img_info = data['images'][0]
+        img_name = label_image_name(img_info)
+        path = image_map.get(img_name)
+        if path and img_info.get('dl_name') and is_holdout(img_name, ratio):
+            cases.append((path, img_info['dl_name'].strip()))
+    return cases
+
+
+def wait_for_training(trainer, iteration_id, timeout):
+    deadline = time.time() + timeout
+    while True:
+        iteration = trainer.get_iteration(upload.PROJECT_ID, iteration_id)
+        print(f"학습 상태: {iteration.status}")
+        if iteration.status in ("Completed", "Failed"):
+            return iteration
+        if time.time() > deadline:
+            raise TimeoutError(f"{timeout:.0f}초 안에 학습이 끝나지 않음 ({iteration.status})")
+        time.sleep(POLL_INTERVAL)
+
+
+def serving_bytes(path):
+    """서비스와 같은 입력: ingest로 읽고(검사 / 회전 / 축소) detect 프로필로 인코딩한 바이트"""
+    image = ingest.open_upload(path)
+    try:
+        return image_profile.encode(image, "detect")
+    finally:
+        bufpool.close_image(image)
+
+
+def evaluate(iteration_name, cases):
+    """
+    홀드아웃 top-1 정확도 (Custom Vision 예측만, OCR 보정 없이).
+    서비스에서 거절될 이미지(용량 / 형식)는 두 반복 모두 같은 목록에서 빠지도록 분모에서 뺌
+    """
+    if not cases:
+        return None
+    url = newmain.prediction_url(iteration_name)
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "Prediction-Key": newmain.PREDICTION_KEY,
+    }
+    correct = 0
+    rejected = 0
+    for path, expected in cases:
+        try:
+            img_bytes = serving_bytes(path)
+        except ingest.IngestError as e:
+            print(f"⚠️ {os.path.basename(path)} 서비스 입력 검사에서 거절됨: {e}")
+            rejected += 1
+            continue
+        try:
+            resp = newmain.get_session().post(url, headers=headers, data=img_bytes, timeout=30)
+            resp.raise_for_status()
+            preds = resp.json().get("predictions", [])
+        except Exception as e:
+            print(f"❌ {os.path.basename(path)} 예측 에러: {e}")
+            continue
+        if preds and max(preds, key=lambda x: x["probability"])["tagName"].strip() == expected:
+            correct += 1
+    if rejected == len(cases):
+        return None
+    return correct / (len(cases) - rejected)
+
+
+def promote(iteration_name, **info):
+    """serving_iteration.json 원자적 교체 (읽는 쪽은 항상 완전한 파일만 봄)"""
+    path = newmain.SERVING_ITERATION_PATH
+    data = {"iteration": iteration_name, "promoted": time.strftime("%Y-%m-%dT%H:%M:%S"), **info}
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    print(f"✅ 서비스 반복 교체: {iteration_name} ({path})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custom Vision 재학습 + 평가 + 서비스 반복 교체")
+    parser.add_argument("--holdout", type=float, default=HOLDOUT_RATIO, help="평가용으로 남길 비율")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="현재 반복보다 이만큼까지 정확도가 낮아도 교체")
+    parser.add_argument("--timeout", type=float, default=3 * 3600, help="학습 대기 최대 초")
+    parser.add_argument("--force", action="store_true", help="새로 올린 이미지가 없어도 학습")
+    parser.add_argument("--promote", metavar="NAME", help="평가 없이 게시된 반복 NAME으로 포인터만 교체")
+    args = parser.parse_args()
+
+    if args.promote:
+        promote(args.promote, manual=True)
+        return
+
+    json_root, image_root = upload.find_roots()
+    image_map = scan_images(image_root)
+    print(f"검색된 이미지 파일 수: {len(image_map)}개")
+    trainer, get_tag_id = upload.connect()
+
+    state = upload.load_state()
+    try:
+        uploaded = upload.upload_labels(trainer, get_tag_id, json_root, image_map, state=state,
+                                        skip=functools.partial(is_holdout, ratio=args.holdout))
+    finally:
+        upload.save_state(state)
+    print(f"새로 올린 이미지 {uploaded}개")
+    if not uploaded and not args.force:
+        print("바뀐 이미지가 없어 학습하지 않음 (--force로 강제)")
+        return
+
+    iteration = trainer.train_project(upload.PROJECT_ID)
+    print(f"🔥 학습 시작: {iteration.name} ({iteration.id})")
+    iteration = wait_for_training(trainer, iteration.id, args.timeout)
+    if iteration.status != "Completed":
+        raise SystemExit(f"❌ 학습 실패: {iteration.name}")
+
+    if not PREDICTION_RESOURCE_ID:
+        raise SystemExit("❌ PREDICTION_RESOURCE_ID가 없어 게시할 수 없음")
+    candidate = iteration.name.replace(" ", "")
+    trainer.publish_iteration(upload.PROJECT_ID, iteration.id, candidate, PREDICTION_RESOURCE_ID)
+    print(f"후보 게시: {candidate}")
+
+    cases = holdout_set(json_root, image_map, args.holdout)
+    current = newmain.current_iteration()
+    new_acc = evaluate(candidate, cases)
+    old_acc = evaluate(current, cases) if current and current != candidate else None
+    print(f"홀드아웃 {len(cases)}장 정확도 — 현재 {current}: {old_acc}, 후보 {candidate}: {new_acc}")
+
+    if new_acc is None or (old_acc is not None and new_acc < old_acc - args.tolerance):
+        trainer.unpublish_iteration(upload.PROJECT_ID, iteration.id)
+        raise SystemExit(f"❌ 후보가 현재 반복보다 나빠서 교체하지 않음 ({candidate} 게시 취소)")
+
+    promote(candidate, iteration_id=iteration.id, accuracy=new_acc,
+            previous=current, previous_accuracy=old_acc, holdout=len(cases))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+Gradio 화면 구성 (CSS + Blocks).
+
+gradio import와 Blocks 생성 비용이 크기 때문에 newmain.py import 시점이 아니라
+build_demo()를 호출할 때만 불러온다.
+"""
+import gradio as gr
+
+import ingest
+
+
+# Gradio UI CSS 
+
+custom_css = """
+
+body, .gradio-container {
+    background-color: #ffffff !important;
+    font-family: -apple-system, BlinkMacSystemFont, "Apple SD Gothic Neo", system-ui, sans-serif;
+}
+
+.gradio-container .gr-block,
+.gradio-container .gr-panel,
+.gradio-container .gr-group,
+.gradio-container .gr-box,
+.gradio-container .gr-form,
+.gradio-container .styler,
+.gradio-container .wrap,
+.gradio-container .contain {
+    background-color: transparent !important;
+    background: transparent !important;
+    border: none !important;
+    box-shadow: none !important;
+    min-height: 0 !important;
+}
+
+.pill-phone-card {
+    max-width: 800px;
+    margin: 20px auto;
+    background: #ffffff;
+    border-radius: 32px;
+    box-shadow: 0 10px 40px rgba(0,0,0,0.06);
+    padding: 30px;
+    border: 1px solid #f0f0f0;
+}
+
+.mint-point {
+    color: #4FD1C5 !important; /* 민트색 */
+}
+
+.pill-landing-title, .pill-header-title {
+    font-size: 32px;
+    font-weight: 800;
+    text-align: center;
+    color: #38B2AC; /* 다크 민트 */
+    margin-bottom: 8px;
+}
+
+.pill-landing-sub, .pill-header-sub {
+    text-align: center;
+    font-size: 14px;
+    color: #718096;
+    margin-bottom: 24px;
+}
+
+.pill-landing-highlight {
+    color: #319795;
+    font-weight: 700;
+}
+
+.pill-landing-box {
+    margin-top: 10px;
+    padding: 20px;
+    border-radius: 20px;
+    background: #F0FFF4; 
+    border: 1px dashed #B2F5EA;
+    font-size: 13px;
+    color: #2D3748;
+}
+
+
+/* 랜딩 화면의 시작하기 버튼만 전체 폭 */
+.pill-landing-start-btn {
+    margin-top: 20px;
+    width: 100%;
+    background: linear-gradient(135deg, #4FD1C5, #38B2AC) !important;
+    color: #ffffff !important;
+    font-weight: 800 !important;
+    border-radius: 16px !important;
+    height: 50px;
+    border: none !important;
+}
+
+/* 도구 화면의 메인 버튼 (폭은 flex로 맞춤) */
+.pill-btn-main {
+    background: linear-gradient(135deg, #4FD1C5, #38B2AC) !important;
+    color: #ffffff !important;
+    font-weight: 800 !important;
+    border-radius: 16px !important;
+    border: none !important;
+}
+.pill-guide-list span.num {
+    display: inline-block;
+    width: 20px;
+    height: 20px;
+    border-radius: 50%;
+    background: #4FD1C5;
+    color: #fff;
+    text-align: center;
+    font-size: 12px;
+    line-height: 20px;
+    margin-right: 8px;
+}
+
+.pill-image-wrapper .gradio-image {
+    border-radius: 24px;
+    overflow: hidden;
+    border: 2px solid #E6FFFA;
+}
+.pill-result-box {
+    margin-top: 16px;
+    padding: 16px;
+    border-radius: 20px;
+    background: #ffffff;
+    border: 1px solid #E6FFFA;
+}
+
+.pill-result-title {
+    font-size: 14px;
+    font-weight: 700;
+    color: #2C7A7B;
+    margin-bottom: 8px;
+}
+
+.pill-btn-sub {
+    background: #E6FFFA !important;
+    color: #2C7A7B !important;
+    border-radius: 16px !important;
+    border: none !important;
+}
+
+.pill-footer-note, .pill-landing-footer {
+    margin-top: 24px;
+    font-size: 12px;
+    color: #A0AEC0;
+    text-align: center;
+}
+
+.btn-main, .btn-secondary, .pill-btn-main, .pill-btn-sub {
+    height: 54px !important; 
+    min-height: 54px !important; 
+    max-height: 54px !important;
+    line-height: 54px !important; 
+    padding: 0 20px !important;
+    display: flex !important;
+    align-items: center !important;
+    justify-content: center !important;
+}
+"""
+
+
+# 업로드 전에 브라우저에서 사진 줄이기
+# 휴대폰 원본(수 MB)을 그대로 올리지 않고 긴 변 CLIENT_MAX_EDGE, JPEG 품질 CLIENT_JPEG_QUALITY로
+# 다시 만들어서 #pill-image의 파일 입력에 넣는다 (파일 선택 / 끌어다 놓기 둘 다).
+# 캔버스로 다시 그리면 EXIF 회전이 적용된 채 EXIF 없이 저장되므로 서버는 디코딩 없이 그대로 쓸 수 있다
+# (ingest.open_upload). 줄여도 더 커지거나 브라우저가 못 읽는 형식이면 원본을 그대로 보낸다.
+
+COMPRESS_JS = """
+<script>
+(() => {
+  const MAX_EDGE = %(max_edge)d, QUALITY = %(quality).2f, TARGET = "#pill-image";
+
+  async function compress(file) {
+    if (!file || !file.type.startsWith("image/")) return file;
+    const bmp = await createImageBitmap(file, { imageOrientation: "from-image" });
+    const scale = Math.min(1, MAX_EDGE / Math.max(bmp.width, bmp.height));
+    const canvas = document.createElement("canvas");
+    canvas.width = Math.round(bmp.width * scale);
+    canvas.height = Math.round(bmp.height * scale);
+    canvas.getContext("2d").drawImage(bmp, 0, 0, canvas.width, canvas.height);
+    bmp.close();
+    const blob = await new Promise((resolve) => canvas.toBlob(resolve, "image/jpeg", QUALITY));
+    if (!blob || (scale === 1 && file.type === "image/jpeg" && blob.size >= file.size)) return file;
+    return new File([blob], file.name.replace(/\\.[^.]+$/, "") + ".jpg", { type: "image/jpeg" });
+  }
+
+  async function replaceFile(input, file) {
+    let out = file;
+    try {
+      out = await compress(file);
+    } catch (err) {
+      console.warn("이미지 압축 실패, 원본 업로드", err);
+    }
+    const dt = new DataTransfer();
+    dt.items.add(out);
+    input.files = dt.files;
+    input.dataset.pillCompressed = "1";
+    input.dispatchEvent(new Event("change", { bubbles: true }));
+    delete input.dataset.pillCompressed;
+  }
+
+  // 파일 선택: Gradio보다 먼저(capture) 가로채서 줄인 파일로 바꾼 뒤 change를 다시 보냄
+  document.addEventListener("change", (e) => {
+    const input = e.target;
+    if (!(input instanceof HTMLInputElement) || input.type !== "file") return;
+    if (input.dataset.pillCompressed || !input.closest(TARGET)) return;
+    const file = input.files && input.files[0];
+    if (!file || !file.type.startsWith("image/")) return;
+    e.stopImmediatePropagation();
+    replaceFile(input, file);
+  }, true);
+
+  // 끌어다 놓기: 같은 방식으로 파일 입력을 거쳐 올림
+  document.addEventListener("drop", (e) => {
+    const zone = e.target instanceof Element && e.target.closest(TARGET);
+    const file = e.dataTransfer && e.dataTransfer.files[0];
+    const input = zone && zone.querySelector("input[type=file]");
+    if (!input || !file || !file.type.startsWith("image/")) return;
+    e.preventDefault();
+    e.stopImmediatePropagation();
+    replaceFile(input, file);
+  }, true);
+})();
+</script>
+"""
+
+
+def compress_script(max_edge: int = ingest.CLIENT_MAX_EDGE, quality: float = ingest.CLIENT_JPEG_QUALITY) -> str:
+    """launch(head=...)에 넣을 스크립트. max_edge가 0이면 브라우저 압축을 끔"""
+    if not max_edge:
+        return ""
+    return COMPRESS_JS % {"max_edge": max_edge, "quality": quality}
+
+
+def launch_kwargs() -> dict:
+    """
+    demo.launch() / gr.mount_gradio_app()에 같이 넘길 css / head.
+    Gradio 6부터 gr.Blocks(css=, head=)는 무시되고 launch 쪽 인자만 반영된다.
+    """
+    return {"css": custom_css, "head": compress_script()}
+
+
+# 화면 전환용 함수
+
+def go_tool():
+    return gr.update(visible=False), gr.update(visible=True)
+
+
+# Gradio Blocks
+
+def build_demo(analyze_fn, answer_fn):
+    """분석/질문 함수를 받아 gr.Blocks 데모를 만들어 반환"""
+    # css / head는 launch_kwargs()로 실행할 때 넘김
+    with gr.Blocks(title="AI 복약 가이드") as demo:
+
+        with gr.Column(elem_classes=["pill-phone-card"]) as main_card:
+
+            # 랜딩 화면
+            with gr.Column(visible=True) as landing_group:
+                gr.Markdown("""
+<div class="pill-landing-title">무엇이든 물어보세요 약사님</div>
+<div class="pill-landing-sub">
+사진 한 장으로 <span class="pill-landing-highlight">어떤 약인지, 어떻게 먹어야 하는지</span><br>
+빠르게 확인할 수 있는 Azure 기반 데모 서비스입니다.
+</div>
+
+<div class="pill-landing-box">
+  <div class="pill-landing-step">① 알약 앞·뒷면을 또렷하게 촬영해 주세요.</div>
+  <div class="pill-landing-step">② 사진을 업로드하면 알약을 인식하고 이름을 예측합니다.</div>
+  <div class="pill-landing-step">③ Azure OpenAI가 효능, 복용법, 주의사항을 쉽게 설명해 줍니다.</div>
+</div>
+""")
+
+                start_btn = gr.Button("시작하기", elem_classes=["pill-landing-start-btn"])
+
+                gr.Markdown("""
+<div class="pill-landing-footer">
+※ 본 서비스는 교육용 데모이며, 실제 복약 전에는 반드시 의료진·약사와 상담해 주세요.<br>
+숙명여대 Azure Winter School Team 5
+</div>
+""")
+
+            # 실제 도구 화면 
+            with gr.Column(visible=False) as tool_group:
+
+                gr.Markdown("""
+<div class="pill-header-title">AI 복약 가이드</div>
+<div class="pill-header-sub">
+알약 사진을 업로드하면 어떤 약인지 분류하고,<br>
+복용 방법과 주의사항을 안내해 드립니다.
+</div>
+""")
+
+                gr.Markdown("""
+<div class="pill-guide-title" style="font-weight:700; font-size:15px; margin-bottom:10px;">📸 알약 촬영 가이드</div>
+<div class="pill-guide-list">
+<div style="margin-bottom:5px;"><span class="num">1</span> 알약이 <b>화면 중앙</b>에 오도록 촬영</div>
+<div style="margin-bottom:5px;"><span class="num">2</span> <b>밝은 조명</b> 아래에서 찍어 주세요</div>
+<div style="margin-bottom:15px;"><span class="num">3</span> <b>깔끔한 배경</b>일수록 인식률이 높아집니다</div>
+<div style="margin-bottom:15px;"> ※ 본 서비스는 최대 6MB 이하의 이미지만 업로드할 수 있습니다.<br>
+※ 업로드된 이미지는 분석 목적에만 일시적으로 사용되며, 어떠한 개인 정보도 저장되지 않고 즉시 폐기됩니다.</div>
+</div>
+""")
+
+                with gr.Column(elem_classes=["pill-image-wrapper"]):
+                    # 파일 경로만 받고 디코딩은 ingest.py에서 (크기/포맷 검사 후 축소 디코딩)
+                    # 브라우저에서 먼저 줄여서 올림 (compress_script, elem_id로 찾음)
+                    image_in = gr.Image(
+                        type="filepath",
+                        image_mode=None,
+                        elem_id="pill-image",
+                        label="",
+                        height=280,
+                        width=280,
+                        show_label=False,
+                    )
+
+                with gr.Row(elem_classes=["pill-btn-row"], equal_height=True):
+                    clear_btn = gr.Button("다시 선택", elem_classes=["pill-btn-sub"])
+                    submit_btn = gr.Button("결과 분석하기", elem_classes=["pill-btn-main"])
+
+                with gr.Column(elem_classes=["pill-result-box"]):
+                    gr.Markdown('<div class="pill-result-title">🔍 인식된 약품 정보</div>')
+                    pill_header = gr.Textbox(
+                        placeholder="이미지를 업로드한 뒤 [결과 분석하기] 버튼을 눌러 주세요.",
+                        interactive=False,
+                        lines=1,
+                        show_label=False,
+                    )
+
+                with gr.Column(elem_classes=["pill-result-box"]):
+                    gr.Markdown('<div class="pill-result-title">💊 상세 복약 가이드</div>')
+                    pill_detail = gr.Textbox(
+                        placeholder="약의 효능, 복용 방법, 주의사항이 이곳에 표시됩니다.",
+                        interactive=False,
+                        lines=10,
+                        show_label=False,
+                    )
+
+                with gr.Column(elem_classes=["pill-result-box"]):
+                    gr.Markdown('<div class="pill-result-title">🧠 복약 궁금증 질문하기</div>')
+
+                    user_question = gr.Textbox(
+                        placeholder="예: 이 약이랑 타이레놀 같이 먹어도 되나요?",
+                        lines=2,
+                        show_label=False,
+                    )
+
+                    ask_btn = gr.Button("질문하기", elem_classes=["pill-btn-main"])
+
+                    answer_box = gr.Textbox(
+                        placeholder="질문에 대한 답변이 여기에 표시됩니다.",
+                        lines=6,
+                        interactive=False,
+                        show_label=False,
+                    )
+
+                
+
+                gr.Markdown("""
+<div class="pill-footer-note">
+※ 본 서비스는 교육용 데모이며, 실제 복약 전에는 반드시 의료진·약사와 상담해 주세요.<br>
+ 숙명여대 Azure Winter School Team 5
+</div>
+""")
+
+        #버튼 동작 
+        start_btn.click(
+            fn=lambda: (gr.update(visible=False), gr.update(visible=True)),
+            inputs=None,
+            outputs=[landing_group, tool_group],
+        )
+
+        submit_btn.click(
+            fn=analyze_fn,
+            inputs=image_in,
+            outputs=[pill_header, pill_detail],
+        )
+
+        clear_btn.click(
+            fn=lambda: (None, "", ""),
+            inputs=None,
+            outputs=[image_in, pill_header, pill_detail],
+        )
+        ask_btn.click(
+            fn=lambda q, header: answer_fn(
+                pill_name=header.split(" (")[0].replace("예측된 약 이름: ", ""),
+                ocr_text="",
+                user_question=q
+                ),
+                inputs=[user_question, pill_header],
+                outputs=answer_box,
+        )
+
+    return demo
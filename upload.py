@@ -1,112 +1,335 @@
 import os
 import json
 import time
+import hashlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from azure.cognitiveservices.vision.customvision.training import CustomVisionTrainingClient
 from azure.cognitiveservices.vision.customvision.training.models import Region, ImageFileCreateEntry, ImageFileCreateBatch
 from msrest.authentication import ApiKeyCredentials
 
+from imprint_alias import AliasBuilder
+from labelrules import image_size, is_holdout, label_image_name, region_ratios, scan_images
+
 # 1. Azure 리소스 설정
 ENDPOINT = "https://pillclassfication.cognitiveservices.azure.com/"
 TRAINING_KEY = "6T2q6i53g7IKD6yHYCk7U6uaJT0shorb4Ki55WIOrm6QPDYhIkZvJQQJ99BLACL93NaXJ3w3AAAJACOGE6xn"
 PROJECT_ID = "aafa7eeb-a9f7-43ef-8d15-c6af7792f641"
 
-# 2. 경로 설정 및 폴더 자동 탐색
-current_dir = os.getcwd()
-all_folders = [f for f in os.listdir(current_dir) if os.path.isdir(f)]
-JSON_ROOT = next((f for f in all_folders if '라벨링' in f), "라벨링데이터")
-IMAGE_ROOT = next((f for f in all_folders if '원천' in f), "원천데이터")
+# 증분 업로드 기록: 이미지 이름 → {"hash": 내용+박스 해시, "image_id": Custom Vision 이미지 id}
+UPLOAD_STATE_PATH = "upload_state.json"
 
-print(f"📂 현재 위치: {current_dir}")
-print(f"✅ 인식된 라벨링 폴더: {JSON_ROOT}")
-print(f"✅ 인식된 원천 폴더: {IMAGE_ROOT}")
+# 라벨 JSON 파싱 / 검사 / 박스 비율 변환 / 이미지 읽기를 나눠 맡는 프로세스 수 (0이면 이 프로세스에서 직접)
+# 워커는 JSON 파일 PREP_CHUNK개씩 묶어서 처리하고, 업로드하는 쪽은 끝난 묶음부터 받아서 보낸다.
+# UPLOAD_PREP_ORDERED=0이면 끝난 순서대로 받음 (폴더 순서는 달라지지만 느린 파일 하나에 막히지 않음)
+PREP_WORKERS = int(os.getenv('UPLOAD_PREP_WORKERS', str(os.cpu_count() or 1)))
+PREP_CHUNK = int(os.getenv('UPLOAD_PREP_CHUNK', '16'))
+PREP_ORDERED = os.getenv('UPLOAD_PREP_ORDERED', '1') == '1'
 
-# 모든 이미지 파일 미리 스캔 (확장자 소문자 대응)
-image_map = {}
-for root, dirs, files in os.walk(IMAGE_ROOT):
-    for f in files:
-        if f.lower().endswith(('.png', '.jpg', '.jpeg')):
-            image_map[f.lower()] = os.path.join(root, f)
 
-print(f"검색된 이미지 파일 수: {len(image_map)}개")
+# 2. 경로 설정 및 폴더 자동 탐색
+def find_roots():
+    current_dir = os.getcwd()
+    all_folders = [f for f in os.listdir(current_dir) if os.path.isdir(f)]
+    json_root = next((f for f in all_folders if '라벨링' in f), "라벨링데이터")
+    image_root = next((f for f in all_folders if '원천' in f), "원천데이터")
+
+    print(f"📂 현재 위치: {current_dir}")
+    print(f"✅ 인식된 라벨링 폴더: {json_root}")
+    print(f"✅ 인식된 원천 폴더: {image_root}")
+    return json_root, image_root
+
 
 # 3. Azure 클라이언트 연결 및 태그 정보 동기화
-credentials = ApiKeyCredentials(in_headers={"Training-key": TRAINING_KEY})
-trainer = CustomVisionTrainingClient(ENDPOINT, credentials)
-tags = {t.name.strip(): t.id for t in trainer.get_tags(PROJECT_ID)}
-
-def get_tag_id(name):
-    name = name.strip()
-    if name not in tags:
-        print(f"🆕 새 태그 생성: {name}")
-        new_tag = trainer.create_tag(PROJECT_ID, name)
-        tags[name] = new_tag.id
-    return tags[name]
-
-# 4. 업로드 및 자동 박싱(Boxing) 시작
-print("태깅 업로드를 시작...")
-image_batch = []
-total_count = 0
-
-for root, dirs, files in os.walk(JSON_ROOT):
-    for file in files:
-        if file.lower().endswith('.json'):
-            json_path = os.path.join(root, file)
-            try:
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # 데이터 유효성 검사 (unpack 에러 방지)
-                if not data.get('images') or not data.get('annotations'):
+def connect():
+    credentials = ApiKeyCredentials(in_headers={"Training-key": TRAINING_KEY})
+    trainer = CustomVisionTrainingClient(ENDPOINT, credentials)
+    tags = {t.name.strip(): t.id for t in trainer.get_tags(PROJECT_ID)}
+
+    def get_tag_id(name):
+        name = name.strip()
+        if name not in tags:
+            print(f"🆕 새 태그 생성: {name}")
+            new_tag = trainer.create_tag(PROJECT_ID, name)
+            tags[name] = new_tag.id
+        return tags[name]
+
+    return trainer, get_tag_id
+
+
+# 라벨 전처리 (프로세스 풀). 워커마다 한 번 image_map / skip을 받아 둔다.
+# skip은 프로세스로 넘겨야 하므로 lambda 대신 모듈 함수나 functools.partial을 쓸 것
+_prep = {'image_map': {}, 'skip': None}
+
+
+def _init_prep(image_map, skip):
+    _prep['image_map'] = image_map
+    _prep['skip'] = skip
+
+
+def prepare_label(json_path):
+    """
+    라벨 JSON 하나 → 업로드 준비가 끝난 dict.
+    found: 원천 이미지가 있고 skip 대상이 아님, holdout: skip 대상이라 건너뜀,
+    contents: 박스가 하나라도 있을 때만 이미지 바이트 (아니면 None).
+    라벨이 비어 있으면 None, 읽기 / 파싱 오류면 {'json_path', 'error'}
+    """
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        # 데이터 유효성 검사 (unpack 에러 방지)
+        if not data.get('images') or not data.get('annotations'):
+            return None
+
+        img_info = data['images'][0]
+        img_name = label_image_name(img_info)
+        item = {'json_path': json_path, 'img_name': img_name, 'img_info': img_info,
+                'found': False, 'regions': [], 'contents': None}
+        real_img_path = _prep['image_map'].get(img_name)
+        skip = _prep['skip']
+        if not real_img_path:
+            return item
+        if skip and skip(img_name):
+            item['holdout'] = True
+            return item
+
+        item['found'] = True
+        # 픽셀 좌표를 비율로 변환하기 위해 이미지 크기 로드 (크기가 깨진 라벨은 오류로 버림)
+        w_img, h_img = image_size(img_info)
+        item['regions'] = region_ratios(data['annotations'], w_img, h_img)
+        if item['regions']:
+            with open(real_img_path, 'rb') as f_img:
+                item['contents'] = f_img.read()
+        return item
+    except Exception as e:
+        return {'json_path': json_path, 'error': str(e)}
+
+
+def _prepare_chunk(json_paths):
+    return [prepare_label(p) for p in json_paths]
+
+
+def iter_label_paths(json_root):
+    for root, dirs, files in os.walk(json_root):
+        for file in files:
+            if file.lower().endswith('.json'):
+                yield os.path.join(root, file)
+
+
+def prepare_labels(json_root, image_map, skip=None, workers=PREP_WORKERS,
+                   ordered=PREP_ORDERED, chunk=PREP_CHUNK):
+    """
+    라벨 트리를 전처리해서 prepare_label 결과를 하나씩 내줌 (None 제외).
+    workers개 프로세스가 chunk개씩 나눠 처리하고, 미리 만들어 두는 묶음은 workers * 2개까지
+    (업로드가 느려도 이미지 바이트가 메모리에 계속 쌓이지 않도록)
+    """
+    paths = iter_label_paths(json_root)
+    if workers <= 0:
+        _init_prep(image_map, skip)
+        for json_path in paths:
+            item = prepare_label(json_path)
+            if item is not None:
+                yield item
+        return
+
+    def chunks():
+        buf = []
+        for json_path in paths:
+            buf.append(json_path)
+            if len(buf) >= chunk:
+                yield buf
+                buf = []
+        if buf:
+            yield buf
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_prep,
+                             initargs=(image_map, skip)) as pool:
+        it = chunks()
+        pending = deque() if ordered else set()
+        while True:
+            for paths_chunk in it:
+                fut = pool.submit(_prepare_chunk, paths_chunk)
+                if ordered:
+                    pending.append(fut)
+                else:
+                    pending.add(fut)
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                break
+            if ordered:
+                finished_now = [pending.popleft()]
+            else:
+                finished_now, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished_now:
+                for item in fut.result():
+                    if item is not None:
+                        yield item
+
+
+def load_state(path=UPLOAD_STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=UPLOAD_STATE_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _source_name(created):
+    """ImageCreateResult.source_url → 보낸 파일 이름 (Custom Vision이 '"x.png"'처럼 따옴표로 감싸서 주기도 함)"""
+    return (created.source_url or '').strip().strip('"')
+
+
+def _send_batch(trainer, image_batch, pending, state, replaced):
+    """
+    배치 업로드 후 state에 새 이미지 id 기록, 내용이 바뀐 이전 이미지는 삭제 대상에 추가.
+    결과 순서는 보낸 순서와 같다는 보장이 없어서 source_url(= 보낸 파일 이름)로 짝을 맞추고,
+    이름이 안 맞으면 결과 수가 보낸 수와 같을 때만 순서로 짝을 맞춤.
+    같은 내용이 이미 프로젝트에 있으면(OKDuplicate) 기존 이미지가 돌아오므로 state만 채워짐
+    (state가 비어 있는 첫 실행에서 이미지가 두 번 생기지 않음).
+    배치가 실패하면 그 배치 항목을 pending에서 빼고 예외를 그대로 올림 (다음 실행에서 다시 올라감)
+    """
+    try:
+        result = trainer.create_images_from_files(PROJECT_ID, batch=ImageFileCreateBatch(images=image_batch))
+    except Exception:
+        for entry in image_batch:
+            pending.pop(entry.name, None)
+        raise
+    results = result.images or []
+    if state is not None:
+        by_index = len(results) == len(image_batch)
+        for i, created in enumerate(results):
+            name = _source_name(created)
+            if name not in pending and by_index:
+                name = image_batch[i].name
+            if name not in pending:
+                continue
+            img_name, digest = pending.pop(name)
+            if created.image is None:
+                print(f"❌ {img_name} 업로드 실패: {created.status}")
+                continue
+            old = state.get(img_name)
+            if old and old.get("image_id") and old["image_id"] != created.image.id:
+                replaced.append(old["image_id"])
+            state[img_name] = {"hash": digest, "image_id": created.image.id}
+    # 결과에 없던 항목도 정리 (pending은 이번 배치만 들고 있어야 함)
+    for entry in image_batch:
+        pending.pop(entry.name, None)
+
+
+# 4. 업로드 및 자동 박싱(Boxing)
+def upload_labels(trainer, get_tag_id, json_root, image_map, alias_builder=None,
+                  state=None, skip=None, workers=PREP_WORKERS, ordered=PREP_ORDERED):
+    """
+    라벨 JSON을 돌면서 이미지 + 박스를 10장씩 업로드하고 업로드 개수 반환.
+    state(dict)를 넘기면 이미 같은 내용으로 올린 이미지는 건너뛰고(증분 업로드),
+    내용이 바뀐 이미지는 새로 올린 뒤 이전 이미지를 삭제한다.
+    skip(img_name)이 True인 이미지(평가용 홀드아웃 등)는 올리지 않고,
+    state에 전에 올린 기록이 있으면 프로젝트에서도 삭제한다 (홀드아웃이 학습에 섞이지 않도록).
+    JSON 파싱 / 박스 변환 / 이미지 읽기는 prepare_labels(프로세스 풀)가 하고,
+    여기서는 태그 id 조회, 증분 비교, 업로드만 한다.
+    """
+    print("태깅 업로드를 시작...")
+    image_batch = []
+    pending = {}
+    replaced = []
+    total_count = 0
+    skipped = 0
+
+    for item in prepare_labels(json_root, image_map, skip, workers, ordered):
+        file = os.path.basename(item['json_path'])
+        if 'error' in item:
+            print(f"❌ {file} 처리 중 오류: {item['error']}")
+            continue
+        try:
+            img_info = item['img_info']
+            if alias_builder is not None and img_info.get('dl_name'):
+                alias_builder.add(img_info['dl_name'], img_info)
+            if not item['found']:
+                old = state.get(item['img_name']) if state is not None and item.get('holdout') else None
+                if old and old.get("image_id"):
+                    replaced.append(old["image_id"])
+                    del state[item['img_name']]
+                continue
+            t_id = get_tag_id(img_info['dl_name'])
+            if item['contents'] is None:
+                continue
+            img_name = item['img_name']
+            contents = item['contents']
+            regions = [Region(tag_id=t_id, left=l, top=t, width=w, height=h)
+                       for l, t, w, h in item['regions']]
+
+            digest = None
+            if state is not None:
+                h = hashlib.sha1(contents)
+                h.update(repr([(t_id, r.left, r.top, r.width, r.height) for r in regions]).encode())
+                digest = h.hexdigest()
+                if state.get(img_name, {}).get("hash") == digest:
+                    skipped += 1
                     continue
-                
-                img_info = data['images'][0]
-                img_name = img_info['file_name'].replace('.jpg', '.png').replace('.JPG', '.png').lower()
-                real_img_path = image_map.get(img_name)
-                
-                if real_img_path:
-                    t_id = get_tag_id(img_info['dl_name'])
-                    # 픽셀 좌표를 비율로 변환하기 위해 이미지 크기 로드
-                    w_img, h_img = float(img_info['width']), float(img_info['height'])
-                    
-                    regions = []
-                    for ann in data['annotations']:
-                        bbox = ann.get('bbox')
-                        if not bbox or len(bbox) != 4: continue
-                        
-                        # Azure가 요구하는 0.0 ~ 1.0 비율로 정밀 변환
-                        # 좌표가 1.0을 넘지 않도록 Clamp(고정) 처리
-                        left = max(0.001, min(0.99, bbox[0] / w_img))
-                        top = max(0.001, min(0.99, bbox[1] / h_img))
-                        width = max(0.01, min(1.0 - left, bbox[2] / w_img))
-                        height = max(0.01, min(1.0 - top, bbox[3] / h_img))
-
-                        regions.append(Region(tag_id=t_id, left=left, top=top, width=width, height=height))
-
-                    if regions:
-                        with open(real_img_path, "rb") as f_img:
-                            image_batch.append(ImageFileCreateEntry(
-                                name=img_name,
-                                contents=f_img.read(),
-                                tag_ids=[t_id],
-                                regions=regions
-                            ))
-
-                    # 10장씩 묶어서 배치 업로드 (속도 향상 및 오류 방지)
-                    if len(image_batch) >= 10:
-                        trainer.create_images_from_files(PROJECT_ID, batch=ImageFileCreateBatch(images=image_batch))
-                        total_count += len(image_batch)
-                        print(f"✅ {total_count}개 업로드 및 자동 박스 생성 완료")
-                        image_batch = []
-                        time.sleep(0.1)
-
-            except Exception as e:
-                # Conflict는 이미 파일이 있다는 뜻이므로 무시
-                if "Conflict" not in str(e):
-                    print(f"❌ {file} 처리 중 오류: {e}")
-
-# 남은 이미지 처리
-if image_batch:
-    trainer.create_images_from_files(PROJECT_ID, batch=ImageFileCreateBatch(images=image_batch))
-    total_count += len(image_batch)
-
-print(f"{total_count}개의 이미지가 'Tagged' 탭으로 들어감.")
\ No newline at end of file
+
+            image_batch.append(ImageFileCreateEntry(
+                name=img_name,
+                contents=contents,
+                tag_ids=[t_id],
+                regions=regions
+            ))
+            pending[img_name] = (img_name, digest)
+
+            # 10장씩 묶어서 배치 업로드 (속도 향상 및 오류 방지)
+            if len(image_batch) >= 10:
+                batch, image_batch = image_batch, []
+                _send_batch(trainer, batch, pending, state, replaced)
+                total_count += len(batch)
+                print(f"✅ {total_count}개 업로드 및 자동 박스 생성 완료")
+                time.sleep(0.1)
+
+        except Exception as e:
+            # Conflict는 이미 파일이 있다는 뜻이므로 무시
+            if "Conflict" not in str(e):
+                print(f"❌ {file} 처리 중 오류: {e}")
+
+    # 남은 이미지 처리
+    if image_batch:
+        _send_batch(trainer, image_batch, pending, state, replaced)
+        total_count += len(image_batch)
+
+    # 내용이 바뀌어 다시 올린 이미지의 이전 버전 / 홀드아웃이 된 이미지 삭제 (API 한 번에 최대 256개)
+    for i in range(0, len(replaced), 256):
+        trainer.delete_images(PROJECT_ID, image_ids=replaced[i:i + 256])
+
+    if state is not None:
+        print(f"변경 없는 이미지 {skipped}개 건너뜀, 교체 / 홀드아웃 이미지 {len(replaced)}개 삭제")
+    return total_count
+
+
+def main():
+    json_root, image_root = find_roots()
+    image_map = scan_images(image_root)
+    print(f"검색된 이미지 파일 수: {len(image_map)}개")
+    trainer, get_tag_id = connect()
+
+    alias_builder = AliasBuilder()  # 각인(print_front/back) → 태그 이름 인덱스
+    # train.py와 같은 증분 기록 / 홀드아웃 분할 (평가용 이미지가 학습에 들어가지 않도록)
+    state = load_state()
+    try:
+        total_count = upload_labels(trainer, get_tag_id, json_root, image_map, alias_builder,
+                                    state=state, skip=is_holdout)
+    finally:
+        save_state(state)
+
+    print(f"{total_count}개의 이미지가 'Tagged' 탭으로 들어감.")
+
+    alias_count = alias_builder.save()
+    print(f"각인 별칭 {alias_count}개를 imprint_alias.json에 저장.")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
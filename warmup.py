@@ -0,0 +1,117 @@
+"""
+서버 부팅 시 워밍업.
+
+스케일 아웃 직후 첫 사용자가 DNS / TLS / Azure 콜드 패스 비용을 떠안지 않도록
+demo.launch() 전에 세 서비스에 한 번씩 요청을 보내 연결 풀을 채워 둔다.
+
+- Custom Vision: 작은 합성 이미지로 예측 1회
+- Azure Vision OCR: 같은 이미지로 read 1회
+- Azure OpenAI: max_tokens=1 짜리 chat completion 1회 (prompts.py 공통 system 앞부분 포함)
+- 자주 나오는 약(WARMUP_TAGS 앞쪽 WARMUP_TOP_N개)의 설명을 미리 생성해 explain_cache에 채움
+
+환경 변수:
+    WARMUP=1            newmain.launch()에서 워밍업 실행
+    WARMUP_TAGS         쉼표로 구분한 태그 이름 (많이 나오는 순서)
+    WARMUP_TOP_N        미리 채울 설명 개수 (기본 10)
+    WARMUP_STRICT=1     하나라도 실패하면 서버를 띄우지 않음
+"""
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import newmain
+
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "10"))
+
+
+def _tiny_jpeg():
+    """모든 엔드포인트의 최소 크기 제한을 넘는 256x256 회색 이미지"""
+    from PIL import Image
+
+    img = Image.new("RGB", (256, 256), (200, 200, 200))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _warm_prediction(img_bytes):
+    if not newmain.PREDICTION_URL:
+        return "skip"
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "Prediction-Key": newmain.PREDICTION_KEY,
+    }
+    resp = newmain.get_session().post(newmain.prediction_url(), headers=headers,
+                                      data=img_bytes, timeout=30)
+    resp.raise_for_status()
+    return "ok"
+
+
+def _warm_ocr(img_bytes):
+    if not newmain.AZURE_VISION_ENDPOINT or not newmain.AZURE_VISION_KEY:
+        return "skip"
+    # ocr_pill_text는 오류를 삼키고 ""를 돌려주므로 (회색 이미지는 원래 글자도 없음) 요청을 직접 보냄
+    newmain.ocr_read(img_bytes)
+    return "ok"
+
+
+def _warm_chat():
+    if not newmain.DEPLOYMENT_NAME:
+        return "skip"
+    # 공통 system 앞부분(prompts.SYSTEM_PREFIX)을 같이 보내 GPT 배포까지 연결을 데움
+    newmain.prompts.chat("warmup")
+    return "ok"
+
+
+def _warm_explain(tag):
+    newmain.explain_pill_with_gpt(tag)
+    return "ok"
+
+
+def warm_tags(top_n: int = WARMUP_TOP_N):
+    tags = [t.strip() for t in os.getenv("WARMUP_TAGS", "").split(",") if t.strip()]
+    return tags[:top_n]
+
+
+def warm_up(top_n: int = WARMUP_TOP_N, strict: bool = None) -> dict:
+    """세 서비스 연결 + 설명 캐시를 채우고 {항목: (결과, 소요초)} 반환"""
+    if strict is None:
+        strict = os.getenv("WARMUP_STRICT", "0") == "1"
+
+    img_bytes = _tiny_jpeg()
+    tasks = {
+        "prediction": lambda: _warm_prediction(img_bytes),
+        "ocr": lambda: _warm_ocr(img_bytes),
+        "chat": _warm_chat,
+    }
+    for tag in warm_tags(top_n):
+        tasks[f"explain:{tag}"] = lambda tag=tag: _warm_explain(tag)
+
+    def timed(fn):
+        t0 = time.perf_counter()
+        try:
+            return fn(), time.perf_counter() - t0
+        except Exception as e:
+            return f"error: {e}", time.perf_counter() - t0
+
+    print("🔥 워밍업 시작...")
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(8, len(tasks))) as pool:
+        futures = {name: pool.submit(timed, fn) for name, fn in tasks.items()}
+        report = {name: f.result() for name, f in futures.items()}
+
+    failed = []
+    for name, (status, secs) in report.items():
+        print(f"  {name:30s} {status:10s} {secs * 1000:8.1f} ms")
+        if status.startswith("error"):
+            failed.append(name)
+    print(f"🔥 워밍업 완료: {time.perf_counter() - t0:.2f}s, 실패 {len(failed)}건")
+
+    if failed and strict:
+        raise RuntimeError(f"워밍업 실패: {', '.join(failed)}")
+    return report
+
+
+if __name__ == "__main__":
+    warm_up()